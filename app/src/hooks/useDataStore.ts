@@ -1,5 +1,5 @@
 import { useState, useEffect, useCallback } from 'react';
-import type { Contract, Risk, Task, DashboardStats } from '@/types';
+import type { Contract, Risk, Task, DashboardStats, ReportStats } from '@/types';
 import {
   contractsApi,
   risksApi,
@@ -8,7 +8,7 @@ import {
   textEditsApi,
   statsApi,
 } from '@/services/api';
-import type { Annotation, TextEdit } from '@/services/api';
+import type { Annotation, ContractCollection, ContractFull, TextEdit } from '@/services/api';
 
 export type { Annotation, TextEdit };
 
@@ -61,6 +61,23 @@ export function useContract(id: string | null) {
   return { contract };
 }
 
+export function useContractFull(id: string, include?: ContractCollection[]) {
+  const [detail, setDetail] = useState<ContractFull | null>(null);
+
+  const refresh = useCallback(async () => {
+    try {
+      setDetail(await contractsApi.full(id, include));
+    } catch (e) {
+      console.error('Failed to fetch contract', e);
+      setDetail(null);
+    }
+  }, [id, include]);
+
+  useEffect(() => { refresh(); }, [refresh]);
+
+  return { detail, refresh };
+}
+
 export function useRisks(contractId?: string) {
   const [risks, setRisks] = useState<Risk[]>([]);
 
@@ -144,6 +161,23 @@ export function useStats() {
   return { stats, refresh };
 }
 
+export function useReports(params?: { from?: string; to?: string; type?: string }) {
+  const [report, setReport] = useState<ReportStats | null>(null);
+  const { from, to, type } = params ?? {};
+
+  const refresh = useCallback(async () => {
+    try {
+      setReport(await statsApi.reports({ from, to, type }));
+    } catch (e) {
+      console.error('Failed to fetch reports', e);
+    }
+  }, [from, to, type]);
+
+  useEffect(() => { refresh(); }, [refresh]);
+
+  return { report, refresh };
+}
+
 export function useAnnotations(contractId: string) {
   const [annotations, setAnnotations] = useState<Annotation[]>([]);
 
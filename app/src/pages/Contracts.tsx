@@ -14,9 +14,10 @@ import { Textarea } from '@/components/ui/textarea';
 import { Skeleton } from '@/components/ui/skeleton';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Card, CardContent } from '@/components/ui/card';
-import { useContracts, useContract, useRisks, useAnnotations } from '@/hooks/useDataStore';
+import { useContracts, useContractFull } from '@/hooks/useDataStore';
 import { analyzeContractRisk } from '@/services/kimiApi';
-import { risksApi, contractsApi } from '@/services/api';
+import { risksApi, contractsApi, annotationsApi } from '@/services/api';
+import type { Annotation, ContractCollection } from '@/services/api';
 import { toast } from 'sonner';
 import { getContractStatusBadgeProps, getRiskLevelBadgeProps } from '@/lib/utils';
 import type { Contract, ContractStatus, RiskAnalysisResult, RiskLevel } from '@/types';
@@ -37,10 +38,22 @@ interface ContractViewerProps {
   onClose: () => void;
 }
 
+// 合同、风险、批注一次请求取回
+const VIEWER_INCLUDE: ContractCollection[] = ['risks', 'annotations'];
+
 const ContractViewer = ({ contractId, onClose }: ContractViewerProps) => {
-  const { contract } = useContract(contractId);
-  const { risks } = useRisks(contractId);
-  const { annotations, create: createAnnotation, remove: deleteAnnotation } = useAnnotations(contractId);
+  const { detail, refresh } = useContractFull(contractId, VIEWER_INCLUDE);
+  const contract = detail?.contract;
+  const risks = detail?.risks ?? [];
+  const annotations = detail?.annotations ?? [];
+  const createAnnotation = async (annotation: Annotation) => {
+    await annotationsApi.create(annotation);
+    await refresh();
+  };
+  const deleteAnnotation = async (id: string) => {
+    await annotationsApi.delete(id);
+    await refresh();
+  };
   const [isFullscreen, setIsFullscreen] = useState(false);
   const [selectedText, setSelectedText] = useState('');
   const [showAnnotationDialog, setShowAnnotationDialog] = useState(false);
@@ -677,6 +690,11 @@ const Contracts = () => {
 
   const contractTypes = [...new Set(contracts.map(c => c.type))];
 
+  // 列表不含合同正文，编辑和 AI 审查前先取完整合同
+  const openWithContent = (contract: Contract, open: (full: Contract) => void) => {
+    contractsApi.get(contract.id).then(open).catch(() => toast.error('合同加载失败'));
+  };
+
   const filteredContracts = contracts.filter(contract => {
     const matchesSearch = searchTerm === '' || 
       contract.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
@@ -837,7 +855,7 @@ const Contracts = () => {
                       <Button
                         variant="ghost"
                         size="sm"
-                        onClick={() => setAnalyzingContract(contract)}
+                        onClick={() => openWithContent(contract, setAnalyzingContract)}
                         title="AI 智能审查"
                         className="relative"
                       >
@@ -856,7 +874,7 @@ const Contracts = () => {
                       <Button
                         variant="ghost"
                         size="sm"
-                        onClick={() => { setEditingContract(contract); setShowForm(true); }}
+                        onClick={() => openWithContent(contract, full => { setEditingContract(full); setShowForm(true); })}
                       >
                         <Edit className="w-4 h-4" />
                       </Button>
@@ -17,6 +17,8 @@ import { Badge } from '@/components/ui/badge';
 import { Progress } from '@/components/ui/progress';
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/ui/dialog';
 import { useContracts, useRisks, useTasks, useStats } from '@/hooks/useDataStore';
+import { contractsApi } from '@/services/api';
+import { toast } from 'sonner';
 import type { Page, Contract } from '@/types';
 import { cn, getContractStatusBadgeProps, getRiskLevelBadgeProps, getPriorityBadgeProps } from '@/lib/utils';
 
@@ -209,7 +211,7 @@ export function Dashboard({ onPageChange }: DashboardProps) {
                     <tr 
                       key={contract.id} 
                       className="border-b border-border hover:bg-accent cursor-pointer" 
-                      onClick={() => setViewingContract(contract)}
+                      onClick={() => contractsApi.get(contract.id).then(setViewingContract).catch(() => toast.error('合同加载失败'))}
                     >
                       <td className="py-3 px-4 text-sm font-medium text-blue-600 hover:text-blue-800 whitespace-nowrap">{contract.name}</td>
                       <td className="py-3 px-4 text-sm text-muted-foreground whitespace-nowrap">{contract.party}</td>
@@ -16,32 +16,31 @@ import {
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
-import { useContracts, useRisks, useTasks, useStats } from '@/hooks/useDataStore';
+import { useReports } from '@/hooks/useDataStore';
+import { contractsApi, risksApi, tasksApi } from '@/services/api';
 import { toast } from 'sonner';
 
+const EXPORT_FIELDS = 'name,type,party,amount,status,riskLevel,signedDate,expiryDate';
+
 const COLORS = ['#6366f1', '#06b6d4', '#f59e0b', '#ef4444', '#22c55e', '#8b5cf6', '#ec4899'];
 
 export function Reports() {
-  const { contracts, refresh: refreshContracts } = useContracts();
-  const { risks, refresh: refreshRisks } = useRisks();
-  const { tasks, refresh: refreshTasks } = useTasks();
-  const { stats, refresh: refreshStats } = useStats();
-
-  const refreshAll = () => {
-    refreshContracts();
-    refreshRisks();
-    refreshTasks();
-    refreshStats();
-  };
+  const { report, refresh: refreshAll } = useReports();
 
-  const handleExportReport = () => {
+  // Exports need the rows themselves, so they are fetched on demand rather than on page load.
+  const handleExportReport = async () => {
+    const [contracts, risks, tasks] = await Promise.all([
+      contractsApi.list({ fields: EXPORT_FIELDS }),
+      risksApi.list(),
+      tasksApi.list(),
+    ]);
     const reportData = {
       exportTime: new Date().toISOString(),
       summary: {
-        totalContracts: contracts.length,
-        totalAmount: contracts.reduce((sum, c) => sum + c.amount, 0),
-        pendingRisks: risks.filter((r) => r.status !== 'resolved').length,
-        completionRate: stats.completionRate,
+        totalContracts: report?.contracts.total ?? contracts.length,
+        totalAmount: report?.contracts.totalAmount ?? 0,
+        pendingRisks: report?.risks.pending ?? 0,
+        completionRate: report?.tasks.completionRate ?? 0,
       },
       contracts: contracts.map(c => ({
         name: c.name, type: c.type, party: c.party, amount: c.amount,
@@ -69,7 +68,8 @@ export function Reports() {
     toast.success('报表导出成功');
   };
 
-  const handleExportCSV = () => {
+  const handleExportCSV = async () => {
+    const contracts = await contractsApi.list({ fields: EXPORT_FIELDS });
     const statusLabel = (s: string) =>
       s === 'active' ? '履约中' : s === 'pending' ? '待签署' : s === 'completed' ? '已完成' : '草稿';
     const riskLabel = (r?: string) =>
@@ -92,64 +92,63 @@ export function Reports() {
     toast.success('CSV导出成功');
   };
 
-  const typeDistData = useMemo(() => {
-    const dist: Record<string, number> = {};
-    contracts.forEach(c => { dist[c.type] = (dist[c.type] || 0) + 1; });
-    return Object.entries(dist).map(([name, value]) => ({ name, value }));
-  }, [contracts]);
+  const typeDistData = useMemo(() =>
+    Object.entries(report?.contracts.byType ?? {}).map(([name, value]) => ({ name, value })),
+  [report]);
 
   const statusDistData = useMemo(() => {
     const labelMap: Record<string, string> = { active: '履约中', pending: '待签署', completed: '已完成', draft: '草稿', terminated: '已终止' };
     const dist: Record<string, number> = {};
-    contracts.forEach(c => {
-      const label = labelMap[c.status] || c.status;
-      dist[label] = (dist[label] || 0) + 1;
+    Object.entries(report?.contracts.byStatus ?? {}).forEach(([status, count]) => {
+      const label = labelMap[status] || status;
+      dist[label] = (dist[label] || 0) + count;
     });
     return Object.entries(dist).map(([name, value]) => ({ name, value }));
-  }, [contracts]);
+  }, [report]);
 
-  const monthlyData = useMemo(() => {
-    const months: Record<string, number> = {};
-    contracts.forEach(c => {
-      if (c.signedDate) {
-        const ym = c.signedDate.substring(0, 7);
-        months[ym] = (months[ym] || 0) + c.amount;
-      }
-    });
-    return Object.entries(months)
-      .sort(([a], [b]) => a.localeCompare(b))
-      .map(([month, amount]) => ({
-        month: month.replace(/^\d{4}-/, '').replace(/^0/, '') + '月',
-        amount: Math.round(amount / 10000),
-        raw: amount,
-      }));
-  }, [contracts]);
+  const monthlyData = useMemo(() =>
+    (report?.contracts.monthlyAmount ?? []).map(({ month, amount }) => ({
+      month: month.replace(/^\d{4}-/, '').replace(/^0/, '') + '月',
+      amount: Math.round(amount / 10000),
+      raw: amount,
+    })),
+  [report]);
 
-  const riskLevelData = useMemo(() => [
-    { name: '高风险', value: risks.filter(r => r.level === 'high').length, fill: '#ef4444' },
-    { name: '中风险', value: risks.filter(r => r.level === 'medium').length, fill: '#f59e0b' },
-    { name: '低风险', value: risks.filter(r => r.level === 'low').length, fill: '#22c55e' },
-  ], [risks]);
+  const riskLevelData = useMemo(() => {
+    const byLevel = report?.risks.byLevel ?? {};
+    return [
+      { name: '高风险', value: byLevel.high ?? 0, fill: '#ef4444' },
+      { name: '中风险', value: byLevel.medium ?? 0, fill: '#f59e0b' },
+      { name: '低风险', value: byLevel.low ?? 0, fill: '#22c55e' },
+    ];
+  }, [report]);
 
   const riskTypeData = useMemo(() => {
     const labels: Record<string, string> = { legal: '法律风险', financial: '财务风险', operational: '运营风险', compliance: '合规风险' };
+    const byType = report?.risks.byType ?? {};
     return Object.entries(labels).map(([key, name]) => ({
       name,
-      count: risks.filter(r => r.type === key).length,
+      count: byType[key] ?? 0,
     }));
-  }, [risks]);
+  }, [report]);
 
-  const taskStatusData = useMemo(() => [
-    { name: '待处理', value: tasks.filter(t => t.status === 'pending').length, fill: '#f59e0b' },
-    { name: '进行中', value: tasks.filter(t => t.status === 'processing').length, fill: '#6366f1' },
-    { name: '已完成', value: tasks.filter(t => t.status === 'completed').length, fill: '#22c55e' },
-  ], [tasks]);
+  const taskStatusData = useMemo(() => {
+    const byStatus = report?.tasks.byStatus ?? {};
+    return [
+      { name: '待处理', value: byStatus.pending ?? 0, fill: '#f59e0b' },
+      { name: '进行中', value: byStatus.processing ?? 0, fill: '#6366f1' },
+      { name: '已完成', value: byStatus.completed ?? 0, fill: '#22c55e' },
+    ];
+  }, [report]);
 
-  const taskPriorityData = useMemo(() => [
-    { name: '高优先级', count: tasks.filter(t => t.priority === 'high').length, fill: '#ef4444' },
-    { name: '中优先级', count: tasks.filter(t => t.priority === 'medium').length, fill: '#f59e0b' },
-    { name: '低优先级', count: tasks.filter(t => t.priority === 'low').length, fill: '#22c55e' },
-  ], [tasks]);
+  const taskPriorityData = useMemo(() => {
+    const byPriority = report?.tasks.byPriority ?? {};
+    return [
+      { name: '高优先级', count: byPriority.high ?? 0, fill: '#ef4444' },
+      { name: '中优先级', count: byPriority.medium ?? 0, fill: '#f59e0b' },
+      { name: '低优先级', count: byPriority.low ?? 0, fill: '#22c55e' },
+    ];
+  }, [report]);
 
   return (
     <motion.div initial={{ opacity: 0 }} animate={{ opacity: 1 }} className="space-y-6">
@@ -174,10 +173,10 @@ export function Reports() {
       {/* Overview Cards */}
       <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-4">
         {[
-          { label: '合同总金额', value: `¥${contracts.reduce((s, c) => s + c.amount, 0).toLocaleString()}`, icon: FileText, bg: 'bg-blue-100', fg: 'text-blue-600' },
-          { label: '平均合同金额', value: `¥${contracts.length > 0 ? Math.round(contracts.reduce((s, c) => s + c.amount, 0) / contracts.length).toLocaleString() : 0}`, icon: TrendingUp, bg: 'bg-green-100', fg: 'text-green-600' },
-          { label: '待处理风险', value: risks.filter(r => r.status !== 'resolved').length.toString(), icon: AlertTriangle, bg: 'bg-red-100', fg: 'text-red-600', valueClass: 'text-red-600' },
-          { label: '任务完成率', value: `${stats.completionRate}%`, icon: CheckSquare, bg: 'bg-amber-100', fg: 'text-amber-600', valueClass: 'text-green-600' },
+          { label: '合同总金额', value: `¥${(report?.contracts.totalAmount ?? 0).toLocaleString()}`, icon: FileText, bg: 'bg-blue-100', fg: 'text-blue-600' },
+          { label: '平均合同金额', value: `¥${Math.round(report?.contracts.averageAmount ?? 0).toLocaleString()}`, icon: TrendingUp, bg: 'bg-green-100', fg: 'text-green-600' },
+          { label: '待处理风险', value: (report?.risks.pending ?? 0).toString(), icon: AlertTriangle, bg: 'bg-red-100', fg: 'text-red-600', valueClass: 'text-red-600' },
+          { label: '任务完成率', value: `${report?.tasks.completionRate ?? 0}%`, icon: CheckSquare, bg: 'bg-amber-100', fg: 'text-amber-600', valueClass: 'text-green-600' },
         ].map((card, i) => (
           <motion.div key={i} initial={{ opacity: 0, y: 20 }} animate={{ opacity: 1, y: 0 }} transition={{ duration: 0.3 }}>
             <Card className="hover:shadow-lg hover:-translate-y-1 transition-all duration-200 cursor-pointer">
@@ -24,6 +24,7 @@ import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/u
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Textarea } from '@/components/ui/textarea';
 import { useRisks, useContracts } from '@/hooks/useDataStore';
+import { contractsApi } from '@/services/api';
 import { toast } from 'sonner';
 import type { Risk, Contract, Department } from '@/types';
 import { DEPARTMENTS } from '@/types';
@@ -81,11 +82,12 @@ export function Risks() {
   };
 
   const handleViewRiskContract = (risk: Risk) => {
-    const contract = contracts.find(c => c.id === risk.contractId);
-    if (contract) {
+    if (!contracts.some(c => c.id === risk.contractId)) return;
+    // 列表不含合同正文
+    contractsApi.get(risk.contractId).then(contract => {
       setViewingRiskContract(contract);
       setHighlightedClause(risk.clause || '');
-    }
+    }).catch(() => toast.error('合同加载失败'));
   };
 
   useEffect(() => {
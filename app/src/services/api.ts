@@ -3,8 +3,10 @@ import type {
   Risk,
   Task,
   DashboardStats,
+  ReportStats,
   ContractAnalysisRequest,
   RiskAnalysisResult,
+  AnalysisJob,
 } from '@/types';
 
 // 本地开发用 Vite 代理 /api；线上部署时在 Vercel 等设置 VITE_API_BASE 为后端地址，如 https://xxx.railway.app/api
@@ -53,11 +55,33 @@ export interface TextEdit {
   type: 'add' | 'delete';
   text: string;
   position: number;
+  seq?: number;
   createdAt: string;
 }
 
+export interface ContractText {
+  contractId: string;
+  seq: number;
+  length: number;
+  start: number;
+  end: number;
+  text: string;
+  edits: TextEdit[];
+}
+
+export type ContractCollection = 'risks' | 'tasks' | 'annotations' | 'textEdits';
+
+// 合同详情页所需数据一次取回；include 未列出的集合不出现在响应中
+export interface ContractFull {
+  contract: Contract;
+  risks?: Risk[];
+  tasks?: Task[];
+  annotations?: Annotation[];
+  textEdits?: TextEdit[];
+}
+
 export const contractsApi = {
-  list: (params?: { search?: string; status?: string; type?: string }) =>
+  list: (params?: { search?: string; status?: string; type?: string; limit?: string; cursor?: string; fields?: string }) =>
     request<Contract[]>(`/contracts/${qs(params ?? {})}`),
 
   get: (id: string) =>
@@ -77,6 +101,15 @@ export const contractsApi = {
 
   delete: (id: string) =>
     request<void>(`/contracts/${id}`, { method: 'DELETE' }),
+
+  // 应用全部文本修改后的正文；传 start/end 只取该区间及与之重叠的修改。
+  text: (id: string, range?: { start?: number; end?: number }) =>
+    request<ContractText>(
+      `/contracts/${id}/text${qs({ start: range?.start?.toString(), end: range?.end?.toString() })}`,
+    ),
+
+  full: (id: string, include?: ContractCollection[]) =>
+    request<ContractFull>(`/contracts/${id}/full${qs({ include: include?.join(',') })}`),
 };
 
 // ── Risks ────────────────────────────────────────────────────────────
@@ -99,6 +132,16 @@ export const risksApi = {
       body: JSON.stringify(data),
     }),
 
+  updateBatch: (body: {
+    ids?: string[];
+    filter?: { contractId?: string; level?: string; status?: string };
+    update: Partial<Risk>;
+  }) =>
+    request<{ updated: Risk[]; notFound: string[] }>('/risks/batch', {
+      method: 'PATCH',
+      body: JSON.stringify(body),
+    }),
+
   delete: (id: string) =>
     request<void>(`/risks/${id}`, { method: 'DELETE' }),
 };
@@ -121,6 +164,16 @@ export const tasksApi = {
       body: JSON.stringify(data),
     }),
 
+  updateBatch: (body: {
+    ids?: string[];
+    filter?: { status?: string; priority?: string; contractId?: string };
+    update: Partial<Task>;
+  }) =>
+    request<{ updated: Task[]; notFound: string[] }>('/tasks/batch', {
+      method: 'PATCH',
+      body: JSON.stringify(body),
+    }),
+
   delete: (id: string) =>
     request<void>(`/tasks/${id}`, { method: 'DELETE' }),
 };
@@ -157,10 +210,58 @@ export const textEditsApi = {
     request<void>(`/text-edits/${id}`, { method: 'DELETE' }),
 };
 
+// ── Sync ─────────────────────────────────────────────────────────────
+
+export interface SyncChanges {
+  cursor: number;
+  hasMore: boolean;
+  contracts: Contract[];
+  risks: Risk[];
+  tasks: Task[];
+  annotations: Annotation[];
+  textEdits: TextEdit[];
+  deleted: { entity: 'contracts' | 'risks' | 'tasks' | 'annotations' | 'textEdits'; id: string }[];
+}
+
+export const syncApi = {
+  // 传入上次返回的 cursor 只取增量；0 表示全量（按 hasMore 翻页）。410 表示游标已过期，需从 0 重新同步。
+  changes: (since = 0, limit?: number) =>
+    request<SyncChanges>(`/sync${qs({ since: String(since), limit: limit ? String(limit) : undefined })}`),
+};
+
+export interface ChangeEvent {
+  entity: SyncChanges['deleted'][number]['entity'];
+  id: string;
+  op: 'insert' | 'update' | 'delete';
+  seq: number;
+  contractId?: string;
+  fields?: string[];
+}
+
+export const eventsApi = {
+  // 订阅变更推送；收到 overflow 时用最后的 cursor 调用 syncApi.changes 补齐。返回取消订阅函数。
+  subscribe: (
+    onChange: (cursor: number, changes: ChangeEvent[]) => void,
+    onOverflow: () => void,
+    entities?: ChangeEvent['entity'][],
+  ) => {
+    const source = new EventSource(`${API_BASE}/events${qs({ entity: entities?.join(',') })}`);
+    source.addEventListener('change', (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      onChange(data.cursor, data.changes);
+    });
+    source.addEventListener('overflow', onOverflow);
+    return () => source.close();
+  },
+};
+
 // ── Stats ────────────────────────────────────────────────────────────
 
 export const statsApi = {
   dashboard: () => request<DashboardStats>('/stats/dashboard'),
+
+  reports: (params?: { from?: string; to?: string; type?: string }) =>
+    request<ReportStats>(`/stats/reports${qs(params ?? {})}`),
 };
 
 // ── AI ───────────────────────────────────────────────────────────────
@@ -177,4 +278,15 @@ export const aiApi = {
       method: 'POST',
       body: JSON.stringify(data),
     }),
+
+  submitJob: (contractId: string) =>
+    request<AnalysisJob>('/ai/jobs', {
+      method: 'POST',
+      body: JSON.stringify({ contractId }),
+    }),
+
+  getJob: (id: string) => request<AnalysisJob>(`/ai/jobs/${id}`),
+
+  listJobs: (params?: { contractId?: string; status?: string; limit?: string }) =>
+    request<AnalysisJob[]>(`/ai/jobs${qs(params ?? {})}`),
 };
@@ -18,7 +18,7 @@ export interface Contract {
   signedDate: string;
   expiryDate: string;
   status: ContractStatus;
-  content: string;
+  content?: string;  // 列表接口默认不返回，需取详情
   aiAnalyzed?: boolean;
   riskLevel?: RiskLevel;
   createdAt: string;
@@ -35,6 +35,7 @@ export interface Risk {
   suggestion: string;
   clause?: string;
   clausePosition?: { start: number; end: number };
+  clauseMissing?: boolean;
   status: RiskStatus;
   assignedTo?: string;
   assignedDepartment?: Department;
@@ -64,6 +65,30 @@ export interface DashboardStats {
   completionRate: number;
 }
 
+export interface ReportStats {
+  contracts: {
+    total: number;
+    totalAmount: number;
+    averageAmount: number;
+    byType: Record<string, number>;
+    byStatus: Record<string, number>;
+    monthlyAmount: Array<{ month: string; amount: number }>;
+  };
+  risks: {
+    total: number;
+    pending: number;
+    byLevel: Record<string, number>;
+    byType: Record<string, number>;
+    byStatus: Record<string, number>;
+  };
+  tasks: {
+    total: number;
+    completionRate: number;
+    byStatus: Record<string, number>;
+    byPriority: Record<string, number>;
+  };
+}
+
 export interface ContractAnalysisRequest {
   contractName: string;
   contractType: string;
@@ -84,6 +109,19 @@ export interface RiskAnalysisResult {
   }>;
 }
 
+export type AnalysisJobStatus = 'queued' | 'running' | 'succeeded' | 'fallback' | 'stale' | 'failed';
+
+export interface AnalysisJob {
+  id: string;
+  contractId: string;
+  status: AnalysisJobStatus;
+  error: string | null;
+  result: RiskAnalysisResult | null;
+  createdAt: string;
+  startedAt: string | null;
+  finishedAt: string | null;
+}
+
 export const DEPARTMENTS: { value: Department; label: string }[] = [
   { value: 'legal', label: '法务部' },
   { value: 'finance', label: '财务部' },
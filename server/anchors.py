@@ -0,0 +1,389 @@
+"""Re-anchoring of risk clause offsets when a contract's content changes.
+
+``clause_start`` / ``clause_end`` are character offsets into the content, so
+any edit before a clause moves it. ``update_contract`` diffs the old content
+against the new one and moves every risk of the contract in one
+``executemany``:
+
+1. The common prefix and suffix are cut off first (a typical edit touches one
+   place in a long contract).
+2. The rest is split into sentences / lines. Sentences occurring exactly once
+   on each side are matched up in order (patience diff: the longest
+   increasing run of such pairs), which splits the text into short gaps.
+3. Each gap is diffed as a sequence of sentences, and each run of changed
+   sentences again character by character, with Myers' algorithm in its
+   linear-space form (middle-snake bisection: O(N) memory, O(N·D) time).
+
+All of this shares a budget of ``ANCHOR_MAX_STEPS`` Myers steps (diagonals
+explored). Once it runs out, the remaining gaps keep only their common prefix
+and suffix and are treated as rewritten, so even replacing the whole text
+costs a bounded time; the fallback below still places clauses inside them.
+
+A clause moves by the diff when its text maps intact. Otherwise it is looked
+up by its text, nearest to where the diff puts it. A clause whose text no
+longer occurs loses its position and is flagged ``clause_missing``; it is
+placed again by a later edit that brings the text back.
+
+    python anchors.py bench --pages 100 --risks 500    time a re-anchor
+"""
+import argparse
+import bisect
+import random
+import re
+import sys
+import time
+
+from sqlalchemy import bindparam, or_, select
+
+from changes import lock_sequence, stamp_ids
+from models import Risk
+from versions import bump
+
+ANCHOR_MAX_STEPS = 1_000_000
+
+# A sentence or line, keeping its terminator.
+_SEGMENT = re.compile(r"[^\n。；;！？!?]*[\n。；;！？!?]|[^\n。；;！？!?]+")
+
+
+class _OutOfSteps(Exception):
+    pass
+
+
+def matching_blocks(old: str, new: str) -> list[tuple[int, int, int]]:
+    """``(old start, new start, length)`` runs of text common to both, in order."""
+    prefix = _common_prefix(old, new)
+    suffix = _common_suffix(old, new, prefix)
+    blocks = [(0, 0, prefix)] if prefix else []
+    a_end, b_end = len(old) - suffix, len(new) - suffix
+
+    a_segs = _SEGMENT.findall(old, prefix, a_end)
+    b_segs = _SEGMENT.findall(new, prefix, b_end)
+    a_off = _offsets(a_segs, prefix)
+    b_off = _offsets(b_segs, prefix)
+    # Compare sentences as small ints rather than strings.
+    ids: dict[str, int] = {}
+    a = [ids.setdefault(s, len(ids)) for s in a_segs]
+    b = [ids.setdefault(s, len(ids)) for s in b_segs]
+    budget = [ANCHOR_MAX_STEPS]
+    runs = _patience(a, b, budget)
+
+    i = j = 0
+    for si, sj, n in runs + [(len(a), len(b), 0)]:
+        # Sentences a[i:si] became b[j:sj]: diff that gap by character.
+        blocks += _diff(old, a_off[i], a_off[si], new, b_off[j], b_off[sj], budget)
+        if n:
+            blocks.append((a_off[si], b_off[sj], a_off[si + n] - a_off[si]))
+        i, j = si + n, sj + n
+    if suffix:
+        blocks.append((a_end, b_end, suffix))
+    return _merge(blocks)
+
+
+class Mapping:
+    """Old-content offsets to new-content offsets through matching blocks."""
+
+    def __init__(self, old: str, new: str):
+        self.old = old
+        self.new = new
+        self.blocks = matching_blocks(old, new)
+        self._starts = [blk[0] for blk in self.blocks]
+
+    def position(self, pos: int) -> int | None:
+        """Where the character at ``pos`` went, or ``None`` if it was removed."""
+        i = bisect.bisect_right(self._starts, pos) - 1
+        if i >= 0:
+            a, b, n = self.blocks[i]
+            if pos < a + n:
+                return b + pos - a
+        return None
+
+    def nearby(self, pos: int) -> int:
+        """Best guess for ``pos`` even when its character was removed."""
+        i = bisect.bisect_right(self._starts, pos) - 1
+        if i < 0:
+            return 0
+        a, b, n = self.blocks[i]
+        return b + min(pos - a, n)
+
+    def clause(self, start: int | None, end: int | None, text: str | None) -> tuple[int, int] | None:
+        """New ``(start, end)`` of a clause, or ``None`` if its text is gone."""
+        if start is not None and end is not None and 0 <= start < end <= len(self.old):
+            text = self.old[start:end]
+            first, last = self.position(start), self.position(end - 1)
+            if first is not None and last is not None and self.new[first:last + 1] == text:
+                return first, last + 1
+            hint = self.nearby(start)
+        else:
+            hint = 0
+        if not text:
+            return None
+        after = self.new.find(text, hint)
+        before = self.new.rfind(text, 0, hint + len(text) - 1) if hint else -1
+        if after < 0 and before < 0:
+            return None
+        found = before if after < 0 or (before >= 0 and hint - before < after - hint) else after
+        return found, found + len(text)
+
+
+def reanchor(session, contract_id: str, old: str, new: str) -> int:
+    """Move the clause offsets of the contract's risks from ``old`` to ``new``
+    content in one statement; returns the number of risks changed."""
+    rows = session.execute(
+        select(Risk.id, Risk.contract_id, Risk.clause, Risk.clause_start, Risk.clause_end, Risk.clause_missing)
+        .where(
+            Risk.contract_id == contract_id,
+            or_(Risk.clause_start.is_not(None), Risk.clause_missing),
+        )
+    ).all()
+    if not rows:
+        return 0
+    mapping = Mapping(old, new)
+    targets, values = [], []
+    for r in rows:
+        span = mapping.clause(r.clause_start, r.clause_end, r.clause)
+        start, end = span if span else (None, None)
+        if (start, end, span is None) != (r.clause_start, r.clause_end, r.clause_missing):
+            targets.append(r)
+            values.append({"row_id": r.id, "start": start, "end": end, "missing": span is None})
+    if not targets:
+        return 0
+    # Counter row before the row locks, in the order every writer takes them.
+    lock_sequence(session.connection())
+    table = Risk.__table__
+    session.connection().execute(
+        table.update()
+        .where(table.c.id == bindparam("row_id"))
+        .values(clause_start=bindparam("start"), clause_end=bindparam("end"), clause_missing=bindparam("missing")),
+        values,
+    )
+    stamp_ids(session, Risk, targets, ("clause_start", "clause_end", "clause_missing"))
+    bump(session.connection(), {"risks"})
+    return len(targets)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # Binary search with C-level comparisons; a character loop is far slower.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.startswith(b[lo:mid], lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, prefix: int) -> int:
+    lo, hi = 0, min(len(a), len(b)) - prefix
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a.endswith(b[len(b) - mid:len(b) - lo], 0, len(a) - lo):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _offsets(segments: list[str], start: int) -> list[int]:
+    out = [start]
+    for s in segments:
+        out.append(out[-1] + len(s))
+    return out
+
+
+def _merge(blocks: list[tuple[int, int, int]]) -> list[tuple[int, int, int]]:
+    out: list[tuple[int, int, int]] = []
+    for a, b, n in blocks:
+        if not n:
+            continue
+        if out and out[-1][0] + out[-1][2] == a and out[-1][1] + out[-1][2] == b:
+            out[-1] = (out[-1][0], out[-1][1], out[-1][2] + n)
+        else:
+            out.append((a, b, n))
+    return out
+
+
+def _patience(a: list[int], b: list[int], budget: list[int]) -> list[tuple[int, int, int]]:
+    """Common runs of two sentence sequences, anchored on unique sentences."""
+    in_a: dict[int, int] = {}
+    for x in a:
+        in_a[x] = in_a.get(x, 0) + 1
+    in_b: dict[int, int] = {}
+    for x in b:
+        in_b[x] = in_b.get(x, 0) + 1
+    where = {x: j for j, x in enumerate(b)}
+    pairs = [(i, where[x]) for i, x in enumerate(a) if in_a[x] == 1 and in_b.get(x) == 1]
+    out: list[tuple[int, int, int]] = []
+    i = j = 0
+    for ai, bj in _increasing(pairs) + [(len(a), len(b))]:
+        out += _diff(a, i, ai, b, j, bj, budget)
+        if ai < len(a):
+            out.append((ai, bj, 1))
+        i, j = ai + 1, bj + 1
+    return out
+
+
+def _increasing(pairs: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Longest subsequence of ``pairs`` (sorted by the first item) whose
+    second items increase, by patience sorting."""
+    tops: list[int] = []  # smallest second item ending a run of each length
+    ends: list[int] = []  # index into pairs of that run's last pair
+    back = [-1] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        n = bisect.bisect_left(tops, j)
+        back[k] = ends[n - 1] if n else -1
+        if n == len(tops):
+            tops.append(j)
+            ends.append(k)
+        else:
+            tops[n] = j
+            ends[n] = k
+    out = []
+    k = ends[-1] if ends else -1
+    while k >= 0:
+        out.append(pairs[k])
+        k = back[k]
+    return out[::-1]
+
+
+def _diff(a, a0: int, a1: int, b, b0: int, b1: int, budget: list[int]) -> list[tuple[int, int, int]]:
+    """Common runs of ``a[a0:a1]`` and ``b[b0:b1]``. ``budget[0]`` is the
+    number of steps left; past it only the common prefix and suffix count."""
+    out: list[tuple[int, int, int]] = []
+    try:
+        _myers(a, a0, a1, b, b0, b1, out, budget)
+    except _OutOfSteps:
+        return _merge(_ends(a, a0, a1, b, b0, b1))
+    return out
+
+
+def _ends(a, a0: int, a1: int, b, b0: int, b1: int) -> list[tuple[int, int, int]]:
+    """The common prefix and suffix of the two ranges, as runs."""
+    n = 0
+    while a0 + n < a1 and b0 + n < b1 and a[a0 + n] == b[b0 + n]:
+        n += 1
+    s = 0
+    while a1 - s > a0 + n and b1 - s > b0 + n and a[a1 - 1 - s] == b[b1 - 1 - s]:
+        s += 1
+    return [(a0, b0, n), (a1 - s, b1 - s, s)]
+
+
+def _myers(a, a0: int, a1: int, b, b0: int, b1: int, out: list, budget: list[int]) -> None:
+    n = 0
+    while a0 + n < a1 and b0 + n < b1 and a[a0 + n] == b[b0 + n]:
+        n += 1
+    if n:
+        out.append((a0, b0, n))
+        a0 += n
+        b0 += n
+    s = 0
+    while a1 - s > a0 and b1 - s > b0 and a[a1 - 1 - s] == b[b1 - 1 - s]:
+        s += 1
+    a1 -= s
+    b1 -= s
+    if a0 < a1 and b0 < b1:
+        x, y = _bisect(a, a0, a1, b, b0, b1, budget)
+        if x is not None:
+            _myers(a, a0, x, b, b0, y, out, budget)
+            _myers(a, x, a1, b, y, b1, out, budget)
+    if s:
+        out.append((a1, b1, s))
+
+
+def _bisect(a, a0: int, a1: int, b, b0: int, b1: int, budget: list[int]) -> tuple[int | None, int | None]:
+    """Myers' middle snake: a point on a shortest edit path, found by walking
+    forward from the start and backward from the end until the paths meet.
+    ``(None, None)`` when the ranges share nothing."""
+    n, m = a1 - a0, b1 - b0
+    max_d = (n + m + 1) // 2
+    offset = max_d + 1
+    size = 2 * offset + 1
+    v1 = [-1] * size
+    v2 = [-1] * size
+    v1[offset + 1] = v2[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(max_d):
+        budget[0] -= 2 * d + 2
+        if budget[0] < 0:
+            raise _OutOfSteps
+        for k1 in range(-d + k1start, d + 1 - k1end, 2):
+            i = offset + k1
+            x1 = v1[i + 1] if k1 == -d or (k1 != d and v1[i - 1] < v1[i + 1]) else v1[i - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a0 + x1] == b[b0 + y1]:
+                x1 += 1
+                y1 += 1
+            v1[i] = x1
+            if x1 > n:
+                k1end += 2
+            elif y1 > m:
+                k1start += 2
+            elif front:
+                j = offset + delta - k1
+                if 0 <= j < size and v2[j] != -1 and x1 >= n - v2[j]:
+                    return a0 + x1, b0 + y1
+        for k2 in range(-d + k2start, d + 1 - k2end, 2):
+            i = offset + k2
+            x2 = v2[i + 1] if k2 == -d or (k2 != d and v2[i - 1] < v2[i + 1]) else v2[i - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a1 - 1 - x2] == b[b1 - 1 - y2]:
+                x2 += 1
+                y2 += 1
+            v2[i] = x2
+            if x2 > n:
+                k2end += 2
+            elif y2 > m:
+                k2start += 2
+            elif not front:
+                j = offset + delta - k2
+                if 0 <= j < size and v1[j] != -1:
+                    x1 = v1[j]
+                    if x1 >= n - x2:
+                        return a0 + x1, b0 + x1 - (j - offset)
+    return None, None
+
+
+def _bench(pages: int, risks: int, edits: int) -> None:
+    random.seed(0)
+    words = "甲方乙方应当按照本合同约定履行义务支付价款交付货物承担违约责任保密期限争议解决"
+    paragraphs = []
+    while sum(map(len, paragraphs)) < pages * 2000:
+        sentence = "".join(random.choice(words) for _ in range(random.randint(20, 60)))
+        paragraphs.append(f"第{len(paragraphs) + 1}条 {sentence}。\n")
+    old = "".join(paragraphs)
+    clauses = []
+    for _ in range(risks):
+        start = random.randrange(len(old) - 80)
+        clauses.append((start, start + random.randint(10, 80)))
+    new = old
+    for _ in range(edits):
+        pos = random.randrange(len(new))
+        new = new[:pos] + "（补充）" + new[pos + random.randint(0, 20):]
+
+    started = time.perf_counter()
+    mapping = Mapping(old, new)
+    diffed = time.perf_counter()
+    spans = [mapping.clause(s, e, old[s:e]) for s, e in clauses]
+    done = time.perf_counter()
+    kept = sum(1 for (s, e), span in zip(clauses, spans) if span and new[span[0]:span[1]] == old[s:e])
+    print(f"content {len(old)} -> {len(new)} chars, {len(mapping.blocks)} matching blocks")
+    print(f"diff {(diffed - started) * 1000:.1f} ms, remap {risks} risks {(done - diffed) * 1000:.1f} ms")
+    intact = sum(1 for s, e in clauses if old[s:e] in new)
+    print(f"{kept} re-anchored, {sum(1 for s in spans if s is None)} missing ({intact} clauses still in the text)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="MeFlow risk clause re-anchoring")
+    parser.add_argument("command", choices=["bench"])
+    parser.add_argument("--pages", type=int, default=100, help="about 2,000 characters each")
+    parser.add_argument("--risks", type=int, default=500)
+    parser.add_argument("--edits", type=int, default=50, help="random replacements applied to the copy")
+    args = parser.parse_args(argv)
+    _bench(args.pages, args.risks, args.edits)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Contract content, stored apart from the ``contracts`` row.
+
+``contracts`` holds only the short fields every list, count and delete
+reads. The text lives in ``contract_bodies`` (one row per contract: sha256
+``hash``, UTF-8 ``size`` and ``data``), reached through ``Contract.body``,
+which loads only when ``Contract.content`` is read.
+
+On SQLite ``data`` is zlib-compressed (``CONTENT_COMPRESS_LEVEL``, default 6)
+and the ``contract_text(data)`` SQL function, registered on every
+connection, decompresses it for ``LIKE`` filters, the ``fields=content``
+projection and the FTS index (see ``search.py``). PostgreSQL already
+compresses large values itself (TOAST), so there ``data`` is the plain UTF-8
+text and SQL reads it with ``convert_from``.
+
+    python bodies.py stats     stored vs. uncompressed size of all contents
+"""
+import argparse
+import os
+import sys
+import zlib
+
+from sqlalchemy import func, text
+
+from database import IS_SQLITE
+from services.ai_cache import content_hash
+
+COMPRESS_LEVEL = int(os.getenv("CONTENT_COMPRESS_LEVEL", "6"))
+
+
+def pack(content: str, compress: bool = IS_SQLITE) -> dict:
+    """Column values of the body row holding ``content``."""
+    raw = content.encode()
+    return {
+        "hash": content_hash(content),
+        "size": len(raw),
+        "data": zlib.compress(raw, COMPRESS_LEVEL) if compress else raw,
+    }
+
+
+def unpack(data: bytes, compress: bool = IS_SQLITE) -> str:
+    return (zlib.decompress(data) if compress else bytes(data)).decode()
+
+
+def text_of(data):
+    """SQL expression for the text in a ``data`` column."""
+    return func.contract_text(data) if IS_SQLITE else func.convert_from(data, "UTF8")
+
+
+def register_functions(dbapi_connection) -> None:
+    """Install ``contract_text`` on a new SQLite connection."""
+    dbapi_connection.create_function(
+        "contract_text", 1, lambda data: None if data is None else unpack(data, True), deterministic=True,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="MeFlow contract content storage")
+    parser.add_argument("command", choices=["stats"])
+    parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        n, size, stored = db.execute(text(
+            "SELECT count(*), coalesce(sum(size), 0), coalesce(sum(length(data)), 0) FROM contract_bodies"
+        )).one()
+        ratio = f", {stored / size:.0%} of the text" if size else ""
+        print(f"{n} contract(s): {size} bytes of text stored in {stored} bytes{ratio}")
+        # Edited contracts also keep a packed copy of their current text (see textlog.py).
+        n, stored = db.execute(text("SELECT count(*), coalesce(sum(length(data)), 0) FROM text_snapshots")).one()
+        print(f"{n} text snapshot(s) stored in {stored} bytes")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
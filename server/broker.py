@@ -0,0 +1,79 @@
+"""Local stand-in for a pub/sub broker, relaying ``/api/events`` messages
+between uvicorn workers.
+
+Peers connect over TCP and write newline-delimited JSON; every line is
+forwarded to all other peers. Each peer has a bounded outgoing buffer, and a
+peer that stops reading until it fills is disconnected (it reconnects and
+tells its clients to resync) rather than growing the relay's memory.
+
+A worker with ``EVENTS_BROKER`` set hosts the relay itself when none is
+listening, so nothing extra has to run. To run it as its own process:
+
+    python broker.py --listen 127.0.0.1:8765
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+
+# Longest message line (one committed transaction's events).
+LINE_LIMIT = 16 * 1024 * 1024
+PEER_BUFFER = int(os.getenv("EVENTS_BROKER_BUFFER", "1024"))
+
+
+def parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+async def start(host: str, port: int) -> asyncio.Server:
+    peers: dict[asyncio.StreamWriter, asyncio.Queue[bytes]] = {}
+
+    async def send(writer: asyncio.StreamWriter, queue: asyncio.Queue[bytes]) -> None:
+        while True:
+            writer.write(await queue.get())
+            await writer.drain()
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peers[writer] = queue = asyncio.Queue(PEER_BUFFER)
+        sender = asyncio.create_task(send(writer, queue))
+        try:
+            while line := await reader.readline():
+                for other, other_queue in list(peers.items()):
+                    if other is writer:
+                        continue
+                    try:
+                        other_queue.put_nowait(line)
+                    except asyncio.QueueFull:
+                        other.close()
+        except (ConnectionError, ValueError):  # ValueError: line over LINE_LIMIT
+            pass
+        finally:
+            peers.pop(writer, None)
+            sender.cancel()
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    return await asyncio.start_server(handle, host, port, limit=LINE_LIMIT)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="MeFlow change-feed relay")
+    parser.add_argument("--listen", default=os.getenv("EVENTS_BROKER") or "127.0.0.1:8765")
+    args = parser.parse_args(argv)
+
+    async def serve() -> None:
+        server = await start(*parse_address(args.listen))
+        print(f"relaying on {args.listen}")
+        async with server:
+            await server.serve_forever()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Change sequence and tombstones for delta sync (``/api/sync``).
+
+Every insert or update of a contract, risk, task, annotation or text edit
+stamps the row's ``change_seq`` with a number from one global counter
+(``sync_state.seq``), and every delete records a ``sync_tombstones`` row with
+a number of its own. A client that has seen everything up to a cursor asks
+for rows and tombstones with larger numbers.
+
+The counter row is updated at the start of a write and stays locked until
+commit, so writers hold numbers in commit order: once a number is visible,
+every smaller one is committed (or rolled back along with its counter
+update). ORM flushes are stamped by the ``before_flush`` hook below; Core
+statements (bulk import, batch updates) call ``stamp_rows`` / ``stamp_ids``.
+
+The same places record a compact event per change (entity, id, op, seq and,
+for updates, the changed wire fields). They are published to ``/api/events``
+once the transaction commits and dropped if it rolls back.
+
+    python changes.py prune --days 30    drop tombstones older than 30 days
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import DateTime, bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+
+from migrations import VERSIONED_TABLES
+from schemas import ANNOTATION_COLUMNS, CONTRACT_COLUMNS, RISK_COLUMNS, TASK_COLUMNS, TEXT_EDIT_COLUMNS
+from services.events import hub
+
+# Table -> entity name used on the wire (``/api/sync`` keys, event ``entity``).
+ENTITY_KEYS = {
+    "contracts": "contracts",
+    "risks": "risks",
+    "tasks": "tasks",
+    "annotations": "annotations",
+    "text_edits": "textEdits",
+}
+# Table -> column -> wire field, for the ``fields`` of update events.
+_WIRE_FIELDS = {
+    table: {col: wire for wire, cols in columns.items() for col in cols}
+    for table, columns in (
+        ("contracts", CONTRACT_COLUMNS),
+        ("risks", RISK_COLUMNS),
+        ("tasks", TASK_COLUMNS),
+        ("annotations", ANNOTATION_COLUMNS),
+        ("text_edits", TEXT_EDIT_COLUMNS),
+    )
+}
+
+_ALLOCATE_SQL = text("UPDATE sync_state SET value = value + :n WHERE name = 'seq'")
+_STATE_SQL = text("SELECT value FROM sync_state WHERE name = :name")
+_TOMBSTONE_SQL = text(
+    "INSERT INTO sync_tombstones (seq, entity, row_id, deleted_at) VALUES (:seq, :entity, :row_id, :deleted_at)"
+).bindparams(bindparam("deleted_at", type_=DateTime(timezone=True)))
+
+
+def allocate(conn, n: int) -> int:
+    """Reserve ``n`` consecutive sequence numbers; returns the first."""
+    conn.execute(_ALLOCATE_SQL, {"n": n})
+    return conn.execute(_STATE_SQL, {"name": "seq"}).scalar_one() - n + 1
+
+
+def lock_sequence(conn) -> None:
+    """Take the counter row now, before any row locks, the order the flush
+    hook takes them in. Call first in transactions that lock rows with
+    ``SELECT … FOR UPDATE`` and stamp them later."""
+    allocate(conn, 0)
+
+
+def stamp_rows(conn, rows: list[dict]) -> None:
+    """Set ``change_seq`` on column dicts about to be inserted with Core."""
+    if rows:
+        for seq, row in enumerate(rows, allocate(conn, len(rows))):
+            row["change_seq"] = seq
+
+
+def record_inserts(session: Session, model, rows: list[dict]) -> None:
+    """Queue insert events for stamped rows that made it into the table."""
+    table = model.__tablename__
+    _record(session, [_event(table, r["id"], "insert", r["change_seq"], r.get("contract_id")) for r in rows])
+
+
+def stamp_ids(session: Session, model, targets, columns) -> None:
+    """Stamp rows changed by a Core ``UPDATE`` of ``columns`` and queue their
+    events. ``targets`` are rows with ``id`` and, where the table has one,
+    ``contract_id``."""
+    if not targets:
+        return
+    table = model.__table__
+    first = allocate(session.connection(), len(targets))
+    session.connection().execute(
+        table.update().where(table.c.id == bindparam("row_id")).values(change_seq=bindparam("seq")),
+        [{"row_id": t.id, "seq": seq} for seq, t in enumerate(targets, first)],
+    )
+    fields = _fields(table.name, columns)
+    _record(session, [
+        _event(table.name, t.id, "update", seq, getattr(t, "contract_id", None), fields)
+        for seq, t in enumerate(targets, first)
+    ])
+
+
+def pruned_through(conn) -> int:
+    """Highest tombstone sequence number removed by ``prune``."""
+    return conn.execute(_STATE_SQL, {"name": "pruned"}).scalar_one()
+
+
+def _tracked(obj) -> bool:
+    return getattr(obj, "__tablename__", None) in VERSIONED_TABLES
+
+
+def _fields(table: str, columns) -> list[str]:
+    wire = _WIRE_FIELDS[table]
+    return list(dict.fromkeys(wire[c] for c in columns if c in wire))
+
+
+def _event(table: str, row_id: str, op: str, seq: int, contract_id=None, fields=None) -> dict:
+    out = {"entity": ENTITY_KEYS[table], "id": row_id, "op": op, "seq": seq}
+    if contract_id:
+        out["contractId"] = contract_id
+    if fields is not None:
+        out["fields"] = fields
+    return out
+
+
+def _record(session: Session, events: list[dict]) -> None:
+    session.info.setdefault("change_events", []).extend(events)
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_changes(session: Session, flush_context, instances) -> None:
+    # before_flush, so the stamp goes out in the same INSERT/UPDATE. Deleting
+    # a contract has already cascaded to its children in session.deleted.
+    changed = [o for o in session.new if _tracked(o)]
+    changed += [
+        o for o in session.dirty if _tracked(o) and session.is_modified(o, include_collections=False)
+    ]
+    deleted = [o for o in session.deleted if _tracked(o)]
+    if not changed and not deleted:
+        return
+    conn = session.connection()
+    first = allocate(conn, len(changed) + len(deleted))
+    for seq, obj in enumerate(changed, first):
+        obj.change_seq = seq
+    # New rows get their ids during the flush; their events wait for after_flush.
+    session.info["change_stamped"] = changed
+    if deleted:
+        now = datetime.now(timezone.utc)
+        tombstones = list(enumerate(deleted, first + len(changed)))
+        conn.execute(
+            _TOMBSTONE_SQL,
+            [{"seq": seq, "entity": o.__tablename__, "row_id": o.id, "deleted_at": now} for seq, o in tombstones],
+        )
+        _record(session, [
+            _event(o.__tablename__, o.id, "delete", seq, getattr(o, "contract_id", None)) for seq, o in tombstones
+        ])
+
+
+@event.listens_for(Session, "after_flush")
+def _record_changes(session: Session, flush_context) -> None:
+    # Attribute history still holds this flush's changes here.
+    events = []
+    for obj in session.info.pop("change_stamped", ()):
+        contract_id = getattr(obj, "contract_id", None)
+        if obj in session.new:
+            events.append(_event(obj.__tablename__, obj.id, "insert", obj.change_seq, contract_id))
+            continue
+        state = inspect(obj)
+        changed = [a.key for a in state.mapper.column_attrs if state.attrs[a.key].history.has_changes()]
+        # A contract's content is a row of its own (see bodies.py).
+        body = state.dict.get("body")
+        if body is not None and (body in session.new or session.is_modified(body)):
+            changed.append("content")
+        fields = _fields(obj.__tablename__, changed)
+        events.append(_event(obj.__tablename__, obj.id, "update", obj.change_seq, contract_id, fields))
+    _record(session, events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session) -> None:
+    hub.publish(session.info.pop("change_events", None))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session) -> None:
+    session.info.pop("change_events", None)
+    session.info.pop("change_stamped", None)
+
+
+def prune(db, days: float) -> int:
+    """Drop tombstones older than ``days``. Clients whose cursor predates the
+    newest dropped one must resync from 0 (``/api/sync`` answers 410)."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    horizon = db.execute(
+        text("SELECT max(seq) FROM sync_tombstones WHERE deleted_at < :cutoff").bindparams(
+            bindparam("cutoff", type_=DateTime(timezone=True))
+        ),
+        {"cutoff": cutoff},
+    ).scalar()
+    if horizon is None:
+        return 0
+    removed = db.execute(text("DELETE FROM sync_tombstones WHERE seq <= :h"), {"h": horizon}).rowcount
+    db.execute(text("UPDATE sync_state SET value = :h WHERE name = 'pruned' AND value < :h"), {"h": horizon})
+    return removed
+
+
+def main(argv: list[str] | None = None) -> int:
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="MeFlow sync tombstones")
+    parser.add_argument("command", choices=["prune"])
+    parser.add_argument("--days", type=float, default=30)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        removed = prune(db, args.days)
+        db.commit()
+        print(f"removed {removed} tombstone(s), resync horizon {pruned_through(db.connection())}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""Dashboard statistics: single-pass aggregate and the optional counters table.
+
+With ``STATS_COUNTERS=1`` every flush that inserts, deletes or re-classifies a
+contract, task or risk adjusts ``stat_counters`` in the same transaction, and
+``/api/stats/dashboard`` reads four rows instead of scanning three tables.
+
+    python counters.py check      compare counters with a fresh aggregate
+    python counters.py rebuild    recompute counters from the tables
+"""
+import argparse
+import os
+import sys
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from models import Contract, Risk, Task
+
+STATS_COUNTERS = os.getenv("STATS_COUNTERS", "").lower() in ("1", "true", "yes")
+
+COUNTER_NAMES = ("contracts_total", "tasks_total", "tasks_completed", "risks_high_open")
+
+AGGREGATE_SQL = text(
+    """
+    SELECT c.contracts_total, t.tasks_total, t.tasks_completed, r.risks_high_open
+    FROM (SELECT count(*) AS contracts_total FROM contracts) AS c,
+         (SELECT count(*) AS tasks_total,
+                 coalesce(sum(CASE WHEN status = 'completed' THEN 1 ELSE 0 END), 0) AS tasks_completed
+          FROM tasks) AS t,
+         (SELECT coalesce(sum(CASE WHEN level = 'high' AND status != 'resolved' THEN 1 ELSE 0 END), 0)
+                 AS risks_high_open
+          FROM risks) AS r
+    """
+)
+
+
+def aggregate_counts(db) -> dict[str, int]:
+    """All dashboard counts in one round trip, one scan per table."""
+    row = db.execute(AGGREGATE_SQL).one()
+    return {name: int(row[i] or 0) for i, name in enumerate(COUNTER_NAMES)}
+
+
+def read_counters(db) -> dict[str, int]:
+    rows = db.execute(text("SELECT name, value FROM stat_counters")).all()
+    stored = {name: value for name, value in rows}
+    return {name: int(stored.get(name, 0)) for name in COUNTER_NAMES}
+
+
+def rebuild_counters(db) -> dict[str, int]:
+    counts = aggregate_counts(db)
+    db.execute(text("DELETE FROM stat_counters"))
+    db.execute(
+        text("INSERT INTO stat_counters (name, value) VALUES (:name, :value)"),
+        [{"name": k, "value": v} for k, v in counts.items()],
+    )
+    return counts
+
+
+def dashboard_counts(db) -> dict[str, int]:
+    return read_counters(db) if STATS_COUNTERS else aggregate_counts(db)
+
+
+# ── Incremental maintenance ──────────────────────────────────────────
+
+def _old(obj, attr: str):
+    """Value of ``attr`` as it was before the pending change."""
+    hist = inspect(obj).attrs[attr].history
+    if hist.deleted:
+        return hist.deleted[0]
+    return getattr(obj, attr)
+
+
+def _task_completed(status) -> int:
+    return 1 if status == "completed" else 0
+
+
+def _risk_high_open(level, status) -> int:
+    return 1 if level == "high" and status != "resolved" else 0
+
+
+def flush_deltas(session: Session) -> dict[str, int]:
+    deltas = dict.fromkeys(COUNTER_NAMES, 0)
+    for obj in session.new:
+        if isinstance(obj, Contract):
+            deltas["contracts_total"] += 1
+        elif isinstance(obj, Task):
+            deltas["tasks_total"] += 1
+            deltas["tasks_completed"] += _task_completed(obj.status)
+        elif isinstance(obj, Risk):
+            deltas["risks_high_open"] += _risk_high_open(obj.level, obj.status)
+    for obj in session.deleted:
+        if isinstance(obj, Contract):
+            deltas["contracts_total"] -= 1
+        elif isinstance(obj, Task):
+            deltas["tasks_total"] -= 1
+            deltas["tasks_completed"] -= _task_completed(_old(obj, "status"))
+        elif isinstance(obj, Risk):
+            deltas["risks_high_open"] -= _risk_high_open(_old(obj, "level"), _old(obj, "status"))
+    for obj in session.dirty:
+        if isinstance(obj, Task):
+            deltas["tasks_completed"] += _task_completed(obj.status) - _task_completed(_old(obj, "status"))
+        elif isinstance(obj, Risk):
+            deltas["risks_high_open"] += (
+                _risk_high_open(obj.level, obj.status)
+                - _risk_high_open(_old(obj, "level"), _old(obj, "status"))
+            )
+    return {k: v for k, v in deltas.items() if v}
+
+
+def insert_deltas(model, rows: list[dict]) -> dict[str, int]:
+    """Deltas for rows inserted with Core ``insert()``, which skips the flush hook."""
+    if model is Contract:
+        deltas = {"contracts_total": len(rows)}
+    elif model is Task:
+        deltas = {
+            "tasks_total": len(rows),
+            "tasks_completed": sum(_task_completed(r.get("status")) for r in rows),
+        }
+    elif model is Risk:
+        deltas = {"risks_high_open": sum(_risk_high_open(r.get("level"), r.get("status")) for r in rows)}
+    else:
+        deltas = {}
+    return {k: v for k, v in deltas.items() if v}
+
+
+def update_deltas(model, old_rows, values: dict) -> dict[str, int]:
+    """Deltas for a set-based ``UPDATE`` applying ``values`` to rows whose
+    prior ``level``/``status`` are in ``old_rows``."""
+    if model is Task:
+        delta = sum(
+            _task_completed(values.get("status", r.status)) - _task_completed(r.status) for r in old_rows
+        )
+        return {"tasks_completed": delta} if delta else {}
+    if model is Risk:
+        delta = sum(
+            _risk_high_open(values.get("level", r.level), values.get("status", r.status))
+            - _risk_high_open(r.level, r.status)
+            for r in old_rows
+        )
+        return {"risks_high_open": delta} if delta else {}
+    return {}
+
+
+def apply_deltas(conn, deltas: dict[str, int]) -> None:
+    if deltas:
+        conn.execute(
+            text("UPDATE stat_counters SET value = value + :delta WHERE name = :name"),
+            [{"name": k, "delta": v} for k, v in deltas.items()],
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def _maintain_counters(session: Session, flush_context) -> None:
+    # after_flush still sees the pre-flush new/dirty/deleted sets and attribute
+    # history, and runs on the flush's connection, so the update commits (or
+    # rolls back) with the rows it counts.
+    if STATS_COUNTERS:
+        apply_deltas(session.connection(), flush_deltas(session))
+
+
+def main(argv: list[str] | None = None) -> int:
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="MeFlow dashboard counters")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            counts = rebuild_counters(db)
+            db.commit()
+            print("rebuilt", counts)
+            return 0
+        expected, stored = aggregate_counts(db), read_counters(db)
+        drift = {k: (stored[k], expected[k]) for k in COUNTER_NAMES if stored[k] != expected[k]}
+        for name, (have, want) in drift.items():
+            print(f"{name}: counter={have} actual={want}")
+        print("counters consistent" if not drift else f"{len(drift)} counter(s) drifted")
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
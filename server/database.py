@@ -1,15 +1,99 @@
 import os
-from sqlalchemy import create_engine
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-DATABASE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'meflow.db')}"
+DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{os.path.join(DATA_DIR, 'meflow.db')}"
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Applied to every new SQLite connection: WAL lets readers proceed alongside a
+# writer, busy_timeout makes concurrent writers wait instead of failing with
+# "database is locked", and NORMAL sync is durable under WAL except for the
+# last transactions before an OS crash.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negative: KiB
+    "foreign_keys": "ON",
+}
+
+# Connection pool for server databases (DATABASE_URL=postgresql://…).
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Request handlers use an AsyncSession on an async driver, so a slow query
+# waits on the event loop instead of holding a threadpool slot. DB_ASYNC=0
+# serves them from the blocking engine instead (each call in the threadpool).
+# Migrations, seeding, CLIs and background worker threads always use the
+# blocking engine.
+DB_ASYNC = os.getenv("DB_ASYNC", "1").lower() in ("1", "true", "yes")
+
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return _ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+def _pool_options() -> dict:
+    if IS_SQLITE:
+        return {}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+def _register_sqlite_functions(dbapi_connection, connection_record) -> None:
+    from bodies import register_functions  # bodies imports this module
+
+    register_functions(dbapi_connection)
+
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    **_pool_options(),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(async_url(DATABASE_URL), **_pool_options()) if DB_ASYNC else None
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(engine, "connect", _register_sqlite_functions)
+    if async_engine is not None:
+        event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        event.listen(async_engine.sync_engine, "connect", _register_sqlite_functions)
+AsyncSessionLocal = (
+    async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False) if DB_ASYNC else None
+)
+
 
 class Base(DeclarativeBase):
     pass
@@ -21,3 +105,98 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class ThreadedSession:
+    """The part of ``AsyncSession`` the routers use, backed by a blocking
+    ``Session`` whose calls run in the threadpool (``DB_ASYNC=0``)."""
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, obj) -> None:
+        self.sync_session.add(obj)
+
+    def add_all(self, objs) -> None:
+        self.sync_session.add_all(objs)
+
+    def get_bind(self):
+        return self.sync_session.get_bind()
+
+    async def execute(self, statement, params=None):
+        def run():
+            result = self.sync_session.execute(statement, params)
+            # Buffer rows in the worker thread; the caller iterates on the loop.
+            return result.freeze()() if getattr(result, "returns_rows", True) else result
+
+        return await run_in_threadpool(run)
+
+    async def scalars(self, statement, params=None):
+        return (await self.execute(statement, params)).scalars()
+
+    async def scalar(self, statement, params=None):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params)
+
+    async def get(self, model, ident, **kw):
+        return await run_in_threadpool(lambda: self.sync_session.get(model, ident, **kw))
+
+    async def delete(self, obj) -> None:
+        await run_in_threadpool(self.sync_session.delete, obj)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, obj) -> None:
+        await run_in_threadpool(self.sync_session.refresh, obj)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+
+async def get_async_db():
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+    db = ThreadedSession(SessionLocal())
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+async def stream_partitions(statement, size: int):
+    """Yield the rows of ``statement`` in lists of at most ``size`` from a
+    server-side cursor, so only one partition is held in memory at a time.
+
+    Opens its own session: a streamed response outlives the request's
+    ``get_async_db`` session."""
+    statement = statement.execution_options(yield_per=size)
+    if DB_ASYNC:
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(statement)
+            async for rows in result.partitions():
+                yield rows
+        return
+    db = SessionLocal()
+    try:
+        result = await run_in_threadpool(db.execute, statement)
+        while rows := await run_in_threadpool(result.fetchmany, size):
+            yield rows
+    finally:
+        await run_in_threadpool(db.close)
+
+
+async def dispose_engines() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,84 @@
+"""Concurrency benchmark against a running API server.
+
+Each of ``--clients`` concurrent clients loops over a read-heavy mix of list,
+detail, search and dashboard requests for ``--duration`` seconds, while one
+extra client measures ``/api/health`` latency to show how responsive the event
+loop stays under database load.
+
+    python loadtest.py --url http://127.0.0.1:8000 --clients 200 --duration 10
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import httpx
+
+
+def _pct(samples: list[float], p: float) -> float:
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+async def _client(http: httpx.AsyncClient, ids: list[str], deadline: float, latencies: list[float], errors: list[int]):
+    paths = [
+        lambda: "/api/contracts/?limit=50&fields=id,name,status,riskLevel",
+        lambda: f"/api/contracts/{random.choice(ids)}",
+        lambda: f"/api/risks/?contractId={random.choice(ids)}",
+        lambda: "/api/contracts/search?q=合同&limit=10",
+        lambda: "/api/stats/dashboard",
+    ]
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        try:
+            resp = await http.get(random.choice(paths)())
+            ok = resp.status_code < 500
+        except httpx.HTTPError:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - t0)
+        else:
+            errors.append(1)
+
+
+async def _probe(http: httpx.AsyncClient, deadline: float, latencies: list[float]):
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        await http.get("/api/health")
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.05)
+
+
+async def run(url: str, clients: int, duration: float) -> None:
+    limits = httpx.Limits(max_connections=clients + 1, max_keepalive_connections=clients + 1)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        ids = [c["id"] for c in (await http.get("/api/contracts/?limit=500&fields=id")).json()]
+        deadline = time.perf_counter() + duration
+        latencies: list[float] = []
+        probe: list[float] = []
+        errors: list[int] = []
+        await asyncio.gather(
+            _probe(http, deadline, probe),
+            *(_client(http, ids, deadline, latencies, errors) for _ in range(clients)),
+        )
+    print(f"clients={clients} duration={duration:.0f}s")
+    print(f"  requests  {len(latencies)} ok, {len(errors)} failed, {len(latencies) / duration:.0f} req/s")
+    print(f"  latency   p50 {_pct(latencies, 0.5):.0f} ms  p99 {_pct(latencies, 0.99):.0f} ms")
+    print(f"  /health   p50 {_pct(probe, 0.5):.0f} ms  p99 {_pct(probe, 0.99):.0f} ms")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="MeFlow API concurrency benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.url, args.clients, args.duration))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
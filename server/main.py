@@ -10,23 +10,42 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 
-from database import engine, SessionLocal
-from models import Base
+from counters import STATS_COUNTERS, rebuild_counters
+from database import engine, SessionLocal, dispose_engines
+from migrations import run_migrations
+from pagination import NEXT_CURSOR_HEADER
 from seed import seed_database
-from routers import contracts, risks, tasks, annotations, stats, ai
+from services.ai_cache import cache as ai_cache
+from services.analysis_jobs import runner as analysis_runner
+from services.events import hub as events_hub
+from services.kimi_service import start_client, close_client
+from versions import ETAG_HEADER
+from routers import contracts, risks, tasks, annotations, stats, ai, imports, exports, sync, events
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     db = SessionLocal()
     try:
         seed_database(db)
+        if STATS_COUNTERS:
+            rebuild_counters(db)
+            db.commit()
     finally:
         db.close()
+    await start_client()
+    await analysis_runner.start()
+    await events_hub.start()
     yield
+    await events_hub.stop()
+    await analysis_runner.stop()
+    ai_cache.flush_hits()
+    await close_client()
+    await dispose_engines()
 
 
 app = FastAPI(
@@ -36,12 +55,21 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Responses of at least GZIP_MIN_BYTES are compressed for clients that send
+# Accept-Encoding: gzip (list bodies shrink several-fold); smaller ones are not
+# worth the CPU. Event streams are skipped, as are gzip exports, which carry
+# their own Content-Encoding (see routers/exports.py).
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "1"))
+
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_BYTES, compresslevel=GZIP_LEVEL)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ai.CACHE_HEADER, ETAG_HEADER],
 )
 
 
@@ -60,6 +88,10 @@ app.include_router(annotations.router)
 app.include_router(annotations.text_edits_router)
 app.include_router(stats.router)
 app.include_router(ai.router)
+app.include_router(imports.router)
+app.include_router(exports.router)
+app.include_router(sync.router)
+app.include_router(events.router)
 
 
 @app.get("/api/health")
@@ -0,0 +1,650 @@
+"""Versioned schema migrations.
+
+Each migration runs once, in order, inside its own transaction and is recorded
+in ``schema_version``. The transaction is taken exclusively before the version
+is checked (``BEGIN IMMEDIATE`` on SQLite, an advisory lock on PostgreSQL), so
+workers starting together apply each step once, one after another. Steps are
+written to be idempotent (``IF NOT EXISTS`` / ``checkfirst``) so databases
+created by the old startup ``create_all`` upgrade in place. Table definitions
+here are frozen copies: never import ORM models.
+
+    python migrations.py                upgrade to the latest version
+    python migrations.py status         list applied / pending versions
+    python migrations.py check-plans    assert list queries use their indexes
+"""
+import argparse
+import hashlib
+import sys
+import zlib
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table,
+    Text, bindparam, inspect, select, text,
+)
+from sqlalchemy.engine import Connection, Engine
+
+version_table = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String(128), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+# ── 1: baseline ──────────────────────────────────────────────────────
+
+_v1 = MetaData()
+
+_contracts = Table(
+    "contracts", _v1,
+    Column("id", String(32), primary_key=True),
+    Column("name", String(256), nullable=False),
+    Column("type", String(64), nullable=False),
+    Column("party", String(256), nullable=False),
+    Column("amount", Float, nullable=False),
+    Column("signed_date", String(32), nullable=False),
+    Column("expiry_date", String(32), nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("ai_analyzed", Boolean, nullable=False),
+    Column("risk_level", String(16), nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("updated_at", DateTime(timezone=True), nullable=False),
+)
+
+_risks = Table(
+    "risks", _v1,
+    Column("id", String(32), primary_key=True),
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+    Column("contract_name", String(256), nullable=False),
+    Column("type", String(32), nullable=False),
+    Column("level", String(16), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("suggestion", Text, nullable=False),
+    Column("clause", Text, nullable=True),
+    Column("clause_start", Integer, nullable=True),
+    Column("clause_end", Integer, nullable=True),
+    Column("status", String(32), nullable=False),
+    Column("assigned_to", String(128), nullable=True),
+    Column("assigned_department", String(32), nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("resolved_at", DateTime(timezone=True), nullable=True),
+)
+
+_tasks = Table(
+    "tasks", _v1,
+    Column("id", String(32), primary_key=True),
+    Column("title", String(256), nullable=False),
+    Column("description", Text, nullable=False),
+    Column("type", String(32), nullable=False),
+    Column("priority", String(16), nullable=False),
+    Column("status", String(32), nullable=False),
+    Column("assignee", String(128), nullable=False),
+    Column("due_date", String(32), nullable=False),
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), nullable=True),
+    Column("contract_name", String(256), nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("completed_at", DateTime(timezone=True), nullable=True),
+)
+
+_annotations = Table(
+    "annotations", _v1,
+    Column("id", String(32), primary_key=True),
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+    Column("text", Text, nullable=False),
+    Column("note", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+_text_edits = Table(
+    "text_edits", _v1,
+    Column("id", String(32), primary_key=True),
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+    Column("type", String(16), nullable=False),
+    Column("text", Text, nullable=False),
+    Column("position", Integer, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _v1_baseline(conn: Connection) -> None:
+    _v1.create_all(conn, checkfirst=True)
+
+
+# ── 2: indexes matching the list/stats query shapes ──────────────────
+
+_V2_INDEXES = [
+    # Keyset pagination: ORDER BY created_at DESC, id DESC, optionally behind an equality filter.
+    Index("ix_contracts_created", _contracts.c.created_at, _contracts.c.id),
+    Index("ix_contracts_status_created", _contracts.c.status, _contracts.c.created_at, _contracts.c.id),
+    Index("ix_contracts_type_created", _contracts.c.type, _contracts.c.created_at, _contracts.c.id),
+    Index("ix_risks_created", _risks.c.created_at, _risks.c.id),
+    Index("ix_risks_contract_created", _risks.c.contract_id, _risks.c.created_at, _risks.c.id),
+    Index("ix_risks_status_created", _risks.c.status, _risks.c.created_at, _risks.c.id),
+    Index("ix_risks_level_status", _risks.c.level, _risks.c.status),
+    Index("ix_tasks_created", _tasks.c.created_at, _tasks.c.id),
+    Index("ix_tasks_contract_created", _tasks.c.contract_id, _tasks.c.created_at, _tasks.c.id),
+    Index("ix_tasks_status_created", _tasks.c.status, _tasks.c.created_at, _tasks.c.id),
+    Index("ix_tasks_priority_created", _tasks.c.priority, _tasks.c.created_at, _tasks.c.id),
+    Index("ix_annotations_contract_created", _annotations.c.contract_id, _annotations.c.created_at),
+    Index("ix_text_edits_contract_created", _text_edits.c.contract_id, _text_edits.c.created_at),
+]
+
+
+def _v2_indexes(conn: Connection) -> None:
+    for idx in _V2_INDEXES:
+        idx.create(conn, checkfirst=True)
+
+
+# ── 3: contract full-text index ──────────────────────────────────────
+
+_V3_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS contracts_fts USING fts5(
+        name, party, type, content,
+        content='contracts', content_rowid='rowid',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_ai AFTER INSERT ON contracts BEGIN
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        VALUES (new.rowid, new.name, new.party, new.type, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_ad AFTER DELETE ON contracts BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_au AFTER UPDATE OF name, party, type, content ON contracts BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, old.content);
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        VALUES (new.rowid, new.name, new.party, new.type, new.content);
+    END
+    """,
+]
+
+
+def _v3_contracts_fts(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contracts_fts'")
+    ).first()
+    for ddl in _V3_FTS_DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        conn.execute(text("INSERT INTO contracts_fts(contracts_fts) VALUES ('rebuild')"))
+
+
+# ── 4: dashboard counters ────────────────────────────────────────────
+
+_v4 = MetaData()
+
+_stat_counters = Table(
+    "stat_counters", _v4,
+    Column("name", String(64), primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+
+def _v4_stat_counters(conn: Connection) -> None:
+    # Populated by counters.rebuild_counters at startup when STATS_COUNTERS is on.
+    _v4.create_all(conn, checkfirst=True)
+
+
+# ── 5: AI result cache ───────────────────────────────────────────────
+
+_v5 = MetaData()
+
+_ai_cache = Table(
+    "ai_cache", _v5,
+    Column("key", String(64), primary_key=True),
+    Column("kind", String(16), nullable=False),
+    Column("content_hash", String(64), nullable=False),
+    Column("value", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    Column("expires_at", Float, nullable=False),
+    Column("hits", Integer, nullable=False),
+    Index("ix_ai_cache_content_hash", "content_hash"),
+    Index("ix_ai_cache_expires_at", "expires_at"),
+)
+
+
+def _v5_ai_cache(conn: Connection) -> None:
+    _v5.create_all(conn, checkfirst=True)
+
+
+# ── 6: background analysis jobs ──────────────────────────────────────
+
+_v6 = MetaData()
+
+Table("contracts", _v6, Column("id", String(32), primary_key=True))
+
+_analysis_jobs = Table(
+    "analysis_jobs", _v6,
+    Column("id", String(32), primary_key=True),
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), nullable=False),
+    Column("content_hash", String(64), nullable=False),
+    Column("status", String(16), nullable=False),
+    Column("error", Text, nullable=True),
+    Column("result", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("started_at", DateTime(timezone=True), nullable=True),
+    Column("finished_at", DateTime(timezone=True), nullable=True),
+    Index(
+        "ux_analysis_jobs_inflight", "contract_id", "content_hash",
+        unique=True,
+        sqlite_where=text("status IN ('queued', 'running')"),
+        postgresql_where=text("status IN ('queued', 'running')"),
+    ),
+    Index("ix_analysis_jobs_contract_created", "contract_id", "created_at"),
+    Index("ix_analysis_jobs_status", "status"),
+)
+
+
+def _v6_analysis_jobs(conn: Connection) -> None:
+    _analysis_jobs.create(conn, checkfirst=True)
+
+
+# ── 7: table versions (ETags) ────────────────────────────────────────
+
+_v7 = MetaData()
+
+_table_versions = Table(
+    "table_versions", _v7,
+    Column("name", String(64), primary_key=True),
+    Column("version", BigInteger, nullable=False),
+)
+
+VERSIONED_TABLES = ("contracts", "risks", "tasks", "annotations", "text_edits")
+
+
+def _v7_table_versions(conn: Connection) -> None:
+    _v7.create_all(conn, checkfirst=True)
+    # Start from the clock rather than 0 so a recreated database never
+    # repeats a version (and an ETag) handed out by the old one.
+    start = int(datetime.now(timezone.utc).timestamp() * 1000)
+    existing = set(conn.execute(select(_table_versions.c.name)).scalars())
+    rows = [{"name": n, "version": start} for n in VERSIONED_TABLES if n not in existing]
+    if rows:
+        conn.execute(_table_versions.insert(), rows)
+
+
+# ── 8: change sequence and tombstones (delta sync) ──────────────────
+
+_v8 = MetaData()
+
+_sync_state = Table(
+    "sync_state", _v8,
+    Column("name", String(64), primary_key=True),
+    Column("value", BigInteger, nullable=False),
+)
+
+_sync_tombstones = Table(
+    "sync_tombstones", _v8,
+    Column("seq", BigInteger, primary_key=True, autoincrement=False),
+    Column("entity", String(32), nullable=False),
+    Column("row_id", String(32), nullable=False),
+    Column("deleted_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _v8_change_seq(conn: Connection) -> None:
+    _v8.create_all(conn, checkfirst=True)
+    seq = 0
+    for name in VERSIONED_TABLES:
+        if "change_seq" not in {c["name"] for c in inspect(conn).get_columns(name)}:
+            conn.execute(text(f"ALTER TABLE {name} ADD COLUMN change_seq BIGINT"))
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_change_seq ON {name} (change_seq)"))
+        # Number existing rows oldest first, continuing across tables.
+        ids = conn.execute(text(f"SELECT id FROM {name} ORDER BY created_at, id")).scalars().all()
+        if ids:
+            conn.execute(
+                text(f"UPDATE {name} SET change_seq = :seq WHERE id = :id"),
+                [{"seq": seq + i, "id": row_id} for i, row_id in enumerate(ids, 1)],
+            )
+            seq += len(ids)
+    if conn.execute(select(_sync_state.c.name).where(_sync_state.c.name == "seq")).first() is None:
+        conn.execute(_sync_state.insert(), [{"name": "seq", "value": seq}, {"name": "pruned", "value": 0}])
+
+
+# ── 9: text edit numbering and snapshots (materialised text) ───────
+
+_v9 = MetaData()
+
+Table("contracts", _v9, Column("id", String(32), primary_key=True))
+
+_text_snapshots = Table(
+    "text_snapshots", _v9,
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+    Column("seq", Integer, nullable=False),
+    Column("content", Text, nullable=False),
+    Column("pieces", Text, nullable=False),
+    Column("marks", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _v9_text_log(conn: Connection) -> None:
+    _v9.create_all(conn, checkfirst=True)
+    if "seq" not in {c["name"] for c in inspect(conn).get_columns("text_edits")}:
+        conn.execute(text("ALTER TABLE text_edits ADD COLUMN seq INTEGER"))
+    # Number existing edits per contract in the order they were made.
+    rows = conn.execute(
+        text("SELECT id, contract_id FROM text_edits WHERE seq IS NULL ORDER BY contract_id, created_at, id")
+    ).all()
+    numbered, last, n = [], None, 0
+    for row_id, contract_id in rows:
+        n = n + 1 if contract_id == last else 1
+        last = contract_id
+        numbered.append({"seq": n, "id": row_id})
+    if numbered:
+        conn.execute(text("UPDATE text_edits SET seq = :seq WHERE id = :id"), numbered)
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_text_edits_contract_seq ON text_edits (contract_id, seq)"
+    ))
+
+
+# ── 10: lost risk clauses (re-anchoring) ────────────────────────────
+
+def _v10_clause_missing(conn: Connection) -> None:
+    if "clause_missing" not in {c["name"] for c in inspect(conn).get_columns("risks")}:
+        conn.execute(text("ALTER TABLE risks ADD COLUMN clause_missing BOOLEAN NOT NULL DEFAULT false"))
+
+
+# ── 11: contract content in its own compressed table ─────────────────
+
+_v11 = MetaData()
+
+Table("contracts", _v11, Column("id", String(32), primary_key=True))
+
+_contract_bodies = Table(
+    "contract_bodies", _v11,
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+    Column("hash", String(64), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+)
+
+
+# The index over the contract_texts view, read through the contract_text()
+# SQL function that every connection registers (zlib-compressed UTF-8).
+_V11_FTS_DDL = [
+    """
+    CREATE VIEW IF NOT EXISTS contract_texts AS
+    SELECT c.rowid AS docid, c.name, c.party, c.type, coalesce(contract_text(b.data), '') AS content
+    FROM contracts c LEFT JOIN contract_bodies b ON b.contract_id = c.id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS contracts_fts USING fts5(
+        name, party, type, content,
+        content='contract_texts', content_rowid='docid',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_ai AFTER INSERT ON contracts BEGIN
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        VALUES (new.rowid, new.name, new.party, new.type, coalesce((SELECT contract_text(data) FROM contract_bodies WHERE contract_id = new.id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_ai AFTER INSERT ON contract_bodies BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        SELECT 'delete', rowid, name, party, type, '' FROM contracts WHERE id = new.contract_id;
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        SELECT rowid, name, party, type, contract_text(new.data) FROM contracts WHERE id = new.contract_id;
+    END
+    """,
+    # BEFORE: the foreign key cascade removes the body along with the row.
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_bd BEFORE DELETE ON contracts BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, coalesce((SELECT contract_text(data) FROM contract_bodies WHERE contract_id = old.id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_au AFTER UPDATE OF name, party, type ON contracts BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, coalesce((SELECT contract_text(data) FROM contract_bodies WHERE contract_id = old.id), ''));
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        VALUES (new.rowid, new.name, new.party, new.type, coalesce((SELECT contract_text(data) FROM contract_bodies WHERE contract_id = new.id), ''));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_au AFTER UPDATE OF data ON contract_bodies BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        SELECT 'delete', rowid, name, party, type, contract_text(old.data) FROM contracts WHERE id = old.contract_id;
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        SELECT rowid, name, party, type, contract_text(new.data) FROM contracts WHERE id = new.contract_id;
+    END
+    """,
+    # A no-op when the body goes with its contract: the row is gone by then.
+    """
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_ad AFTER DELETE ON contract_bodies BEGIN
+        INSERT INTO contracts_fts(contracts_fts, rowid, name, party, type, content)
+        SELECT 'delete', rowid, name, party, type, contract_text(old.data) FROM contracts WHERE id = old.contract_id;
+        INSERT INTO contracts_fts(rowid, name, party, type, content)
+        SELECT rowid, name, party, type, '' FROM contracts WHERE id = old.contract_id;
+    END
+    """,
+]
+
+
+def _v11_pack(content: str, compress: bool) -> dict:
+    raw = content.encode()
+    return {
+        "hash": hashlib.sha256(raw).hexdigest(),
+        "size": len(raw),
+        "data": zlib.compress(raw, 6) if compress else raw,
+    }
+
+
+def _v11_contract_bodies(conn: Connection) -> None:
+    _v11.create_all(conn, checkfirst=True)
+    sqlite = conn.dialect.name == "sqlite"
+    if "content" in {c["name"] for c in inspect(conn).get_columns("contracts")}:
+        if sqlite:
+            # The old index and its triggers read contracts.content.
+            for name in ("contracts_fts_ai", "contracts_fts_ad", "contracts_fts_au"):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+            conn.execute(text("DROP TABLE IF EXISTS contracts_fts"))
+        ids = conn.execute(text("SELECT id FROM contracts ORDER BY id")).scalars().all()
+        read = text("SELECT id, content FROM contracts WHERE id IN :ids").bindparams(bindparam("ids", expanding=True))
+        for i in range(0, len(ids), 200):
+            rows = conn.execute(read, {"ids": ids[i:i + 200]}).all()
+            conn.execute(
+                _contract_bodies.insert(),
+                [{"contract_id": row_id, **_v11_pack(content or "", sqlite)} for row_id, content in rows],
+            )
+        conn.execute(text("ALTER TABLE contracts DROP COLUMN content"))
+    if not sqlite:
+        return
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contracts_fts'")
+    ).first()
+    for ddl in _V11_FTS_DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        conn.execute(text("INSERT INTO contracts_fts(contracts_fts) VALUES ('rebuild')"))
+
+
+# ── 12: risks written by AI analysis jobs ───────────────────────────
+
+def _v12_risk_job(conn: Connection) -> None:
+    if "job_id" not in {c["name"] for c in inspect(conn).get_columns("risks")}:
+        conn.execute(text("ALTER TABLE risks ADD COLUMN job_id VARCHAR(32)"))
+
+
+# ── 13: text snapshots stored packed like contract bodies ────────────
+
+_v13 = MetaData()
+
+Table("contracts", _v13, Column("id", String(32), primary_key=True))
+
+Table(
+    "text_snapshots", _v13,
+    Column("contract_id", String(32), ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True),
+    Column("seq", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("pieces", Text, nullable=False),
+    Column("marks", Text, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+
+def _v13_packed_snapshots(conn: Connection) -> None:
+    if "content" in {c["name"] for c in inspect(conn).get_columns("text_snapshots")}:
+        # Snapshots are derived: without one, reads replay from the contract's
+        # content and the next edit (or ``textlog.py rebuild``) writes a new one.
+        conn.execute(text("DROP TABLE text_snapshots"))
+    _v13.create_all(conn, checkfirst=True)
+
+
+MIGRATIONS: list[tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "baseline", _v1_baseline),
+    (2, "list_indexes", _v2_indexes),
+    (3, "contracts_fts", _v3_contracts_fts),
+    (4, "stat_counters", _v4_stat_counters),
+    (5, "ai_cache", _v5_ai_cache),
+    (6, "analysis_jobs", _v6_analysis_jobs),
+    (7, "table_versions", _v7_table_versions),
+    (8, "change_seq", _v8_change_seq),
+    (9, "text_log", _v9_text_log),
+    (10, "clause_missing", _v10_clause_missing),
+    (11, "contract_bodies", _v11_contract_bodies),
+    (12, "risk_job", _v12_risk_job),
+    (13, "packed_snapshots", _v13_packed_snapshots),
+]
+
+
+# pg_advisory_xact_lock key shared by every process migrating the database.
+_PG_LOCK_KEY = 0x4D45464C
+
+
+def _lock(conn: Connection) -> None:
+    if conn.dialect.name == "sqlite":
+        # pysqlite only opens a transaction implicitly before DML; a step's
+        # leading DDL would autocommit on its own.
+        if not conn.connection.driver_connection.in_transaction:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+    elif conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+
+
+def applied_versions(engine: Engine) -> set[int]:
+    with engine.begin() as conn:
+        _lock(conn)
+        version_table.create(conn, checkfirst=True)
+        return set(conn.execute(select(version_table.c.version)).scalars())
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """Apply pending migrations in order; returns the versions applied by this call."""
+    done = applied_versions(engine)
+    ran = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            _lock(conn)
+            # Another worker may have applied it since we looked.
+            if conn.execute(
+                select(version_table.c.version).where(version_table.c.version == version)
+            ).first():
+                continue
+            step(conn)
+            conn.execute(
+                version_table.insert().values(
+                    version=version, name=name, applied_at=datetime.now(timezone.utc)
+                )
+            )
+        ran.append(version)
+    return ran
+
+
+# ── Query plan checks (SQLite) ───────────────────────────────────────
+
+# (query, index that must serve it, whether ORDER BY must come from the index)
+PLAN_EXPECTATIONS: list[tuple[str, str, bool]] = [
+    ("SELECT id FROM contracts ORDER BY created_at DESC, id DESC LIMIT 50",
+     "ix_contracts_created", True),
+    ("SELECT id FROM contracts WHERE status = 'active' ORDER BY created_at DESC, id DESC LIMIT 50",
+     "ix_contracts_status_created", True),
+    ("SELECT id FROM risks WHERE contract_id = '1' ORDER BY created_at DESC, id DESC",
+     "ix_risks_contract_created", True),
+    ("SELECT id FROM risks WHERE status = 'pending' ORDER BY created_at DESC, id DESC",
+     "ix_risks_status_created", True),
+    ("SELECT count(id) FROM risks WHERE level = 'high' AND status != 'resolved'",
+     "ix_risks_level_status", False),
+    ("SELECT id FROM tasks WHERE contract_id = '1' ORDER BY created_at DESC, id DESC",
+     "ix_tasks_contract_created", True),
+    ("SELECT id FROM tasks WHERE status = 'pending' ORDER BY created_at DESC, id DESC",
+     "ix_tasks_status_created", True),
+    ("SELECT id FROM tasks WHERE priority = 'high' ORDER BY created_at DESC, id DESC",
+     "ix_tasks_priority_created", True),
+    ("SELECT id FROM annotations WHERE contract_id = '1' ORDER BY created_at DESC",
+     "ix_annotations_contract_created", True),
+    ("SELECT id FROM text_edits WHERE contract_id = '1' ORDER BY created_at DESC",
+     "ix_text_edits_contract_created", True),
+    ("SELECT id FROM risks WHERE change_seq > 0 ORDER BY change_seq LIMIT 500",
+     "ix_risks_change_seq", True),
+    ("SELECT id FROM text_edits WHERE contract_id = '1' AND seq > 10 ORDER BY seq",
+     "ux_text_edits_contract_seq", True),
+]
+
+
+def check_query_plans(engine: Engine) -> list[str]:
+    """Run EXPLAIN QUERY PLAN for each expectation; returns a list of violations."""
+    if engine.dialect.name != "sqlite":
+        return []
+    problems = []
+    with engine.connect() as conn:
+        for sql, index, ordered in PLAN_EXPECTATIONS:
+            plan = " | ".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")))
+            if f"INDEX {index}" not in plan:
+                problems.append(f"{sql}\n  expected {index}, got: {plan}")
+            elif ordered and "TEMP B-TREE" in plan:
+                problems.append(f"{sql}\n  sorts in a temp b-tree: {plan}")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    from database import engine
+
+    parser = argparse.ArgumentParser(description="MeFlow schema migrations")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "check-plans"])
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        # Read-only: applied_versions would create schema_version.
+        with engine.connect() as conn:
+            recorded = inspect(conn).has_table(version_table.name)
+            done = set(conn.execute(select(version_table.c.version)).scalars()) if recorded else set()
+        if not recorded:
+            print("no migrations applied")
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {name:<24} {'applied' if version in done else 'pending'}")
+        return 0
+    if args.command == "check-plans":
+        run_migrations(engine)
+        problems = check_query_plans(engine)
+        for p in problems:
+            print(p)
+        print("query plans ok" if not problems else f"{len(problems)} query plan regression(s)")
+        return 1 if problems else 0
+    ran = run_migrations(engine)
+    print(f"applied {ran}" if ran else "up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
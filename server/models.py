@@ -1,9 +1,13 @@
 import uuid
 from datetime import datetime, timezone
 
-from sqlalchemy import String, Integer, Float, Text, Boolean, ForeignKey, DateTime
+from sqlalchemy import (
+    BigInteger, String, Integer, Float, Text, Boolean, ForeignKey, DateTime, Index, LargeBinary, func, select, text,
+)
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
+from bodies import pack, text_of, unpack
 from database import Base
 
 
@@ -26,16 +30,50 @@ class Contract(Base):
     signed_date: Mapped[str] = mapped_column(String(32))
     expiry_date: Mapped[str] = mapped_column(String(32))
     status: Mapped[str] = mapped_column(String(32), default="draft")
-    content: Mapped[str] = mapped_column(Text, default="")
     ai_analyzed: Mapped[bool] = mapped_column(Boolean, default=False)
     risk_level: Mapped[str | None] = mapped_column(String(16), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now, onupdate=_now)
+    change_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)  # see changes.py
 
     risks: Mapped[list["Risk"]] = relationship(back_populates="contract", cascade="all, delete-orphan")
     tasks: Mapped[list["Task"]] = relationship(back_populates="contract", cascade="all, delete-orphan")
     annotations: Mapped[list["Annotation"]] = relationship(back_populates="contract", cascade="all, delete-orphan")
     text_edits: Mapped[list["TextEdit"]] = relationship(back_populates="contract", cascade="all, delete-orphan")
+    # Loaded on first access to ``content``; see bodies.py.
+    body: Mapped["ContractBody | None"] = relationship(cascade="all, delete-orphan", passive_deletes=True)
+
+    @hybrid_property
+    def content(self) -> str:
+        return unpack(self.body.data) if self.body is not None else ""
+
+    @content.inplace.setter
+    def _content_setter(self, value: str) -> None:
+        values = pack(value)
+        if self.body is not None and self.body.hash == values["hash"]:
+            return
+        if self.body is None:
+            self.body = ContractBody()
+        for key, val in values.items():
+            setattr(self.body, key, val)
+        # The contracts row changes too, so its ETag and change_seq move.
+        self.updated_at = _now()
+
+    @content.inplace.expression
+    @classmethod
+    def _content_expression(cls):
+        return func.coalesce(
+            select(text_of(ContractBody.data)).where(ContractBody.contract_id == cls.id).scalar_subquery(), ""
+        )
+
+
+class ContractBody(Base):
+    __tablename__ = "contract_bodies"
+
+    contract_id: Mapped[str] = mapped_column(ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    hash: Mapped[str] = mapped_column(String(64))  # sha256 of the text
+    size: Mapped[int] = mapped_column(Integer)  # UTF-8 bytes
+    data: Mapped[bytes] = mapped_column(LargeBinary)  # zlib on SQLite, see bodies.py
 
 
 class Risk(Base):
@@ -51,11 +89,14 @@ class Risk(Base):
     clause: Mapped[str | None] = mapped_column(Text, nullable=True)
     clause_start: Mapped[int | None] = mapped_column(Integer, nullable=True)
     clause_end: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    clause_missing: Mapped[bool] = mapped_column(Boolean, default=False)  # see anchors.py
+    job_id: Mapped[str | None] = mapped_column(String(32), nullable=True)  # AI analysis job that found it
     status: Mapped[str] = mapped_column(String(32), default="pending")
     assigned_to: Mapped[str | None] = mapped_column(String(128), nullable=True)
     assigned_department: Mapped[str | None] = mapped_column(String(32), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
     resolved_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    change_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     contract: Mapped["Contract"] = relationship(back_populates="risks")
 
@@ -75,6 +116,7 @@ class Task(Base):
     contract_name: Mapped[str | None] = mapped_column(String(256), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
     completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    change_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     contract: Mapped["Contract | None"] = relationship(back_populates="tasks")
 
@@ -87,6 +129,7 @@ class Annotation(Base):
     text: Mapped[str] = mapped_column(Text)
     note: Mapped[str] = mapped_column(Text)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
+    change_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     contract: Mapped["Contract"] = relationship(back_populates="annotations")
 
@@ -99,6 +142,42 @@ class TextEdit(Base):
     type: Mapped[str] = mapped_column(String(16))
     text: Mapped[str] = mapped_column(Text)
     position: Mapped[int] = mapped_column(Integer, default=0)
+    seq: Mapped[int | None] = mapped_column(Integer, nullable=True)  # order within the contract, see textlog.py
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
+    change_seq: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
 
     contract: Mapped["Contract"] = relationship(back_populates="text_edits")
+
+
+class TextSnapshot(Base):
+    __tablename__ = "text_snapshots"
+
+    contract_id: Mapped[str] = mapped_column(ForeignKey("contracts.id", ondelete="CASCADE"), primary_key=True)
+    seq: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)  # the text, packed like contract_bodies.data
+    pieces: Mapped[str] = mapped_column(Text)  # JSON [[length, edit id or null], ...]
+    marks: Mapped[str] = mapped_column(Text)  # JSON [[position, delete edit id], ...]
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        # At most one queued/running job per (contract, content); duplicates reuse it.
+        Index(
+            "ux_analysis_jobs_inflight", "contract_id", "content_hash",
+            unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True, default=_uuid)
+    contract_id: Mapped[str] = mapped_column(ForeignKey("contracts.id", ondelete="CASCADE"))
+    content_hash: Mapped[str] = mapped_column(String(64))
+    status: Mapped[str] = mapped_column(String(16), default="queued")
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=_now)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
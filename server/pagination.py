@@ -0,0 +1,127 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable
+
+import orjson
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, and_, or_, select
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Headers set on the injected Response that a directly returned one must carry over.
+_FORWARDED_HEADERS = (NEXT_CURSOR_HEADER, "ETag", "Cache-Control")
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), str(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+def parse_fields(fields: str | None, columns: dict[str, tuple[str, ...]]) -> list[str] | None:
+    """Parse a comma separated ``fields=`` value against a wire-name → ORM-columns map."""
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in columns]
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def select_columns(model, columns: dict[str, tuple[str, ...]], fields: list[str]) -> Select:
+    """``select()`` of the plain columns behind ``fields``, in field order,
+    followed by the keyset columns if not already included. Rows come back as
+    tuples: no ORM objects, identity map or per-row validation."""
+    names = [c for f in fields for c in columns[f]]
+    names += [n for n in ("id", "created_at") if n not in names]
+    return select(*(getattr(model, n) for n in names))
+
+
+async def keyset_page(
+    db,
+    q: Select,
+    model,
+    response: Response,
+    limit: int | None,
+    cursor: str | None,
+) -> list:
+    """Order ``q`` (a ``select_columns`` of ``model``) newest first on
+    ``(created_at, id)`` and fetch one page.
+
+    Rows strictly after ``cursor`` are returned; when more rows remain the
+    cursor of the last row is sent back in the ``X-Next-Cursor`` header.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        q = q.filter(
+            or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id),
+            )
+        )
+    q = q.order_by(model.created_at.desc(), model.id.desc())
+    if limit is None:
+        return (await db.execute(q)).all()
+    rows = (await db.execute(q.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows
+
+
+def project(obj, fields: list[str], columns: dict[str, tuple[str, ...]]) -> dict:
+    """Serialise only ``fields`` of ``obj``; two-column fields are ``{start, end}`` spans."""
+    out = {}
+    for f in fields:
+        cols = columns[f]
+        if len(cols) == 2:
+            start, end = (getattr(obj, c) for c in cols)
+            out[f] = {"start": start, "end": end} if start is not None and end is not None else None
+            continue
+        val = getattr(obj, cols[0])
+        out[f] = val.isoformat() if isinstance(val, datetime) else val
+    return out
+
+
+def row_mapper(fields: list[str], columns: dict[str, tuple[str, ...]]) -> Callable[[tuple], dict]:
+    """Positional ``row -> dict`` for rows of ``select_columns(..., fields)``.
+
+    Datetimes are left for the encoder. Without span fields a row maps with a
+    single ``dict(zip(...))``; trailing keyset columns are dropped by the zip.
+    """
+    if all(len(columns[f]) == 1 for f in fields):
+        return lambda row: dict(zip(fields, row))
+    spec, i = [], 0
+    for f in fields:
+        spec.append((f, i, len(columns[f]) == 2))
+        i += len(columns[f])
+
+    def mapper(row) -> dict:
+        out = {}
+        for f, i, span in spec:
+            if span:
+                start, end = row[i], row[i + 1]
+                out[f] = {"start": start, "end": end} if start is not None and end is not None else None
+            else:
+                out[f] = row[i]
+        return out
+
+    return mapper
+
+
+def projected_response(rows: list, fields: list[str], columns: dict[str, tuple[str, ...]], response: Response) -> Response:
+    """Encode ``select_columns`` rows with orjson, bypassing ``response_model``
+    validation. The wire format matches the ``*Out.from_orm_model`` schemas."""
+    headers = {h: response.headers[h] for h in _FORWARDED_HEADERS if h in response.headers}
+    mapper = row_mapper(fields, columns)
+    body = orjson.dumps([mapper(r) for r in rows])
+    return Response(body, media_type="application/json", headers=headers)
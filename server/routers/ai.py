@@ -1,26 +1,129 @@
-from fastapi import APIRouter
-from schemas import AIAnalyzeRequest, AIAnalyzeResponse, AIAdviceRequest, AIAdviceResponse
-from services.kimi_service import analyze_contract_risk, generate_contract_advice
+import json
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from models import AnalysisJob, Contract
+from schemas import (
+    AIAnalyzeRequest, AIAnalyzeResponse, AIAdviceRequest, AIAdviceResponse,
+    AnalysisJobCreate, AnalysisJobOut,
+)
+from services.ai_cache import cache
+from services.analysis_jobs import runner, submit_job
+from services.kimi_service import (
+    analyze_contract_risk, generate_contract_advice,
+    stream_contract_risk, stream_contract_advice, upstream_stats,
+)
+
+CACHE_HEADER = "X-Cache"
 
 router = APIRouter(prefix="/api/ai", tags=["ai"])
 
 
+def _sse(events: AsyncIterator[tuple[str, dict]]) -> StreamingResponse:
+    async def body():
+        async for event, data in events:
+            yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from holding the stream until it completes.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/analyze", response_model=AIAnalyzeResponse)
-async def analyze(body: AIAnalyzeRequest):
-    result = await analyze_contract_risk(
+async def analyze(body: AIAnalyzeRequest, response: Response):
+    result, cache_status = await analyze_contract_risk(
         contract_name=body.contractName,
         contract_type=body.contractType,
         content=body.content,
     )
+    response.headers[CACHE_HEADER] = cache_status.upper()
     return AIAnalyzeResponse(**result)
 
 
 @router.post("/advice", response_model=AIAdviceResponse)
-async def advice(body: AIAdviceRequest):
-    text = await generate_contract_advice(
+async def advice(body: AIAdviceRequest, response: Response):
+    text, cache_status = await generate_contract_advice(
         contract_name=body.contractName,
         contract_type=body.contractType,
         content=body.content,
         risk_description=body.riskDescription,
     )
+    response.headers[CACHE_HEADER] = cache_status.upper()
     return AIAdviceResponse(advice=text)
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(body: AIAnalyzeRequest):
+    return _sse(stream_contract_risk(
+        contract_name=body.contractName,
+        contract_type=body.contractType,
+        content=body.content,
+    ))
+
+
+@router.post("/advice/stream")
+async def advice_stream(body: AIAdviceRequest):
+    return _sse(stream_contract_advice(
+        contract_name=body.contractName,
+        contract_type=body.contractType,
+        content=body.content,
+        risk_description=body.riskDescription,
+    ))
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+
+@router.get("/upstream/stats")
+async def llm_upstream_stats():
+    return upstream_stats()
+
+
+@router.post("/jobs", response_model=AnalysisJobOut, status_code=202)
+async def create_job(body: AnalysisJobCreate, db: AsyncSession = Depends(get_async_db)):
+    contract = await db.get(Contract, body.contractId)
+    if not contract:
+        raise HTTPException(404, "Contract not found")
+    job, created = await db.run_sync(submit_job, contract)
+    if created:
+        runner.enqueue(job.id)
+    return AnalysisJobOut.from_orm_model(job)
+
+
+@router.get("/jobs", response_model=list[AnalysisJobOut])
+async def list_jobs(
+    contract_id: str | None = Query(None, alias="contractId"),
+    status: str | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+):
+    q = select(AnalysisJob)
+    if contract_id:
+        q = q.where(AnalysisJob.contract_id == contract_id)
+    if status:
+        q = q.where(AnalysisJob.status == status)
+    rows = (await db.scalars(q.order_by(AnalysisJob.created_at.desc()).limit(limit))).all()
+    return [AnalysisJobOut.from_orm_model(r) for r in rows]
+
+
+@router.get("/jobs/stats")
+def job_stats():
+    return runner.stats()
+
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobOut)
+async def get_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(AnalysisJob, job_id)
+    if not obj:
+        raise HTTPException(404, "Job not found")
+    return AnalysisJobOut.from_orm_model(obj)
@@ -1,50 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
 from models import Annotation, TextEdit
+from routers.contracts import require_contract
 from schemas import (
     AnnotationCreate, AnnotationOut,
     TextEditCreate, TextEditOut,
 )
+from textlog import append, forget
 
 router = APIRouter(prefix="/api/annotations", tags=["annotations"])
 
 
 @router.get("/", response_model=list[AnnotationOut])
-def list_annotations(
+async def list_annotations(
     contract_id: str = Query(..., alias="contractId"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    rows = (
-        db.query(Annotation)
-        .filter(Annotation.contract_id == contract_id)
+    rows = (await db.scalars(
+        select(Annotation)
+        .where(Annotation.contract_id == contract_id)
         .order_by(Annotation.created_at.desc())
-        .all()
-    )
+    )).all()
     return [AnnotationOut.from_orm_model(r) for r in rows]
 
 
 @router.post("/", response_model=AnnotationOut, status_code=201)
-def create_annotation(body: AnnotationCreate, db: Session = Depends(get_db)):
+async def create_annotation(body: AnnotationCreate, db: AsyncSession = Depends(get_async_db)):
+    await require_contract(db, body.contract_id)
     obj = Annotation(
         contract_id=body.contract_id,
         text=body.text,
         note=body.note,
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return AnnotationOut.from_orm_model(obj)
 
 
 @router.delete("/{annotation_id}", status_code=204)
-def delete_annotation(annotation_id: str, db: Session = Depends(get_db)):
-    obj = db.get(Annotation, annotation_id)
+async def delete_annotation(annotation_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Annotation, annotation_id)
     if not obj:
         raise HTTPException(404, "Annotation not found")
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
 
 
 # ── TextEdits (mounted under /api/text-edits) ────────────────────────
@@ -53,37 +56,38 @@ text_edits_router = APIRouter(prefix="/api/text-edits", tags=["text-edits"])
 
 
 @text_edits_router.get("/", response_model=list[TextEditOut])
-def list_text_edits(
+async def list_text_edits(
     contract_id: str = Query(..., alias="contractId"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    rows = (
-        db.query(TextEdit)
-        .filter(TextEdit.contract_id == contract_id)
-        .order_by(TextEdit.created_at.desc())
-        .all()
-    )
+    rows = (await db.scalars(
+        select(TextEdit)
+        .where(TextEdit.contract_id == contract_id)
+        .order_by(TextEdit.created_at.desc(), TextEdit.seq.desc())
+    )).all()
     return [TextEditOut.from_orm_model(r) for r in rows]
 
 
 @text_edits_router.post("/", response_model=TextEditOut, status_code=201)
-def create_text_edit(body: TextEditCreate, db: Session = Depends(get_db)):
+async def create_text_edit(body: TextEditCreate, db: AsyncSession = Depends(get_async_db)):
+    await require_contract(db, body.contract_id)
     obj = TextEdit(
         contract_id=body.contract_id,
         type=body.type,
         text=body.text,
         position=body.position,
     )
-    db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.run_sync(lambda session: append(session, obj))
+    await db.commit()
+    await db.refresh(obj)
     return TextEditOut.from_orm_model(obj)
 
 
 @text_edits_router.delete("/{edit_id}", status_code=204)
-def delete_text_edit(edit_id: str, db: Session = Depends(get_db)):
-    obj = db.get(TextEdit, edit_id)
+async def delete_text_edit(edit_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(TextEdit, edit_id)
     if not obj:
         raise HTTPException(404, "TextEdit not found")
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.run_sync(lambda session: forget(session, obj))
+    await db.commit()
@@ -1,46 +1,214 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from database import get_db
-from models import Contract
-from schemas import ContractCreate, ContractUpdate, ContractOut
+from anchors import reanchor
+from database import get_async_db
+from models import Contract, TextEdit
+from pagination import keyset_page, parse_fields, projected_response, select_columns
+from schemas import (
+    AnnotationOut, ContractCreate, ContractUpdate, ContractOut, ContractFullOut, ContractListOut, ContractSearchHit,
+    ContractTextOut, RiskOut, TaskOut, TextEditOut, CONTRACT_COLUMNS, CONTRACT_LIST_FIELDS,
+)
+from search import fts_available, like_snippet, split_terms
+from services.ai_cache import cache as ai_cache
+from textlog import load as load_text, rebuild as rebuild_text
+from versions import conditional, row_etag, table_etag
 
 router = APIRouter(prefix="/api/contracts", tags=["contracts"])
 
 
-@router.get("/", response_model=list[ContractOut])
-def list_contracts(
+@router.get("/", response_model=list[ContractListOut])
+async def list_contracts(
+    request: Request,
+    response: Response,
     search: str | None = Query(None),
     status: str | None = Query(None),
     type: str | None = Query(None),
-    db: Session = Depends(get_db),
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = Query(None),
+    fields: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    q = db.query(Contract)
-    if status:
-        q = q.filter(Contract.status == status)
-    if type:
-        q = q.filter(Contract.type == type)
-    if search:
-        like = f"%{search}%"
-        q = q.filter(
-            Contract.name.ilike(like)
-            | Contract.party.ilike(like)
-            | Contract.type.ilike(like)
+    projection = parse_fields(fields, CONTRACT_COLUMNS) or CONTRACT_LIST_FIELDS
+    if (not_modified := conditional(request, response, await table_etag(db, request, "contracts"))) is not None:
+        return not_modified
+    q = filter_contracts(select_columns(Contract, CONTRACT_COLUMNS, projection), db.get_bind(), search, status, type)
+    rows = await keyset_page(db, q, Contract, response, limit, cursor)
+    return projected_response(rows, projection, CONTRACT_COLUMNS, response)
+
+
+@router.get("/search", response_model=list[ContractSearchHit])
+async def search_contracts(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+):
+    match, like_terms = split_terms(q, fts_available(db.get_bind()))
+    if match is None:
+        rows = (await db.scalars(
+            _filter_like(select(Contract).options(selectinload(Contract.body)), like_terms)
+            .order_by(Contract.created_at.desc())
+            .limit(limit)
+        )).all()
+        return [
+            ContractSearchHit(
+                id=r.id,
+                name=r.name,
+                type=r.type,
+                party=r.party,
+                status=r.status,
+                riskLevel=r.risk_level,
+                snippet=like_snippet(r.content, like_terms[0]) if like_terms else None,
+                score=0,
+            )
+            for r in rows
+        ]
+    params = {"match": match, "limit": limit}
+    like_sql = ""
+    for i, term in enumerate(like_terms):
+        params[f"like{i}"] = f"%{term}%"
+        like_sql += (
+            f" AND (c.name LIKE :like{i} OR c.party LIKE :like{i}"
+            f" OR c.type LIKE :like{i} OR t.content LIKE :like{i})"
+        )
+    # Rank first, then build snippets for the page only: a snippet reads
+    # (and decompresses) the whole contract text.
+    rows = (await db.execute(
+        text(
+            f"""
+            SELECT c.id, c.name, c.type, c.party, c.status, c.risk_level,
+                   snippet(contracts_fts, -1, '<mark>', '</mark>', '…', 16) AS snippet,
+                   bm25(contracts_fts, 10.0, 5.0, 2.0, 1.0) AS rank
+            FROM contracts_fts
+            JOIN contracts c ON c.rowid = contracts_fts.rowid
+            WHERE contracts_fts MATCH :match AND contracts_fts.rowid IN (
+                SELECT contracts_fts.rowid
+                FROM contracts_fts
+                JOIN contracts c ON c.rowid = contracts_fts.rowid
+                {"JOIN contract_texts t ON t.docid = contracts_fts.rowid" if like_sql else ""}
+                WHERE contracts_fts MATCH :match{like_sql}
+                ORDER BY bm25(contracts_fts, 10.0, 5.0, 2.0, 1.0)
+                LIMIT :limit
+            )
+            ORDER BY rank
+            """
+        ),
+        params,
+    )).all()
+    return [
+        ContractSearchHit(
+            id=r.id,
+            name=r.name,
+            type=r.type,
+            party=r.party,
+            status=r.status,
+            riskLevel=r.risk_level,
+            snippet=r.snippet,
+            score=round(-r.rank, 4),
         )
-    rows = q.order_by(Contract.created_at.desc()).all()
-    return [ContractOut.from_orm_model(r) for r in rows]
+        for r in rows
+    ]
 
 
 @router.get("/{contract_id}", response_model=ContractOut)
-def get_contract(contract_id: str, db: Session = Depends(get_db)):
-    obj = db.get(Contract, contract_id)
+async def get_contract(
+    contract_id: str, request: Request, response: Response, db: AsyncSession = Depends(get_async_db),
+):
+    updated_at = await db.scalar(select(Contract.updated_at).where(Contract.id == contract_id))
+    if updated_at is None:
+        raise HTTPException(404, "Contract not found")
+    if (not_modified := conditional(request, response, row_etag(contract_id, updated_at))) is not None:
+        return not_modified
+    obj = await db.get(Contract, contract_id, options=[selectinload(Contract.body)])
     if not obj:
         raise HTTPException(404, "Contract not found")
     return ContractOut.from_orm_model(obj)
 
 
+@router.get("/{contract_id}/text", response_model=ContractTextOut)
+async def get_contract_text(
+    contract_id: str,
+    request: Request,
+    response: Response,
+    start: int = Query(0, ge=0),
+    end: int | None = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The contract's content with its text edits applied (see ``textlog.py``).
+    ``start``/``end`` select a range of the result; ``edits`` holds only the
+    edits whose text lies in that range or whose deletions happened there."""
+    if (not_modified := conditional(
+        request, response, await table_etag(db, request, "contracts", "text_edits")
+    )) is not None:
+        return not_modified
+    doc = await db.run_sync(lambda session: load_text(session, contract_id))
+    if doc is None:
+        raise HTTPException(404, "Contract not found")
+    end = len(doc.text) if end is None else min(end, len(doc.text))
+    start = min(start, end)
+    window, ids = doc.window(start, end)
+    edits = (await db.scalars(
+        select(TextEdit).where(TextEdit.id.in_(ids)).order_by(TextEdit.seq)
+    )).all() if ids else []
+    return ContractTextOut(
+        contractId=contract_id,
+        seq=doc.seq,
+        length=len(doc.text),
+        start=start,
+        end=end,
+        text=window,
+        edits=[TextEditOut.from_orm_model(e) for e in edits],
+    )
+
+
+# include= name -> relationship, response model, and the order of the
+# collection's own list endpoint (newest first).
+FULL_COLLECTIONS = {
+    "risks": (Contract.risks, RiskOut, lambda r: (r.created_at, r.id)),
+    "tasks": (Contract.tasks, TaskOut, lambda t: (t.created_at, t.id)),
+    "annotations": (Contract.annotations, AnnotationOut, lambda a: a.created_at),
+    "textEdits": (Contract.text_edits, TextEditOut, lambda e: (e.created_at, e.seq)),
+}
+
+
+@router.get("/{contract_id}/full", response_model=ContractFullOut, response_model_exclude_unset=True)
+async def get_contract_full(
+    contract_id: str,
+    request: Request,
+    response: Response,
+    include: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """The contract detail page in one request: the contract and its risks,
+    tasks, annotations and text edits, each collection loaded by one
+    ``selectinload`` query. ``include`` is a comma-separated subset of
+    ``risks,tasks,annotations,textEdits`` (default: all)."""
+    wanted = list(FULL_COLLECTIONS)
+    if include is not None:
+        wanted = [c.strip() for c in include.split(",") if c.strip()]
+        unknown = set(wanted) - set(FULL_COLLECTIONS)
+        if unknown:
+            raise HTTPException(400, f"Unknown collection: {', '.join(sorted(unknown))}")
+    if (not_modified := conditional(
+        request, response, await table_etag(db, request, "contracts", "risks", "tasks", "annotations", "text_edits")
+    )) is not None:
+        return not_modified
+    options = [selectinload(Contract.body)] + [selectinload(FULL_COLLECTIONS[c][0]) for c in wanted]
+    obj = await db.get(Contract, contract_id, options=options)
+    if not obj:
+        raise HTTPException(404, "Contract not found")
+    out = {"contract": ContractOut.from_orm_model(obj)}
+    for name in wanted:
+        rel, model, key = FULL_COLLECTIONS[name]
+        rows = sorted(getattr(obj, rel.key), key=key, reverse=True)
+        out[name] = [model.from_orm_model(r) for r in rows]
+    return ContractFullOut(**out)
+
+
 @router.post("/", response_model=ContractOut, status_code=201)
-def create_contract(body: ContractCreate, db: Session = Depends(get_db)):
+async def create_contract(body: ContractCreate, db: AsyncSession = Depends(get_async_db)):
     obj = Contract(
         name=body.name,
         type=body.type,
@@ -52,17 +220,22 @@ def create_contract(body: ContractCreate, db: Session = Depends(get_db)):
         content=body.content,
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
-    return ContractOut.from_orm_model(obj)
+    await db.commit()
+    await db.refresh(obj)
+    # refresh() leaves the body to load lazily, which needs the sync side.
+    return await db.run_sync(lambda session: ContractOut.from_orm_model(obj))
 
 
 @router.put("/{contract_id}", response_model=ContractOut)
-def update_contract(contract_id: str, body: ContractUpdate, db: Session = Depends(get_db)):
-    obj = db.get(Contract, contract_id)
+async def update_contract(contract_id: str, body: ContractUpdate, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Contract, contract_id, options=[selectinload(Contract.body)])
     if not obj:
         raise HTTPException(404, "Contract not found")
     data = body.model_dump(exclude_unset=True)
+    old_content = obj.content
+    content_changed = "content" in data and data["content"] != old_content
+    if content_changed:
+        await db.run_sync(ai_cache.invalidate_content, obj.content)
     field_map = {
         "signed_date": "signed_date",
         "expiry_date": "expiry_date",
@@ -72,15 +245,59 @@ def update_contract(contract_id: str, body: ContractUpdate, db: Session = Depend
     for key, val in data.items():
         attr = field_map.get(key, key)
         setattr(obj, attr, val)
-    db.commit()
-    db.refresh(obj)
-    return ContractOut.from_orm_model(obj)
+    if content_changed:
+        # Text edits apply on top of the content, so the snapshot is stale;
+        # risk clause offsets point into the old content.
+        await db.run_sync(lambda session: rebuild_text(session, contract_id))
+        await db.run_sync(lambda session: reanchor(session, contract_id, old_content, obj.content))
+    await db.commit()
+    await db.refresh(obj)
+    return await db.run_sync(lambda session: ContractOut.from_orm_model(obj))
 
 
 @router.delete("/{contract_id}", status_code=204)
-def delete_contract(contract_id: str, db: Session = Depends(get_db)):
-    obj = db.get(Contract, contract_id)
+async def delete_contract(contract_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Contract, contract_id)
     if not obj:
         raise HTTPException(404, "Contract not found")
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+
+
+async def require_contract(db: AsyncSession, contract_id: str) -> None:
+    """404 unless the contract exists; for endpoints that attach rows to one."""
+    if await db.scalar(select(Contract.id).where(Contract.id == contract_id)) is None:
+        raise HTTPException(404, "Contract not found")
+
+
+def filter_contracts(q, bind, search: str | None, status: str | None, type: str | None):
+    """The list filters, shared with the export endpoint."""
+    if status:
+        q = q.filter(Contract.status == status)
+    if type:
+        q = q.filter(Contract.type == type)
+    if search:
+        q = _filter_search(q, search, bind)
+    return q
+
+
+def _filter_search(q, search: str, bind):
+    match, like_terms = split_terms(search, fts_available(bind))
+    if match is not None:
+        q = q.filter(
+            text("contracts.rowid IN (SELECT rowid FROM contracts_fts WHERE contracts_fts MATCH :match)")
+            .bindparams(match=match)
+        )
+    return _filter_like(q, like_terms)
+
+
+def _filter_like(q, terms: list[str]):
+    for term in terms:
+        like = f"%{term}%"
+        q = q.filter(
+            Contract.name.ilike(like)
+            | Contract.party.ilike(like)
+            | Contract.type.ilike(like)
+            | Contract.content.ilike(like)
+        )
+    return q
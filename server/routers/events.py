@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from changes import ENTITY_KEYS
+from services.events import hub
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+
+def _entities(entity: str | None) -> set[str] | None:
+    if not entity:
+        return None
+    wanted = {e.strip() for e in entity.split(",") if e.strip()}
+    unknown = wanted - set(ENTITY_KEYS.values())
+    if unknown:
+        raise HTTPException(400, f"Unknown entity: {', '.join(sorted(unknown))}")
+    return wanted
+
+
+@router.get("")
+async def stream_events(request: Request, entity: str | None = Query(None)):
+    """Server-sent events: ``change`` with the changes of one committed
+    transaction (``id`` is its cursor), ``overflow`` when this client fell
+    behind and should catch up with ``/api/sync``, and a comment line as a
+    heartbeat. ``entity`` is a comma-separated filter, e.g. ``risks,tasks``."""
+    sub = hub.subscribe(_entities(entity))
+    if "last-event-id" in request.headers:
+        # A browser reconnecting; whatever was committed in between is lost.
+        sub.overflow()
+
+    async def body():
+        try:
+            while True:
+                kind, data = await sub.get()
+                if kind == "ping":
+                    yield ": ping\n\n"
+                elif kind == "overflow":
+                    yield "event: overflow\ndata: {}\n\n"
+                else:
+                    yield f"id: {data['cursor']}\nevent: change\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_socket(websocket: WebSocket, entity: str | None = None):
+    """The same feed over a WebSocket, one JSON message per event:
+    ``{"type": "change", "cursor", "changes"}``, ``{"type": "overflow"}`` or
+    ``{"type": "ping"}``."""
+    try:
+        entities = _entities(entity)
+    except HTTPException as exc:
+        await websocket.close(code=1008, reason=exc.detail)
+        return
+    await websocket.accept()
+    sub = hub.subscribe(entities)
+
+    async def pump():
+        while True:
+            kind, data = await sub.get()
+            await websocket.send_json({"type": kind, **data})
+
+    sender = asyncio.create_task(pump())
+    try:
+        # Nothing is expected from the client; reading notices the disconnect.
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(sub)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
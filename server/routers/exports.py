@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import AsyncIterator
+
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+from database import engine, stream_partitions
+from models import Contract, Risk, Task
+from pagination import parse_fields, project, select_columns
+from routers.contracts import filter_contracts
+from routers.risks import filter_risks
+from routers.tasks import filter_tasks
+from schemas import CONTRACT_COLUMNS, RISK_COLUMNS, TASK_COLUMNS
+
+# Rows fetched from the cursor and encoded per chunk of the response.
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "200"))
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _export(
+    name: str, q, model, columns: dict[str, tuple[str, ...]], fields: list[str], format: str, gzip: bool,
+) -> StreamingResponse:
+    q = q.order_by(model.created_at.desc(), model.id.desc())
+
+    async def body() -> AsyncIterator[bytes]:
+        compressor = zlib.compressobj(wbits=31) if gzip else None  # 31: gzip container
+
+        def out(data: bytes) -> bytes:
+            return compressor.compress(data) if compressor else data
+
+        if format == "csv":
+            header = io.StringIO()
+            header.write("\ufeff")  # BOM, so spreadsheet apps detect UTF-8
+            csv.writer(header).writerow(fields)
+            yield out(header.getvalue().encode())
+        async for rows in stream_partitions(q, EXPORT_BATCH_ROWS):
+            data = out(_encode(rows, fields, columns, format))
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+
+    filename = f"{name}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        # The file itself is gzip; a Content-Encoding keeps GZipMiddleware from
+        # compressing it again (only newer Starlette skips application/gzip).
+        headers["Content-Encoding"] = "identity"
+    return StreamingResponse(
+        body(),
+        media_type="application/gzip" if gzip else _MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+
+def _encode(rows, fields: list[str], columns: dict[str, tuple[str, ...]], format: str) -> bytes:
+    records = (project(r, fields, columns) for r in rows)
+    if format == "ndjson":
+        return "".join(json.dumps(rec, ensure_ascii=False) + "\n" for rec in records).encode()
+    out = io.StringIO()
+    writer = csv.writer(out)
+    for rec in records:
+        # Spans as JSON, which the CSV importer accepts back.
+        writer.writerow(
+            json.dumps(v) if isinstance(v, dict) else "" if v is None else v
+            for v in rec.values()
+        )
+    return out.getvalue().encode()
+
+
+@router.get("/contracts")
+async def export_contracts(
+    search: str | None = Query(None),
+    status: str | None = Query(None),
+    type: str | None = Query(None),
+    fields: str | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+):
+    projection = parse_fields(fields, CONTRACT_COLUMNS) or list(CONTRACT_COLUMNS)
+    q = filter_contracts(select_columns(Contract, CONTRACT_COLUMNS, projection), engine, search, status, type)
+    return _export("contracts", q, Contract, CONTRACT_COLUMNS, projection, format, gzip)
+
+
+@router.get("/risks")
+async def export_risks(
+    contract_id: str | None = Query(None, alias="contractId"),
+    level: str | None = Query(None),
+    status: str | None = Query(None),
+    fields: str | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+):
+    projection = parse_fields(fields, RISK_COLUMNS) or list(RISK_COLUMNS)
+    q = filter_risks(select_columns(Risk, RISK_COLUMNS, projection), contract_id, level, status)
+    return _export("risks", q, Risk, RISK_COLUMNS, projection, format, gzip)
+
+
+@router.get("/tasks")
+async def export_tasks(
+    status: str | None = Query(None),
+    priority: str | None = Query(None),
+    contract_id: str | None = Query(None, alias="contractId"),
+    fields: str | None = Query(None),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = Query(False),
+):
+    projection = parse_fields(fields, TASK_COLUMNS) or list(TASK_COLUMNS)
+    q = filter_tasks(select_columns(Task, TASK_COLUMNS, projection), status, priority, contract_id)
+    return _export("tasks", q, Task, TASK_COLUMNS, projection, format, gzip)
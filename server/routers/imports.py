@@ -0,0 +1,81 @@
+import codecs
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from schemas import ImportResultOut, ImportRowError
+from services.importer import BATCH_SIZE, ENTITIES, FORMATS, MAX_ERRORS, RowParser, prepare_batch, write_batch
+
+router = APIRouter(prefix="/api/import", tags=["import"])
+
+_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "ndjson",
+}
+
+
+@router.post("", response_model=ImportResultOut)
+async def import_rows(
+    request: Request,
+    entity: str = Query(...),
+    format: str | None = Query(None),
+    batch_size: int = Query(BATCH_SIZE, alias="batchSize", ge=1, le=10000),
+    scan_risks: bool = Query(False, alias="scanRisks"),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if entity not in ENTITIES:
+        raise HTTPException(400, f"entity must be one of {', '.join(ENTITIES)}")
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        format = _CONTENT_TYPES.get(content_type, "ndjson")
+    if format not in FORMATS:
+        raise HTTPException(400, f"format must be one of {', '.join(FORMATS)}")
+    if scan_risks and entity != "contracts":
+        raise HTTPException(400, "scanRisks only applies to contracts")
+
+    started = time.perf_counter()
+    parser = RowParser(format)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    totals = {"received": 0, "inserted": 0, "risks": 0, "batches": 0}
+    errors: list[tuple[int, str]] = []
+
+    async def flush(records):
+        # Validation and the rule scan are CPU work: keep them off the loop.
+        batch = await run_in_threadpool(prepare_batch, entity, records, scan_risks)
+        inserted, risks = await db.run_sync(write_batch, batch)
+        totals["received"] += len(records)
+        totals["inserted"] += inserted
+        totals["risks"] += risks
+        totals["batches"] += 1
+        errors.extend(batch.errors)
+
+    pending: list = []
+    async for chunk in request.stream():
+        pending.extend(parser.feed(decoder.decode(chunk)))
+        while len(pending) >= batch_size:
+            await flush(pending[:batch_size])
+            del pending[:batch_size]
+    pending.extend(parser.feed(decoder.decode(b"", final=True)))
+    pending.extend(parser.close())
+    for i in range(0, len(pending), batch_size):
+        await flush(pending[i:i + batch_size])
+
+    errors.sort()
+    return ImportResultOut(
+        entity=entity,
+        format=format,
+        received=totals["received"],
+        inserted=totals["inserted"],
+        failed=len(errors),
+        risksCreated=totals["risks"],
+        batches=totals["batches"],
+        errors=[ImportRowError(row=row, error=msg) for row, msg in errors[:MAX_ERRORS]],
+        errorsTruncated=len(errors) > MAX_ERRORS,
+        elapsedMs=round((time.perf_counter() - started) * 1000),
+    )
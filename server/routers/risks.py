@@ -1,34 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 
-from database import get_db
+from changes import lock_sequence, stamp_ids
+from counters import STATS_COUNTERS, apply_deltas, update_deltas
+from database import get_async_db
 from models import Risk
-from schemas import RiskCreate, RiskUpdate, RiskOut
+from pagination import keyset_page, parse_fields, projected_response, select_columns
+from routers.contracts import require_contract
+from schemas import RiskCreate, RiskUpdate, RiskOut, RiskBatchUpdate, RiskBatchOut, RISK_COLUMNS, BATCH_MAX_ROWS
+from versions import bump, conditional, table_etag
 
 router = APIRouter(prefix="/api/risks", tags=["risks"])
 
 
 @router.get("/", response_model=list[RiskOut])
-def list_risks(
+async def list_risks(
+    request: Request,
+    response: Response,
     contract_id: str | None = Query(None, alias="contractId"),
     level: str | None = Query(None),
     status: str | None = Query(None),
-    db: Session = Depends(get_db),
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = Query(None),
+    fields: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    q = db.query(Risk)
-    if contract_id:
-        q = q.filter(Risk.contract_id == contract_id)
-    if level:
-        q = q.filter(Risk.level == level)
-    if status:
-        q = q.filter(Risk.status == status)
-    rows = q.order_by(Risk.created_at.desc()).all()
-    return [RiskOut.from_orm_model(r) for r in rows]
+    projection = parse_fields(fields, RISK_COLUMNS) or list(RISK_COLUMNS)
+    if (not_modified := conditional(request, response, await table_etag(db, request, "risks"))) is not None:
+        return not_modified
+    q = filter_risks(select_columns(Risk, RISK_COLUMNS, projection), contract_id, level, status)
+    rows = await keyset_page(db, q, Risk, response, limit, cursor)
+    return projected_response(rows, projection, RISK_COLUMNS, response)
 
 
 @router.post("/", response_model=RiskOut, status_code=201)
-def create_risk(body: RiskCreate, db: Session = Depends(get_db)):
+async def create_risk(body: RiskCreate, db: AsyncSession = Depends(get_async_db)):
+    await require_contract(db, body.contract_id)
     clause_start = None
     clause_end = None
     if body.clause_position:
@@ -47,14 +56,66 @@ def create_risk(body: RiskCreate, db: Session = Depends(get_db)):
         status=body.status,
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return RiskOut.from_orm_model(obj)
 
 
+@router.patch("/batch", response_model=RiskBatchOut)
+async def update_risks_batch(body: RiskBatchUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Apply one partial update to the risks in ``ids`` or matching ``filter``
+    with a single ``UPDATE``, in one transaction."""
+    if (body.ids is None) == (body.filter is None):
+        raise HTTPException(400, "Provide either ids or filter")
+    data = body.update.model_dump(exclude_unset=True)
+    if not data:
+        raise HTTPException(400, "Update has no fields")
+    values = {}
+    for key, val in data.items():
+        if key == "resolved_at" and isinstance(val, str):
+            val = datetime.fromisoformat(val)
+        values[key] = val
+    if data.get("status") == "resolved" and not values.get("resolved_at"):
+        now = datetime.now(timezone.utc)
+        # Same as the single update: keep an existing resolution time.
+        values["resolved_at"] = now if "resolved_at" in values else func.coalesce(Risk.resolved_at, now)
+
+    q = select(Risk.id, Risk.contract_id, Risk.level, Risk.status)
+    if body.ids is not None:
+        q = q.filter(Risk.id.in_(set(body.ids)))
+    else:
+        criteria = body.filter.model_dump(exclude_none=True)
+        if not criteria:
+            raise HTTPException(400, "Filter has no fields")
+        q = filter_risks(q, criteria.get("contract_id"), criteria.get("level"), criteria.get("status"))
+    # Counter row before the row locks, in the order every writer takes them.
+    await db.run_sync(lambda session: lock_sequence(session.connection()))
+    targets = (await db.execute(q.limit(BATCH_MAX_ROWS + 1).with_for_update())).all()
+    if len(targets) > BATCH_MAX_ROWS:
+        raise HTTPException(400, f"Filter matches more than {BATCH_MAX_ROWS} risks")
+    ids = [r.id for r in targets]
+    if ids:
+        await db.execute(
+            update(Risk).where(Risk.id.in_(ids)).values(**values).execution_options(synchronize_session=False)
+        )
+        # A Core UPDATE skips the flush hooks that maintain the counters, the
+        # table version and the change sequence.
+        deltas = update_deltas(Risk, targets, values) if STATS_COUNTERS else {}
+        await db.run_sync(lambda session: _after_batch_update(session, targets, values, deltas))
+        await db.commit()
+    rows = (await db.scalars(
+        select(Risk).where(Risk.id.in_(ids)).order_by(Risk.created_at.desc(), Risk.id.desc())
+    )).all() if ids else []
+    found = set(ids)
+    return RiskBatchOut(
+        updated=[RiskOut.from_orm_model(r) for r in rows],
+        notFound=[i for i in dict.fromkeys(body.ids or ()) if i not in found],
+    )
+
+
 @router.patch("/{risk_id}", response_model=RiskOut)
-def update_risk(risk_id: str, body: RiskUpdate, db: Session = Depends(get_db)):
-    obj = db.get(Risk, risk_id)
+async def update_risk(risk_id: str, body: RiskUpdate, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Risk, risk_id)
     if not obj:
         raise HTTPException(404, "Risk not found")
     data = body.model_dump(exclude_unset=True)
@@ -70,15 +131,32 @@ def update_risk(risk_id: str, body: RiskUpdate, db: Session = Depends(get_db)):
         setattr(obj, attr, val)
     if data.get("status") == "resolved" and not obj.resolved_at:
         obj.resolved_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return RiskOut.from_orm_model(obj)
 
 
 @router.delete("/{risk_id}", status_code=204)
-def delete_risk(risk_id: str, db: Session = Depends(get_db)):
-    obj = db.get(Risk, risk_id)
+async def delete_risk(risk_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Risk, risk_id)
     if not obj:
         raise HTTPException(404, "Risk not found")
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+
+
+def filter_risks(q, contract_id: str | None, level: str | None, status: str | None):
+    """The list filters, shared with the export endpoint."""
+    if contract_id:
+        q = q.filter(Risk.contract_id == contract_id)
+    if level:
+        q = q.filter(Risk.level == level)
+    if status:
+        q = q.filter(Risk.status == status)
+    return q
+
+
+def _after_batch_update(session, targets, values: dict, deltas: dict[str, int]) -> None:
+    stamp_ids(session, Risk, targets, values.keys())
+    apply_deltas(session.connection(), deltas)
+    bump(session.connection(), {"risks"})
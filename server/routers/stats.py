@@ -1,41 +1,117 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from collections import Counter, defaultdict
 
-from database import get_db
+from fastapi import APIRouter, Depends, Query, Request, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from counters import dashboard_counts
+from database import get_async_db
 from models import Contract, Risk, Task
-from schemas import DashboardStatsOut
+from schemas import (
+    DashboardStatsOut,
+    ReportsOut, ContractReportOut, RiskReportOut, TaskReportOut, MonthlyAmountOut,
+)
+from versions import conditional, table_etag
 
 router = APIRouter(prefix="/api/stats", tags=["stats"])
 
 
 @router.get("/dashboard", response_model=DashboardStatsOut)
-def dashboard_stats(db: Session = Depends(get_db)):
-    total_contracts = db.query(func.count(Contract.id)).scalar() or 0
-    pending_tasks = (
-        db.query(func.count(Task.id))
-        .filter(Task.status != "completed")
-        .scalar()
-        or 0
-    )
-    high_risks = (
-        db.query(func.count(Risk.id))
-        .filter(Risk.level == "high", Risk.status != "resolved")
-        .scalar()
-        or 0
-    )
-    total_tasks = db.query(func.count(Task.id)).scalar() or 0
-    completed_tasks = (
-        db.query(func.count(Task.id))
-        .filter(Task.status == "completed")
-        .scalar()
-        or 0
-    )
+async def dashboard_stats(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    etag = await table_etag(db, request, "contracts", "risks", "tasks")
+    if (not_modified := conditional(request, response, etag)) is not None:
+        return not_modified
+    counts = await db.run_sync(dashboard_counts)
+    total_tasks = counts["tasks_total"]
+    completed_tasks = counts["tasks_completed"]
     rate = round((completed_tasks / total_tasks) * 100) if total_tasks > 0 else 0
 
     return DashboardStatsOut(
-        totalContracts=total_contracts,
-        pendingTasks=pending_tasks,
-        highRisks=high_risks,
+        totalContracts=counts["contracts_total"],
+        pendingTasks=total_tasks - completed_tasks,
+        highRisks=counts["risks_high_open"],
         completionRate=rate,
     )
+
+
+@router.get("/reports", response_model=ReportsOut)
+async def reports(
+    request: Request,
+    response: Response,
+    date_from: str | None = Query(None, alias="from"),
+    date_to: str | None = Query(None, alias="to"),
+    type: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    etag = await table_etag(db, request, "contracts", "risks", "tasks")
+    if (not_modified := conditional(request, response, etag)) is not None:
+        return not_modified
+    # Filters select a set of contracts (by signing date and type); risk and
+    # task figures are scoped to those contracts.
+    scope = []
+    if date_from:
+        scope.append(Contract.signed_date >= date_from)
+    if date_to:
+        scope.append(Contract.signed_date <= date_to)
+    if type:
+        scope.append(Contract.type == type)
+    scoped_ids = select(Contract.id).where(*scope) if scope else None
+
+    month = func.substr(Contract.signed_date, 1, 7)
+    contract_rows = (await db.execute(
+        select(Contract.type, Contract.status, month, func.count(), func.coalesce(func.sum(Contract.amount), 0))
+        .where(*scope)
+        .group_by(Contract.type, Contract.status, month)
+    )).all()
+    by_type, by_status, monthly = Counter(), Counter(), defaultdict(float)
+    total, total_amount = 0, 0.0
+    for c_type, c_status, c_month, n, amount in contract_rows:
+        by_type[c_type] += n
+        by_status[c_status] += n
+        if c_month:
+            monthly[c_month] += amount
+        total += n
+        total_amount += amount
+
+    risk_q = select(Risk.level, Risk.type, Risk.status, func.count()).group_by(Risk.level, Risk.type, Risk.status)
+    if scoped_ids is not None:
+        risk_q = risk_q.where(Risk.contract_id.in_(scoped_ids))
+    risk_by_level, risk_by_type, risk_by_status = Counter(), Counter(), Counter()
+    for level, r_type, r_status, n in await db.execute(risk_q):
+        risk_by_level[level] += n
+        risk_by_type[r_type] += n
+        risk_by_status[r_status] += n
+    risk_total = sum(risk_by_level.values())
+
+    task_q = select(Task.status, Task.priority, func.count()).group_by(Task.status, Task.priority)
+    if scoped_ids is not None:
+        task_q = task_q.where(Task.contract_id.in_(scoped_ids))
+    task_by_status, task_by_priority = Counter(), Counter()
+    for t_status, priority, n in await db.execute(task_q):
+        task_by_status[t_status] += n
+        task_by_priority[priority] += n
+    task_total = sum(task_by_status.values())
+
+    return ReportsOut(
+        contracts=ContractReportOut(
+            total=total,
+            totalAmount=total_amount,
+            averageAmount=round(total_amount / total, 2) if total else 0,
+            byType=dict(by_type),
+            byStatus=dict(by_status),
+            monthlyAmount=[MonthlyAmountOut(month=m, amount=a) for m, a in sorted(monthly.items())],
+        ),
+        risks=RiskReportOut(
+            total=risk_total,
+            pending=risk_total - risk_by_status.get("resolved", 0),
+            byLevel=dict(risk_by_level),
+            byType=dict(risk_by_type),
+            byStatus=dict(risk_by_status),
+        ),
+        tasks=TaskReportOut(
+            total=task_total,
+            completionRate=round(task_by_status.get("completed", 0) / task_total * 100) if task_total else 0,
+            byStatus=dict(task_by_status),
+            byPriority=dict(task_by_priority),
+        ),
+    )
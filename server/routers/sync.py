@@ -0,0 +1,85 @@
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from changes import ENTITY_KEYS, pruned_through
+from database import get_async_db
+from models import Annotation, Contract, Risk, Task, TextEdit
+from pagination import row_mapper, select_columns
+from schemas import (
+    ANNOTATION_COLUMNS, CONTRACT_COLUMNS, RISK_COLUMNS, TASK_COLUMNS, TEXT_EDIT_COLUMNS, SyncOut,
+)
+
+router = APIRouter(prefix="/api/sync", tags=["sync"])
+
+# (response key, model, wire columns)
+_SOURCES = [
+    ("contracts", Contract, CONTRACT_COLUMNS),
+    ("risks", Risk, RISK_COLUMNS),
+    ("tasks", Task, TASK_COLUMNS),
+    ("annotations", Annotation, ANNOTATION_COLUMNS),
+    ("textEdits", TextEdit, TEXT_EDIT_COLUMNS),
+]
+
+
+def _snapshot(session) -> None:
+    """Make the request's reads one transaction on a single snapshot, so a
+    write committing between two of them cannot slip under the cursor."""
+    conn = session.connection()
+    if conn.dialect.name == "sqlite":
+        # pysqlite never BEGINs for reads: each SELECT would see its own state.
+        conn.exec_driver_sql("BEGIN")
+    elif conn.dialect.name == "postgresql":
+        # READ COMMITTED takes a new snapshot per statement.
+        conn.exec_driver_sql("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+
+
+@router.get("", response_model=SyncOut)
+async def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Rows created or updated and ids deleted after the cursor ``since``, at
+    most ``limit`` changes, oldest first. Pass the returned ``cursor`` as the
+    next ``since``; ``hasMore`` means another page is waiting. ``since=0``
+    (a cold start) pages through every row."""
+    await db.run_sync(_snapshot)
+    if since and since < await db.run_sync(lambda session: pruned_through(session.connection())):
+        raise HTTPException(410, "Cursor expired, resync from 0")
+
+    # Up to limit + 1 changes from each source, merged by sequence number;
+    # numbers are unique, so cutting the merged list never splits a change.
+    changes: list[tuple[int, str, object]] = []
+    for key, model, columns in _SOURCES:
+        q = (
+            select_columns(model, columns, list(columns))
+            .add_columns(model.change_seq)
+            .where(model.change_seq > since)
+            .order_by(model.change_seq)
+            .limit(limit + 1)
+        )
+        changes += [(r.change_seq, key, r) for r in (await db.execute(q)).all()]
+    if since:
+        tombstones = (await db.execute(
+            text(
+                "SELECT seq, entity, row_id FROM sync_tombstones WHERE seq > :since ORDER BY seq LIMIT :limit"
+            ),
+            {"since": since, "limit": limit + 1},
+        )).all()
+        changes += [(t.seq, "deleted", t) for t in tombstones]
+    changes.sort(key=lambda c: c[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    mappers = {key: row_mapper(list(columns), columns) for key, _, columns in _SOURCES}
+    out: dict = {"cursor": changes[-1][0] if changes else since, "hasMore": has_more}
+    out.update({key: [] for key, _, _ in _SOURCES})
+    out["deleted"] = []
+    for _, key, row in changes:
+        if key == "deleted":
+            out["deleted"].append({"entity": ENTITY_KEYS[row.entity], "id": row.row_id})
+        else:
+            out[key].append(mappers[key](row))
+    return Response(orjson.dumps(out), media_type="application/json")
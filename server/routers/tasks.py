@@ -1,34 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 
-from database import get_db
+from changes import lock_sequence, stamp_ids
+from counters import STATS_COUNTERS, apply_deltas, update_deltas
+from database import get_async_db
 from models import Task
-from schemas import TaskCreate, TaskUpdate, TaskOut
+from pagination import keyset_page, parse_fields, projected_response, select_columns
+from routers.contracts import require_contract
+from schemas import TaskCreate, TaskUpdate, TaskOut, TaskBatchUpdate, TaskBatchOut, TASK_COLUMNS, BATCH_MAX_ROWS
+from versions import bump, conditional, table_etag
 
 router = APIRouter(prefix="/api/tasks", tags=["tasks"])
 
 
 @router.get("/", response_model=list[TaskOut])
-def list_tasks(
+async def list_tasks(
+    request: Request,
+    response: Response,
     status: str | None = Query(None),
     priority: str | None = Query(None),
     contract_id: str | None = Query(None, alias="contractId"),
-    db: Session = Depends(get_db),
+    limit: int | None = Query(None, ge=1, le=500),
+    cursor: str | None = Query(None),
+    fields: str | None = Query(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    q = db.query(Task)
-    if status:
-        q = q.filter(Task.status == status)
-    if priority:
-        q = q.filter(Task.priority == priority)
-    if contract_id:
-        q = q.filter(Task.contract_id == contract_id)
-    rows = q.order_by(Task.created_at.desc()).all()
-    return [TaskOut.from_orm_model(r) for r in rows]
+    projection = parse_fields(fields, TASK_COLUMNS) or list(TASK_COLUMNS)
+    if (not_modified := conditional(request, response, await table_etag(db, request, "tasks"))) is not None:
+        return not_modified
+    q = filter_tasks(select_columns(Task, TASK_COLUMNS, projection), status, priority, contract_id)
+    rows = await keyset_page(db, q, Task, response, limit, cursor)
+    return projected_response(rows, projection, TASK_COLUMNS, response)
 
 
 @router.post("/", response_model=TaskOut, status_code=201)
-def create_task(body: TaskCreate, db: Session = Depends(get_db)):
+async def create_task(body: TaskCreate, db: AsyncSession = Depends(get_async_db)):
+    if body.contract_id is not None:
+        await require_contract(db, body.contract_id)
     obj = Task(
         title=body.title,
         description=body.description,
@@ -41,17 +51,73 @@ def create_task(body: TaskCreate, db: Session = Depends(get_db)):
         contract_name=body.contract_name,
     )
     db.add(obj)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return TaskOut.from_orm_model(obj)
 
 
+@router.patch("/batch", response_model=TaskBatchOut)
+async def update_tasks_batch(body: TaskBatchUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Apply one partial update to the tasks in ``ids`` or matching ``filter``
+    with a single ``UPDATE``, in one transaction."""
+    if (body.ids is None) == (body.filter is None):
+        raise HTTPException(400, "Provide either ids or filter")
+    data = body.update.model_dump(exclude_unset=True)
+    if not data:
+        raise HTTPException(400, "Update has no fields")
+    if data.get("contract_id") is not None:
+        await require_contract(db, data["contract_id"])
+    values = {}
+    for key, val in data.items():
+        if key == "completed_at" and isinstance(val, str):
+            val = datetime.fromisoformat(val)
+        values[key] = val
+    if data.get("status") == "completed" and not values.get("completed_at"):
+        now = datetime.now(timezone.utc)
+        # Same as the single update: keep an existing completion time.
+        values["completed_at"] = now if "completed_at" in values else func.coalesce(Task.completed_at, now)
+
+    q = select(Task.id, Task.contract_id, Task.status)
+    if body.ids is not None:
+        q = q.filter(Task.id.in_(set(body.ids)))
+    else:
+        criteria = body.filter.model_dump(exclude_none=True)
+        if not criteria:
+            raise HTTPException(400, "Filter has no fields")
+        q = filter_tasks(q, criteria.get("status"), criteria.get("priority"), criteria.get("contract_id"))
+    # Counter row before the row locks, in the order every writer takes them.
+    await db.run_sync(lambda session: lock_sequence(session.connection()))
+    targets = (await db.execute(q.limit(BATCH_MAX_ROWS + 1).with_for_update())).all()
+    if len(targets) > BATCH_MAX_ROWS:
+        raise HTTPException(400, f"Filter matches more than {BATCH_MAX_ROWS} tasks")
+    ids = [r.id for r in targets]
+    if ids:
+        await db.execute(
+            update(Task).where(Task.id.in_(ids)).values(**values).execution_options(synchronize_session=False)
+        )
+        # A Core UPDATE skips the flush hooks that maintain the counters, the
+        # table version and the change sequence.
+        deltas = update_deltas(Task, targets, values) if STATS_COUNTERS else {}
+        await db.run_sync(lambda session: _after_batch_update(session, targets, values, deltas))
+        await db.commit()
+    rows = (await db.scalars(
+        select(Task).where(Task.id.in_(ids)).order_by(Task.created_at.desc(), Task.id.desc())
+    )).all() if ids else []
+    found = set(ids)
+    return TaskBatchOut(
+        updated=[TaskOut.from_orm_model(r) for r in rows],
+        notFound=[i for i in dict.fromkeys(body.ids or ()) if i not in found],
+    )
+
+
 @router.patch("/{task_id}", response_model=TaskOut)
-def update_task(task_id: str, body: TaskUpdate, db: Session = Depends(get_db)):
-    obj = db.get(Task, task_id)
+async def update_task(task_id: str, body: TaskUpdate, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Task, task_id)
     if not obj:
         raise HTTPException(404, "Task not found")
     data = body.model_dump(exclude_unset=True)
+    if data.get("contract_id") is not None:
+        await require_contract(db, data["contract_id"])
     field_map = {
         "due_date": "due_date",
         "contract_id": "contract_id",
@@ -65,15 +131,32 @@ def update_task(task_id: str, body: TaskUpdate, db: Session = Depends(get_db)):
         setattr(obj, attr, val)
     if data.get("status") == "completed" and not obj.completed_at:
         obj.completed_at = datetime.now(timezone.utc)
-    db.commit()
-    db.refresh(obj)
+    await db.commit()
+    await db.refresh(obj)
     return TaskOut.from_orm_model(obj)
 
 
 @router.delete("/{task_id}", status_code=204)
-def delete_task(task_id: str, db: Session = Depends(get_db)):
-    obj = db.get(Task, task_id)
+async def delete_task(task_id: str, db: AsyncSession = Depends(get_async_db)):
+    obj = await db.get(Task, task_id)
     if not obj:
         raise HTTPException(404, "Task not found")
-    db.delete(obj)
-    db.commit()
+    await db.delete(obj)
+    await db.commit()
+
+
+def filter_tasks(q, status: str | None, priority: str | None, contract_id: str | None):
+    """The list filters, shared with the export endpoint."""
+    if status:
+        q = q.filter(Task.status == status)
+    if priority:
+        q = q.filter(Task.priority == priority)
+    if contract_id:
+        q = q.filter(Task.contract_id == contract_id)
+    return q
+
+
+def _after_batch_update(session, targets, values: dict, deltas: dict[str, int]) -> None:
+    stamp_ids(session, Task, targets, values.keys())
+    apply_deltas(session.connection(), deltas)
+    bump(session.connection(), {"tasks"})
@@ -67,6 +67,43 @@ class ContractOut(BaseModel):
         )
 
 
+CONTRACT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "name": ("name",),
+    "type": ("type",),
+    "party": ("party",),
+    "amount": ("amount",),
+    "signedDate": ("signed_date",),
+    "expiryDate": ("expiry_date",),
+    "status": ("status",),
+    "content": ("content",),
+    "aiAnalyzed": ("ai_analyzed",),
+    "riskLevel": ("risk_level",),
+    "createdAt": ("created_at",),
+    "updatedAt": ("updated_at",),
+}
+
+# The list leaves content out unless asked for with ``fields=``; it is read
+# from contract_bodies (see bodies.py).
+CONTRACT_LIST_FIELDS = [f for f in CONTRACT_COLUMNS if f != "content"]
+
+
+class ContractListOut(ContractOut):
+    """A contract list item: ``content`` only with ``fields=content``."""
+    content: str | None = None
+
+
+class ContractSearchHit(BaseModel):
+    id: str
+    name: str
+    type: str
+    party: str
+    status: str
+    riskLevel: str | None
+    snippet: str | None
+    score: float
+
+
 # ── Risk ──────────────────────────────────────────────────────────────
 
 class RiskCreate(BaseModel):
@@ -105,6 +142,7 @@ class RiskOut(BaseModel):
     suggestion: str
     clause: str | None
     clausePosition: dict | None
+    clauseMissing: bool = False
     status: str
     assignedTo: str | None
     assignedDepartment: str | None
@@ -126,6 +164,7 @@ class RiskOut(BaseModel):
             suggestion=obj.suggestion,
             clause=obj.clause,
             clausePosition=clause_pos,
+            clauseMissing=bool(obj.clause_missing),
             status=obj.status,
             assignedTo=obj.assigned_to,
             assignedDepartment=obj.assigned_department,
@@ -134,6 +173,48 @@ class RiskOut(BaseModel):
         )
 
 
+RISK_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "contractId": ("contract_id",),
+    "contractName": ("contract_name",),
+    "type": ("type",),
+    "level": ("level",),
+    "description": ("description",),
+    "suggestion": ("suggestion",),
+    "clause": ("clause",),
+    "clausePosition": ("clause_start", "clause_end"),
+    "clauseMissing": ("clause_missing",),
+    "status": ("status",),
+    "assignedTo": ("assigned_to",),
+    "assignedDepartment": ("assigned_department",),
+    "createdAt": ("created_at",),
+    "resolvedAt": ("resolved_at",),
+}
+
+
+# Most rows one batch update may touch, whether given by ids or a filter.
+BATCH_MAX_ROWS = 1000
+
+
+class RiskBatchFilter(BaseModel):
+    contract_id: str | None = Field(None, alias="contractId")
+    level: str | None = None
+    status: str | None = None
+
+    model_config = {"populate_by_name": True}
+
+
+class RiskBatchUpdate(BaseModel):
+    ids: list[str] | None = Field(None, max_length=BATCH_MAX_ROWS)
+    filter: RiskBatchFilter | None = None
+    update: RiskUpdate
+
+
+class RiskBatchOut(BaseModel):
+    updated: list[RiskOut]
+    notFound: list[str]
+
+
 # ── Task ──────────────────────────────────────────────────────────────
 
 class TaskCreate(BaseModel):
@@ -197,6 +278,41 @@ class TaskOut(BaseModel):
         )
 
 
+TASK_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "title": ("title",),
+    "description": ("description",),
+    "type": ("type",),
+    "priority": ("priority",),
+    "status": ("status",),
+    "assignee": ("assignee",),
+    "dueDate": ("due_date",),
+    "contractId": ("contract_id",),
+    "contractName": ("contract_name",),
+    "createdAt": ("created_at",),
+    "completedAt": ("completed_at",),
+}
+
+
+class TaskBatchFilter(BaseModel):
+    status: str | None = None
+    priority: str | None = None
+    contract_id: str | None = Field(None, alias="contractId")
+
+    model_config = {"populate_by_name": True}
+
+
+class TaskBatchUpdate(BaseModel):
+    ids: list[str] | None = Field(None, max_length=BATCH_MAX_ROWS)
+    filter: TaskBatchFilter | None = None
+    update: TaskUpdate
+
+
+class TaskBatchOut(BaseModel):
+    updated: list[TaskOut]
+    notFound: list[str]
+
+
 # ── Annotation ────────────────────────────────────────────────────────
 
 class AnnotationCreate(BaseModel):
@@ -225,6 +341,15 @@ class AnnotationOut(BaseModel):
         )
 
 
+ANNOTATION_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "contractId": ("contract_id",),
+    "text": ("text",),
+    "note": ("note",),
+    "createdAt": ("created_at",),
+}
+
+
 # ── TextEdit ──────────────────────────────────────────────────────────
 
 class TextEditCreate(BaseModel):
@@ -242,6 +367,7 @@ class TextEditOut(BaseModel):
     type: str
     text: str
     position: int
+    seq: int | None = None
     createdAt: str
 
     @classmethod
@@ -252,10 +378,80 @@ class TextEditOut(BaseModel):
             type=obj.type,
             text=obj.text,
             position=obj.position,
+            seq=obj.seq,
             createdAt=obj.created_at.isoformat() if isinstance(obj.created_at, datetime) else str(obj.created_at),
         )
 
 
+TEXT_EDIT_COLUMNS: dict[str, tuple[str, ...]] = {
+    "id": ("id",),
+    "contractId": ("contract_id",),
+    "type": ("type",),
+    "text": ("text",),
+    "position": ("position",),
+    "seq": ("seq",),
+    "createdAt": ("created_at",),
+}
+
+
+class ContractTextOut(BaseModel):
+    contractId: str
+    seq: int
+    length: int
+    start: int
+    end: int
+    text: str
+    edits: list[TextEditOut]
+
+
+class ContractFullOut(BaseModel):
+    """A contract with its child collections; those left out of ``include=``
+    are omitted from the response."""
+    contract: ContractOut
+    risks: list[RiskOut] | None = None
+    tasks: list[TaskOut] | None = None
+    annotations: list[AnnotationOut] | None = None
+    textEdits: list[TextEditOut] | None = None
+
+
+# ── Sync ──────────────────────────────────────────────────────────────
+
+class SyncDeletedOut(BaseModel):
+    entity: str
+    id: str
+
+
+class SyncOut(BaseModel):
+    cursor: int
+    hasMore: bool
+    contracts: list[ContractOut]
+    risks: list[RiskOut]
+    tasks: list[TaskOut]
+    annotations: list[AnnotationOut]
+    textEdits: list[TextEditOut]
+    deleted: list[SyncDeletedOut]
+
+
+# ── Import ────────────────────────────────────────────────────────────
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+
+class ImportResultOut(BaseModel):
+    entity: str
+    format: str
+    received: int
+    inserted: int
+    failed: int
+    risksCreated: int
+    batches: int
+    errors: list[ImportRowError]
+    errorsTruncated: bool
+    elapsedMs: int
+
+
 # ── Stats ─────────────────────────────────────────────────────────────
 
 class DashboardStatsOut(BaseModel):
@@ -265,6 +461,41 @@ class DashboardStatsOut(BaseModel):
     completionRate: int
 
 
+class MonthlyAmountOut(BaseModel):
+    month: str
+    amount: float
+
+
+class ContractReportOut(BaseModel):
+    total: int
+    totalAmount: float
+    averageAmount: float
+    byType: dict[str, int]
+    byStatus: dict[str, int]
+    monthlyAmount: list[MonthlyAmountOut]
+
+
+class RiskReportOut(BaseModel):
+    total: int
+    pending: int
+    byLevel: dict[str, int]
+    byType: dict[str, int]
+    byStatus: dict[str, int]
+
+
+class TaskReportOut(BaseModel):
+    total: int
+    completionRate: int
+    byStatus: dict[str, int]
+    byPriority: dict[str, int]
+
+
+class ReportsOut(BaseModel):
+    contracts: ContractReportOut
+    risks: RiskReportOut
+    tasks: TaskReportOut
+
+
 # ── AI ────────────────────────────────────────────────────────────────
 
 class AIAnalyzeRequest(BaseModel):
@@ -298,3 +529,34 @@ class AIAnalyzeResponse(BaseModel):
 
 class AIAdviceResponse(BaseModel):
     advice: str
+
+
+class AnalysisJobCreate(BaseModel):
+    contractId: str
+
+
+class AnalysisJobOut(BaseModel):
+    id: str
+    contractId: str
+    status: str
+    error: str | None
+    result: AIAnalyzeResponse | None
+    createdAt: str
+    startedAt: str | None
+    finishedAt: str | None
+
+    @classmethod
+    def from_orm_model(cls, obj) -> AnalysisJobOut:
+        def iso(value):
+            return value.isoformat() if isinstance(value, datetime) else str(value) if value else None
+
+        return cls(
+            id=obj.id,
+            contractId=obj.contract_id,
+            status=obj.status,
+            error=obj.error,
+            result=AIAnalyzeResponse.model_validate_json(obj.result) if obj.result else None,
+            createdAt=iso(obj.created_at),
+            startedAt=iso(obj.started_at),
+            finishedAt=iso(obj.finished_at),
+        )
@@ -0,0 +1,166 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
+
+# Trigram tokenizer: indexes every 3-character window, so Chinese text (no
+# word boundaries) is searchable by substring. Terms shorter than three
+# characters cannot use the index and fall back to LIKE.
+MIN_FTS_TERM = 3
+
+# Contract content is compressed in contract_bodies (see bodies.py), so the
+# index reads the text through this view, which the triggers below keep it in
+# step with. A contract without a body row is indexed with empty content.
+_BODY_TEXT = "coalesce((SELECT contract_text(data) FROM contract_bodies WHERE contract_id = {id}), '')"
+_FTS_COLUMNS = "contracts_fts(rowid, name, party, type, content)"
+_FTS_DELETE = "contracts_fts(contracts_fts, rowid, name, party, type, content)"
+
+# Indexing a new contract and its body; bulk_fts_index replaces both.
+FTS_INSERT_TRIGGERS = {
+    "contracts_fts_ai": f"""
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_ai AFTER INSERT ON contracts BEGIN
+        INSERT INTO {_FTS_COLUMNS}
+        VALUES (new.rowid, new.name, new.party, new.type, {_BODY_TEXT.format(id="new.id")});
+    END
+    """,
+    "contract_bodies_fts_ai": f"""
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_ai AFTER INSERT ON contract_bodies BEGIN
+        INSERT INTO {_FTS_DELETE}
+        SELECT 'delete', rowid, name, party, type, '' FROM contracts WHERE id = new.contract_id;
+        INSERT INTO {_FTS_COLUMNS}
+        SELECT rowid, name, party, type, contract_text(new.data) FROM contracts WHERE id = new.contract_id;
+    END
+    """,
+}
+
+FTS_DDL = [
+    """
+    CREATE VIEW IF NOT EXISTS contract_texts AS
+    SELECT c.rowid AS docid, c.name, c.party, c.type, coalesce(contract_text(b.data), '') AS content
+    FROM contracts c LEFT JOIN contract_bodies b ON b.contract_id = c.id
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS contracts_fts USING fts5(
+        name, party, type, content,
+        content='contract_texts', content_rowid='docid',
+        tokenize='trigram'
+    )
+    """,
+    *FTS_INSERT_TRIGGERS.values(),
+    # BEFORE: the foreign key cascade removes the body along with the row.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_bd BEFORE DELETE ON contracts BEGIN
+        INSERT INTO {_FTS_DELETE}
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, {_BODY_TEXT.format(id="old.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contracts_fts_au AFTER UPDATE OF name, party, type ON contracts BEGIN
+        INSERT INTO {_FTS_DELETE}
+        VALUES ('delete', old.rowid, old.name, old.party, old.type, {_BODY_TEXT.format(id="old.id")});
+        INSERT INTO {_FTS_COLUMNS}
+        VALUES (new.rowid, new.name, new.party, new.type, {_BODY_TEXT.format(id="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_au AFTER UPDATE OF data ON contract_bodies BEGIN
+        INSERT INTO {_FTS_DELETE}
+        SELECT 'delete', rowid, name, party, type, contract_text(old.data) FROM contracts WHERE id = old.contract_id;
+        INSERT INTO {_FTS_COLUMNS}
+        SELECT rowid, name, party, type, contract_text(new.data) FROM contracts WHERE id = new.contract_id;
+    END
+    """,
+    # A no-op when the body goes with its contract: the row is gone by then.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contract_bodies_fts_ad AFTER DELETE ON contract_bodies BEGIN
+        INSERT INTO {_FTS_DELETE}
+        SELECT 'delete', rowid, name, party, type, contract_text(old.data) FROM contracts WHERE id = old.contract_id;
+        INSERT INTO {_FTS_COLUMNS}
+        SELECT rowid, name, party, type, '' FROM contracts WHERE id = old.contract_id;
+    END
+    """,
+]
+
+
+def fts_available(bind: Engine | Connection) -> bool:
+    return bind.dialect.name == "sqlite"
+
+
+def ensure_fts(conn: Connection) -> None:
+    """Create the FTS index and its sync triggers, back-filling existing rows on first run."""
+    if not fts_available(conn):
+        return
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'contracts_fts'")
+    ).first()
+    for ddl in FTS_DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        conn.execute(text("INSERT INTO contracts_fts(contracts_fts) VALUES ('rebuild')"))
+
+
+@contextmanager
+def bulk_fts_index(conn: Connection, ids: list[str]) -> Iterator[None]:
+    """Index the contracts ``ids`` inserted inside the block (with their
+    bodies) with one set-based statement instead of the per-row insert
+    triggers.
+
+    FTS5 flushes its pending terms at every statement boundary a trigger
+    runs in, so row-by-row indexing costs several times a single
+    INSERT … SELECT. The triggers are dropped and recreated inside the caller's
+    write transaction; DDL is transactional in SQLite, so other connections
+    never see them missing, and a rollback restores them. Commit after the block.
+    """
+    if not fts_available(conn):
+        yield
+        return
+    # pysqlite only opens a transaction implicitly before DML; DDL issued
+    # first would autocommit on its own.
+    if not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+    for name in FTS_INSERT_TRIGGERS:
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    yield
+    conn.execute(
+        text(
+            f"INSERT INTO {_FTS_COLUMNS} "
+            "SELECT docid, name, party, type, content FROM contract_texts "
+            "WHERE docid IN (SELECT rowid FROM contracts WHERE id IN :ids) ORDER BY docid"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    )
+    for ddl in FTS_INSERT_TRIGGERS.values():
+        conn.execute(text(ddl))
+
+
+def split_terms(search: str, use_fts: bool) -> tuple[str | None, list[str]]:
+    """Split a search string into an FTS5 MATCH expression and the terms left for LIKE.
+
+    The MATCH expression is an AND of quoted phrases built from terms the
+    trigram index can serve; it is None when no such term exists.
+    """
+    terms = search.split()
+    if not use_fts:
+        return None, terms
+    long_terms = [t for t in terms if len(t) >= MIN_FTS_TERM]
+    short_terms = [t for t in terms if len(t) < MIN_FTS_TERM]
+    if not long_terms:
+        return None, short_terms
+    return " ".join('"' + t.replace('"', '""') + '"' for t in long_terms), short_terms
+
+
+def like_snippet(content: str, term: str, width: int = 16) -> str | None:
+    """Highlighted excerpt for the LIKE fallback, shaped like FTS5 ``snippet()`` output."""
+    idx = content.lower().find(term.lower())
+    if idx < 0:
+        return None
+    start = max(0, idx - width)
+    end = min(len(content), idx + len(term) + width)
+    return (
+        ("…" if start > 0 else "")
+        + content[start:idx]
+        + "<mark>" + content[idx:idx + len(term)] + "</mark>"
+        + content[idx + len(term):end]
+        + ("…" if end < len(content) else "")
+    )
@@ -0,0 +1,165 @@
+"""Content-addressed cache for AI results.
+
+Two tiers: a bounded in-process LRU (entry count, total bytes, TTL) in front
+of the ``ai_cache`` table, which survives restarts and is shared by workers.
+Keys hash everything that determines the model output, so a changed contract
+can never hit an old entry; ``invalidate_content`` only reclaims space early.
+
+A lookup never writes: per-entry hit counts collect in memory and reach the
+table's ``hits`` column with the next ``put`` (already a write) or
+``flush_hits`` at shutdown, so counts from a crashed process are lost.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+from database import SessionLocal
+
+TTL = float(os.getenv("AI_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "256"))
+MAX_BYTES = int(os.getenv("AI_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def make_key(kind: str, model: str, prompt_version: str, contract_type: str, content: str, extra: str = "") -> str:
+    raw = json.dumps([kind, model, prompt_version, contract_type, content_hash(content), extra], ensure_ascii=False)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class AICache:
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES, ttl: float = TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires_at, content_hash, serialised value)
+        self._lru: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._row_hits: dict[str, int] = {}
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ── memory tier ──
+
+    def _remember(self, key: str, expires_at: float, chash: str, raw: str) -> None:
+        with self._lock:
+            if key in self._lru:
+                self._bytes -= len(self._lru.pop(key)[2])
+            self._lru[key] = (expires_at, chash, raw)
+            self._bytes += len(raw)
+            while self._lru and (len(self._lru) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, old) = self._lru.popitem(last=False)
+                self._bytes -= len(old)
+                self.evictions += 1
+
+    def _recall(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._lru[key]
+                self._bytes -= len(entry[2])
+                return None
+            self._lru.move_to_end(key)
+            return entry[2]
+
+    # ── public API (blocking; call from a worker thread in async code) ──
+
+    def get(self, key: str):
+        raw = self._recall(key)
+        if raw is not None:
+            self._hit(key)
+            return json.loads(raw)
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                text("SELECT value, content_hash, expires_at FROM ai_cache WHERE key = :key AND expires_at > :now"),
+                {"key": key, "now": time.time()},
+            ).first()
+        finally:
+            db.close()
+        if row is None:
+            self.misses += 1
+            return None
+        self._hit(key)
+        self.db_hits += 1
+        self._remember(key, row.expires_at, row.content_hash, row.value)
+        return json.loads(row.value)
+
+    def put(self, key: str, kind: str, content: str, value) -> None:
+        raw = json.dumps(value, ensure_ascii=False)
+        chash = content_hash(content)
+        now = time.time()
+        db = SessionLocal()
+        try:
+            self._write_hits(db)
+            db.execute(text("DELETE FROM ai_cache WHERE key = :key"), {"key": key})
+            db.execute(
+                text(
+                    "INSERT INTO ai_cache (key, kind, content_hash, value, created_at, expires_at, hits) "
+                    "VALUES (:key, :kind, :chash, :value, :now, :expires, 0)"
+                ),
+                {"key": key, "kind": kind, "chash": chash, "value": raw, "now": now, "expires": now + self.ttl},
+            )
+            db.execute(text("DELETE FROM ai_cache WHERE expires_at <= :now"), {"now": now})
+            db.commit()
+        finally:
+            db.close()
+        self._remember(key, now + self.ttl, chash, raw)
+
+    def flush_hits(self) -> None:
+        """Write the hit counts collected since the last write."""
+        db = SessionLocal()
+        try:
+            self._write_hits(db)
+            db.commit()
+        finally:
+            db.close()
+
+    def _hit(self, key: str) -> None:
+        with self._lock:
+            self.hits += 1
+            self._row_hits[key] = self._row_hits.get(key, 0) + 1
+
+    def _write_hits(self, db) -> None:
+        with self._lock:
+            pending, self._row_hits = self._row_hits, {}
+        if pending:
+            db.execute(
+                text("UPDATE ai_cache SET hits = hits + :n WHERE key = :key"),
+                [{"key": key, "n": n} for key, n in pending.items()],
+            )
+
+    def invalidate_content(self, db, content: str) -> None:
+        """Drop every entry derived from ``content``; runs in the caller's transaction."""
+        chash = content_hash(content)
+        db.execute(text("DELETE FROM ai_cache WHERE content_hash = :chash"), {"chash": chash})
+        with self._lock:
+            for key in [k for k, v in self._lru.items() if v[1] == chash]:
+                self._bytes -= len(self._lru.pop(key)[2])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "dbHits": self.db_hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "memoryEntries": len(self._lru),
+            "memoryBytes": self._bytes,
+        }
+
+
+cache = AICache()
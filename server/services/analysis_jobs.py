@@ -0,0 +1,289 @@
+"""Background AI analysis jobs.
+
+Submitting a contract persists an ``analysis_jobs`` row and returns at once; a
+fixed pool of asyncio workers drains the queue, so at most ``AI_JOB_WORKERS``
+analyses hold an upstream connection at a time. A job's risks, the contract's
+``ai_analyzed``/``risk_level`` flags and the job's own result are written in a
+single transaction, replacing the risks earlier jobs wrote that nobody has
+acted on yet (still ``pending``). Jobs survive restarts: queued ones, and running ones whose
+worker has gone quiet for ``AI_JOB_STALE_SECONDS``, are requeued on startup.
+
+A job whose contract content changed while it ran ends ``stale`` and writes
+nothing. When the upstream model fails the job ends ``fallback``: the
+rule-based analysis is kept as the job's result only, leaving the contract's
+risks and flags alone.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+
+from pydantic import ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from changes import lock_sequence
+from models import AnalysisJob, Contract, ContractBody, Risk
+from schemas import AIAnalyzeResponse
+from services.ai_cache import content_hash
+from services.chunking import locate_clause
+from services.kimi_service import analyze_contract_risk
+from services.rules import rule_based_analysis
+
+WORKERS = int(os.getenv("AI_JOB_WORKERS", "4"))
+STALE_SECONDS = float(os.getenv("AI_JOB_STALE_SECONDS", "600"))
+
+IN_FLIGHT = ("queued", "running")
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def submit_job(db, contract: Contract) -> tuple[AnalysisJob, bool]:
+    """Persist a queued job for ``contract``; returns ``(job, created)``.
+
+    An in-flight job for the same contract content is returned instead of
+    starting a second one. Enqueue the id with ``runner.enqueue`` after commit.
+    """
+    chash = contract.body.hash if contract.body is not None else content_hash("")
+    existing = _in_flight(db, contract.id, chash)
+    if existing is not None:
+        return existing, False
+    job = AnalysisJob(contract_id=contract.id, content_hash=chash, status="queued")
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost the race against a concurrent submit; the partial unique index
+        # guarantees the winner's row is there.
+        db.rollback()
+        return _in_flight(db, contract.id, chash), False
+    db.refresh(job)
+    return job, True
+
+
+def _in_flight(db, contract_id: str, chash: str) -> AnalysisJob | None:
+    return db.execute(
+        select(AnalysisJob).where(
+            AnalysisJob.contract_id == contract_id,
+            AnalysisJob.content_hash == chash,
+            AnalysisJob.status.in_(IN_FLIGHT),
+        )
+    ).scalar_one_or_none()
+
+
+# ── blocking helpers (run via asyncio.to_thread) ──
+
+def _claim(job_id: str) -> tuple[str, str, str] | None:
+    """Atomically move a queued job to running; returns the contract fields to analyse."""
+    db = SessionLocal()
+    try:
+        claimed = db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+            .values(status="running", started_at=_now())
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return None
+        job = db.get(AnalysisJob, job_id)
+        contract = db.get(Contract, job.contract_id)
+        if contract is None:
+            job.status, job.error, job.finished_at = "failed", "Contract not found", _now()
+            db.commit()
+            return None
+        db.commit()
+        return contract.name, contract.type, contract.content
+    finally:
+        db.close()
+
+
+def _persist(job_id: str, result: AIAnalyzeResponse, content: str) -> None:
+    """Store ``result``, the analysis of ``content``, as the contract's AI risks."""
+    db = SessionLocal()
+    try:
+        # Writers take the counter row first, so from here on the content
+        # cannot change under the check below.
+        lock_sequence(db.connection())
+        job = db.get(AnalysisJob, job_id)
+        contract = db.get(Contract, job.contract_id) if job else None
+        if job is None or contract is None:
+            if job is not None:
+                job.status, job.error, job.finished_at = "failed", "Contract not found", _now()
+                db.commit()
+            return
+        chash = db.scalar(select(ContractBody.hash).where(ContractBody.contract_id == contract.id))
+        if (chash or content_hash("")) != job.content_hash:
+            job.status, job.error, job.finished_at = "stale", "Contract content changed during analysis", _now()
+            db.commit()
+            return
+        earlier = db.scalars(
+            select(Risk).where(Risk.contract_id == contract.id, Risk.job_id.is_not(None))
+        ).all()
+        kept = set()
+        for risk in earlier:
+            if risk.status == "pending":
+                db.delete(risk)
+            else:
+                kept.add((risk.type, risk.clause))
+        for item in result.risks:
+            if (item.type, item.clause) in kept:
+                continue
+            # The model's offsets are a guess; the quoted clause is exact.
+            pos = locate_clause(content, item.model_dump(), 0, len(content))["clausePosition"] or {}
+            db.add(Risk(
+                job_id=job.id,
+                contract_id=contract.id,
+                contract_name=contract.name,
+                type=item.type,
+                level=item.level,
+                description=item.description,
+                suggestion=item.suggestion,
+                clause=item.clause,
+                clause_start=pos.get("start"),
+                clause_end=pos.get("end"),
+            ))
+        contract.ai_analyzed = True
+        contract.risk_level = result.overallRisk
+        job.status = "succeeded"
+        job.result = result.model_dump_json()
+        job.finished_at = _now()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _fallback(job_id: str, result: AIAnalyzeResponse) -> None:
+    """Record the rule-based ``result`` on the job alone."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id)
+            .values(status="fallback", result=result.model_dump_json(), finished_at=_now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _fail(job_id: str, error: str) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id)
+            .values(status="failed", error=error[:2000], finished_at=_now())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _requeue(job_ids: list[str]) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id.in_(job_ids), AnalysisJob.status == "running")
+            .values(status="queued", started_at=None)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _recoverable() -> list[str]:
+    """Requeue stale running jobs and return every queued job id, oldest first."""
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.status == "running", AnalysisJob.started_at < _now() - timedelta(seconds=STALE_SECONDS))
+            .values(status="queued", started_at=None)
+        )
+        db.commit()
+        return list(db.execute(
+            select(AnalysisJob.id).where(AnalysisJob.status == "queued").order_by(AnalysisJob.created_at)
+        ).scalars())
+    finally:
+        db.close()
+
+
+class JobRunner:
+    def __init__(self, workers: int = WORKERS):
+        self.workers = workers
+        self._queue: asyncio.Queue[str] | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._active: set[str] = set()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(_recoverable):
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        # Jobs interrupted mid-analysis go back to the queue for the next start.
+        if self._active:
+            await asyncio.to_thread(_requeue, list(self._active))
+            self._active.clear()
+        self._tasks = []
+        self._queue = None
+
+    def enqueue(self, job_id: str) -> None:
+        """Thread-safe; a no-op before ``start`` (the job is recovered on next startup)."""
+        if self._queue is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, job_id)
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "running": len(self._active),
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    async def _work(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._active.add(job_id)
+            try:
+                await self._run(job_id)
+                self._active.discard(job_id)
+            except Exception as exc:
+                self._active.discard(job_id)
+                await asyncio.to_thread(_fail, job_id, str(exc) or type(exc).__name__)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        claimed = await asyncio.to_thread(_claim, job_id)
+        if claimed is None:
+            return
+        name, contract_type, content = claimed
+        try:
+            result, _ = await analyze_contract_risk(name, contract_type, content, fallback=False)
+            ai = True
+        except Exception:
+            result, ai = rule_based_analysis(contract_type, content), False
+        try:
+            parsed = AIAnalyzeResponse(**result)
+        except ValidationError as exc:
+            await asyncio.to_thread(_fail, job_id, f"Invalid analysis result: {exc.error_count()} error(s)")
+            return
+        if ai:
+            await asyncio.to_thread(_persist, job_id, parsed, content)
+        else:
+            await asyncio.to_thread(_fallback, job_id, parsed)
+
+
+runner = JobRunner()
@@ -0,0 +1,126 @@
+"""Clause-aligned chunking of long contracts and merging of per-chunk analyses.
+
+Windows break on 第X条 headings (falling back to numbered "1." / "1、"
+headings), so a clause is only cut when it alone exceeds the window size.
+Every window after the first also carries ``overlap`` characters of the
+preceding text, so a risk straddling a boundary is seen whole by one side;
+the duplicate the other side may report is removed when merging.
+"""
+import re
+
+ARTICLE_RE = re.compile(r"^[ \t　]*第[一二三四五六七八九十百千零〇两\d]+条", re.M)
+NUMBERED_RE = re.compile(r"^[ \t　]*\d+[.、．](?!\d)", re.M)
+
+LEVEL_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def clause_spans(content: str) -> list[tuple[int, int]]:
+    """``[start, end)`` spans of the preamble and each clause.
+
+    >>> clause_spans("前言\\n第一条 甲\\n第二条 乙")
+    [(0, 3), (3, 9), (9, 14)]
+    """
+    starts = [m.start() for m in ARTICLE_RE.finditer(content)]
+    if not starts:
+        starts = [m.start() for m in NUMBERED_RE.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    ends = starts[1:] + [len(content)]
+    return [(s, e) for s, e in zip(starts, ends) if e > s]
+
+
+def clause_windows(content: str, size: int, overlap: int = 0) -> list[tuple[int, int]]:
+    """Group clauses greedily into windows of about ``size`` characters.
+
+    >>> clause_windows("第一条 aaaa\\n第二条 bbbb\\n第三条 cccc", size=20, overlap=2)
+    [(0, 18), (16, 26)]
+    """
+    pieces: list[tuple[int, int]] = []
+    for start, end in clause_spans(content):
+        while end - start > size:
+            pieces.append((start, start + size))
+            start += size
+        pieces.append((start, end))
+    windows = []
+    cur_start, cur_end = pieces[0] if pieces else (0, 0)
+    for start, end in pieces[1:]:
+        if end - cur_start > size:
+            windows.append((cur_start, cur_end))
+            cur_start = start
+        cur_end = end
+    windows.append((cur_start, cur_end))
+    return [(max(0, s - overlap) if i else s, e) for i, (s, e) in enumerate(windows)]
+
+
+def locate_clause(content: str, risk: dict, start: int, end: int) -> dict:
+    """Map a chunk-relative risk onto the full text.
+
+    The quoted ``clause`` is searched for verbatim inside the window (then the
+    whole document), which is exact; the model's own chunk-relative offsets are
+    only used, shifted and clamped to the window, when the quote is not found.
+    """
+    risk = dict(risk)
+    clause = (risk.get("clause") or "").strip()
+    idx = content.find(clause, start, end) if clause else -1
+    if idx < 0 and clause:
+        idx = content.find(clause)
+    if idx >= 0:
+        risk["clausePosition"] = {"start": idx, "end": idx + len(clause)}
+        return risk
+    pos = risk.get("clausePosition")
+    if isinstance(pos, dict) and isinstance(pos.get("start"), int) and isinstance(pos.get("end"), int):
+        s = min(max(start + pos["start"], start), end)
+        e = min(max(start + pos["end"], s), end)
+        risk["clausePosition"] = {"start": s, "end": e}
+    else:
+        risk["clausePosition"] = None
+    return risk
+
+
+def _same_risk(a: dict, b: dict) -> bool:
+    if a.get("type") != b.get("type"):
+        return False
+    pa, pb = a.get("clausePosition"), b.get("clausePosition")
+    if pa and pb:
+        return pa["start"] < pb["end"] and pb["start"] < pa["end"]
+    if a.get("clause") and a.get("clause") == b.get("clause"):
+        return True
+    return a.get("description") == b.get("description")
+
+
+def merge_chunk_results(content: str, parts: list[tuple[tuple[int, int], dict]]) -> dict:
+    """Combine ``((start, end), result)`` pairs into one analysis result.
+
+    Risks are placed on the full text, de-duplicated (the higher level wins)
+    and ranked by level, then by position.
+    """
+    located = [
+        locate_clause(content, risk, start, end)
+        for (start, end), result in parts
+        for risk in result.get("risks", [])
+        if isinstance(risk, dict)
+    ]
+    located.sort(key=lambda r: -LEVEL_RANK.get(r.get("level"), 0))
+    risks: list[dict] = []
+    for risk in located:
+        if not any(_same_risk(risk, kept) for kept in risks):
+            risks.append(risk)
+    risks.sort(key=lambda r: (
+        -LEVEL_RANK.get(r.get("level"), 0),
+        r["clausePosition"]["start"] if r.get("clausePosition") else len(content),
+    ))
+
+    levels = [r.get("overallRisk") for _, r in parts] + [r.get("level") for r in risks]
+    overall = max((lv for lv in levels if lv in LEVEL_RANK), key=LEVEL_RANK.__getitem__, default="low")
+    confidences = [float(r["confidence"]) for _, r in parts if isinstance(r.get("confidence"), (int, float))]
+    thinking = [
+        f"[{i}/{len(parts)}] {step}"
+        for i, (_, result) in enumerate(parts, 1)
+        for step in result.get("thinking", [])
+    ]
+    return {
+        "overallRisk": overall,
+        "confidence": round(sum(confidences) / len(confidences), 2) if confidences else 0.0,
+        "thinking": thinking,
+        "risks": risks,
+    }
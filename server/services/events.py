@@ -0,0 +1,202 @@
+"""Change feed fan-out for ``/api/events``.
+
+Each committed transaction that touched contracts, risks, tasks, annotations
+or text edits becomes one message, ``{"cursor": <highest seq>, "changes":
+[{"entity", "id", "op", "seq", "contractId"?, "fields"?}, ...]}`` (see
+``changes.py``), delivered to every SSE and WebSocket connection.
+
+Every connection reads from its own queue of at most ``EVENTS_QUEUE_SIZE``
+messages. A client that falls that far behind has its backlog dropped and
+gets a single ``overflow`` instead, after which it catches up with
+``/api/sync?since=<last cursor>``. A slow client therefore holds bounded
+memory and never delays writers or other clients.
+
+With several uvicorn workers, set ``EVENTS_BROKER=host:port``: each worker
+links to the relay in ``broker.py`` (hosting it when none is listening), so
+a change committed in one worker reaches the clients of all of them. Losing
+the link also sends ``overflow``, since messages may have been missed.
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+
+import broker
+
+QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+HEARTBEAT = float(os.getenv("EVENTS_HEARTBEAT", "15"))
+BROKER = os.getenv("EVENTS_BROKER", "")
+
+log = logging.getLogger(__name__)
+
+_OVERFLOW = object()
+_RESET = b'{"reset": true}\n'
+
+
+class Subscriber:
+    def __init__(self, entities: set[str] | None, size: int):
+        self.entities = entities
+        self._queue: asyncio.Queue = asyncio.Queue(size)
+        self._overflowed = False
+
+    def offer(self, message: dict) -> None:
+        if self._overflowed:
+            return
+        if self.entities is not None:
+            changes = [c for c in message["changes"] if c["entity"] in self.entities]
+            if not changes:
+                return
+            message = {"cursor": message["cursor"], "changes": changes}
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflow()
+
+    def overflow(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._overflowed = True
+        self._queue.put_nowait(_OVERFLOW)
+
+    async def get(self) -> tuple[str, dict]:
+        """Next ``(event, data)``: ``change``, ``overflow``, or ``ping`` after
+        ``HEARTBEAT`` seconds without one."""
+        try:
+            item = await asyncio.wait_for(self._queue.get(), HEARTBEAT)
+        except asyncio.TimeoutError:
+            return "ping", {}
+        if item is _OVERFLOW:
+            self._overflowed = False
+            return "overflow", {}
+        return "change", item
+
+
+class Hub:
+    def __init__(self):
+        self._subscribers: set[Subscriber] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._link: BrokerLink | None = None
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if BROKER:
+            self._link = BrokerLink(BROKER, self)
+            self._link.start()
+
+    async def stop(self) -> None:
+        if self._link is not None:
+            await self._link.stop()
+            self._link = None
+        self._loop = None
+
+    def subscribe(self, entities: set[str] | None = None) -> Subscriber:
+        sub = Subscriber(entities, QUEUE_SIZE)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self._subscribers.discard(sub)
+
+    def publish(self, changes: list[dict] | None) -> None:
+        """Thread-safe (commits happen in worker threads too); a no-op before ``start``."""
+        loop = self._loop
+        if not changes or loop is None:
+            return
+        message = {"cursor": max(c["seq"] for c in changes), "changes": changes}
+        with contextlib.suppress(RuntimeError):  # loop closed during shutdown
+            loop.call_soon_threadsafe(self._deliver, message, True)
+
+    def overflow_all(self) -> None:
+        for sub in list(self._subscribers):
+            sub.overflow()
+
+    def _deliver(self, message: dict, local: bool) -> None:
+        for sub in list(self._subscribers):
+            sub.offer(message)
+        if local and self._link is not None:
+            self._link.send(message)
+
+
+class BrokerLink:
+    """This worker's connection to the relay: sends local messages, delivers remote ones."""
+
+    def __init__(self, address: str, hub: Hub):
+        self.host, self.port = broker.parse_address(address)
+        self.hub = hub
+        self.connected = False
+        self._outbox: asyncio.Queue[bytes] = asyncio.Queue(broker.PEER_BUFFER)
+        self._server: asyncio.Server | None = None
+        self._task: asyncio.Task | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def send(self, message: dict) -> None:
+        if not self.connected:
+            return
+        try:
+            self._outbox.put_nowait(json.dumps(message, ensure_ascii=False).encode() + b"\n")
+        except asyncio.QueueFull:
+            # The relay stopped reading; drop the link and start over.
+            self.connected = False
+            self._writer.close()
+
+    async def _run(self) -> None:
+        delay = 0.1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port, limit=broker.LINE_LIMIT)
+            except OSError:
+                if self._server is None:
+                    with contextlib.suppress(OSError):  # another worker won the bind
+                        self._server = await broker.start(self.host, self.port)
+                        log.info("hosting change-feed relay on %s:%s", self.host, self.port)
+                        continue
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5)
+                continue
+            delay = 0.1
+            try:
+                await self._pump(reader, writer)
+            except (OSError, ValueError):
+                pass
+            finally:
+                self.connected = False
+                writer.close()
+                # Messages may have been lost either way while the link was down.
+                self.hub.overflow_all()
+
+    async def _pump(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        while not self._outbox.empty():
+            self._outbox.get_nowait()
+        writer.write(_RESET)
+        self._writer = writer
+        self.connected = True
+        sender = asyncio.create_task(self._send(writer))
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                if message.get("reset"):
+                    self.hub.overflow_all()
+                else:
+                    self.hub._deliver(message, False)
+        finally:
+            sender.cancel()
+
+    async def _send(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            writer.write(await self._outbox.get())
+            await writer.drain()
+
+
+hub = Hub()
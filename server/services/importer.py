@@ -0,0 +1,274 @@
+"""Bulk import of contracts, risks and tasks from NDJSON or CSV.
+
+Rows are parsed as the request body streams in and validated with the same
+``*Create`` schemas as the single-row endpoints. A row that fails validation
+(or references a missing contract, or reuses an existing id) is reported by
+its row number and skipped; the rest of its batch still goes in. Each batch is
+one ``executemany`` per table and one commit, instead of an INSERT, commit
+and refresh per row.
+
+Core inserts bypass the ORM flush, so the dashboard counters, table versions
+and change sequence are maintained explicitly in the same transaction (see
+``counters.insert_deltas``, ``versions.bump`` and ``changes.stamp_rows``), and
+contracts are added to the FTS index with one statement per batch rather
+than by the per-row trigger (see ``search.bulk_fts_index``).
+
+Contracts may carry an ``id`` so risks and tasks imported afterwards can refer
+to legacy ids; without one a new id is generated. With ``scan`` set, each
+imported contract's content goes through the rule engine and the risks it
+finds are inserted with the contract.
+"""
+import csv
+import io
+import json
+import os
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from bodies import pack
+from changes import record_inserts, stamp_rows
+from counters import STATS_COUNTERS, apply_deltas, insert_deltas
+from models import Contract, ContractBody, Risk, Task, _uuid
+from schemas import ContractCreate, RiskCreate, TaskCreate
+from search import bulk_fts_index
+from services.rules import rule_based_analysis
+from versions import bump
+
+BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Row errors listed in the response; the failed count is always complete.
+MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("ndjson", "csv")
+
+ENTITIES: dict[str, tuple[type, type[BaseModel]]] = {
+    "contracts": (Contract, ContractCreate),
+    "risks": (Risk, RiskCreate),
+    "tasks": (Task, TaskCreate),
+}
+
+
+class RowParser:
+    """Split a streamed body into ``(row, record)`` pairs, where ``record`` is
+    a dict or, for an unparseable row, an error message. Rows are numbered
+    from 1; blank NDJSON lines and the CSV header are not counted.
+
+    >>> p = RowParser("csv")
+    >>> p.feed('name,note\\nA,"two\\nli')
+    []
+    >>> p.feed('nes"\\nB,\\n')
+    [(1, {'name': 'A', 'note': 'two\\nlines'}), (2, {'name': 'B'})]
+    >>> RowParser("ndjson").feed('{"a": 1}\\n\\n[1]\\n{"b"')
+    [(1, {'a': 1}), (2, 'row is not a JSON object')]
+    """
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self._buf = ""
+        self._rows = 0
+        self._header: list[str] | None = None
+
+    def feed(self, text: str) -> list[tuple[int, dict | str]]:
+        self._buf += text
+        if self.fmt == "csv":
+            end = self._csv_boundary()
+        else:
+            end = self._buf.rfind("\n") + 1
+        if not end:
+            return []
+        complete, self._buf = self._buf[:end], self._buf[end:]
+        return self._parse(complete)
+
+    def close(self) -> list[tuple[int, dict | str]]:
+        rest, self._buf = self._buf, ""
+        return self._parse(rest) if rest.strip() else []
+
+    def _csv_boundary(self) -> int:
+        # A newline ends a record only outside quotes, i.e. after an even
+        # number of '"' (an escaped quote is written as two).
+        end = self._buf.rfind("\n")
+        while end >= 0 and self._buf.count('"', 0, end) % 2:
+            end = self._buf.rfind("\n", 0, end)
+        return end + 1
+
+    def _parse(self, text: str) -> list[tuple[int, dict | str]]:
+        out: list[tuple[int, dict | str]] = []
+        if self.fmt == "csv":
+            for values in csv.reader(io.StringIO(text)):
+                if not values:
+                    continue
+                if self._header is None:
+                    self._header = [h.strip() for h in values]
+                    continue
+                self._rows += 1
+                if len(values) != len(self._header):
+                    out.append((self._rows, f"expected {len(self._header)} columns, got {len(values)}"))
+                    continue
+                # An empty cell means "not given", so schema defaults apply.
+                out.append((self._rows, {k: v for k, v in zip(self._header, values) if v != ""}))
+            return out
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            self._rows += 1
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                out.append((self._rows, f"invalid JSON: {exc}"))
+                continue
+            out.append((self._rows, record if isinstance(record, dict) else "row is not a JSON object"))
+        return out
+
+
+class Batch:
+    """Validated column values for one batch, with the rows rejected so far."""
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.rows: list[tuple[int, dict]] = []
+        self.risks: dict[int, list[dict]] = {}  # contract row -> scanned risks
+        self.errors: list[tuple[int, str]] = []
+
+
+def _error_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" if e["loc"] else e["msg"]
+        for e in exc.errors()
+    )
+
+
+def _row_id(record: dict) -> str:
+    value = record.get("id")
+    return value if isinstance(value, str) and value else _uuid()
+
+
+def prepare_batch(entity: str, records: list[tuple[int, dict | str]], scan: bool = False) -> Batch:
+    """Validate and map records to column values (CPU only, no database)."""
+    schema = ENTITIES[entity][1]
+    batch = Batch(entity)
+    for row, record in records:
+        if isinstance(record, str):
+            batch.errors.append((row, record))
+            continue
+        if entity == "risks" and isinstance(record.get("clausePosition"), str):
+            try:
+                record["clausePosition"] = json.loads(record["clausePosition"])
+            except ValueError:
+                batch.errors.append((row, "clausePosition: invalid JSON"))
+                continue
+        try:
+            body = schema.model_validate(record)
+        except ValidationError as exc:
+            batch.errors.append((row, _error_message(exc)))
+            continue
+        values = body.model_dump()
+        values["id"] = _row_id(record)
+        if entity == "risks":
+            pos = values.pop("clause_position") or {}
+            values["clause_start"] = pos.get("start")
+            values["clause_end"] = pos.get("end")
+        elif entity == "contracts":
+            values["ai_analyzed"] = False
+            values["risk_level"] = None
+            values["body"] = {"contract_id": values["id"], **pack(values.pop("content"))}
+            if scan and body.content:
+                result = rule_based_analysis(body.type, body.content)
+                if result["risks"]:
+                    values["risk_level"] = result["overallRisk"]
+                    batch.risks[row] = [_scanned_risk(values, r) for r in result["risks"]]
+        batch.rows.append((row, values))
+    return batch
+
+
+def _scanned_risk(contract: dict, risk: dict) -> dict:
+    pos = risk.get("clausePosition") or {}
+    return {
+        "id": _uuid(),
+        "contract_id": contract["id"],
+        "contract_name": contract["name"],
+        "type": risk["type"],
+        "level": risk["level"],
+        "description": risk["description"],
+        "suggestion": risk["suggestion"],
+        "clause": risk.get("clause"),
+        "clause_start": pos.get("start"),
+        "clause_end": pos.get("end"),
+        "status": "pending",
+    }
+
+
+def write_batch(db, batch: Batch) -> tuple[int, int]:
+    """Insert a prepared batch and commit; returns ``(rows, scanned risks)``
+    inserted. Rows rejected here are appended to ``batch.errors``."""
+    model = ENTITIES[batch.entity][0]
+    if batch.entity != "contracts":
+        _check_contracts(db, batch)
+    if not batch.rows:
+        return 0, 0
+    stamp_rows(db.connection(), [v for _, v in batch.rows])
+    try:
+        if model is Contract:
+            with bulk_fts_index(db.connection(), [v["id"] for _, v in batch.rows]):
+                _insert(db, model, [v for _, v in batch.rows])
+        else:
+            _insert(db, model, [v for _, v in batch.rows])
+    except IntegrityError:
+        # Some row collides (typically a duplicate id); retry one row per
+        # savepoint so only the offending rows are dropped.
+        db.rollback()
+        _insert_each(db, model, batch)
+    rows = [v for _, v in batch.rows]
+    risks = [r for row, _ in batch.rows for r in batch.risks.get(row, ())]
+    if risks:
+        stamp_rows(db.connection(), risks)
+        db.execute(Risk.__table__.insert(), risks)
+    if STATS_COUNTERS:
+        deltas = insert_deltas(model, rows)
+        for name, value in insert_deltas(Risk, risks).items():
+            deltas[name] = deltas.get(name, 0) + value
+        apply_deltas(db.connection(), deltas)
+    bump(db.connection(), {model.__tablename__, "risks"} if risks else {model.__tablename__})
+    record_inserts(db, model, rows)
+    record_inserts(db, Risk, risks)
+    db.commit()
+    return len(rows), len(risks)
+
+
+def _check_contracts(db, batch: Batch) -> None:
+    ids = {v["contract_id"] for _, v in batch.rows if v.get("contract_id")}
+    names = dict(db.execute(select(Contract.id, Contract.name).where(Contract.id.in_(ids))).all()) if ids else {}
+    kept = []
+    for row, values in batch.rows:
+        contract_id = values.get("contract_id")
+        if contract_id and contract_id not in names:
+            batch.errors.append((row, f"Contract not found: {contract_id}"))
+            continue
+        if contract_id and not values.get("contract_name"):
+            values["contract_name"] = names[contract_id]
+        kept.append((row, values))
+    batch.rows = kept
+
+
+def _insert(db, model, rows: list[dict]) -> None:
+    if model is not Contract:
+        db.execute(model.__table__.insert(), rows)
+        return
+    # Content goes to its own table (see bodies.py).
+    db.execute(model.__table__.insert(), [{k: v for k, v in r.items() if k != "body"} for r in rows])
+    db.execute(ContractBody.__table__.insert(), [r["body"] for r in rows])
+
+
+def _insert_each(db, model, batch: Batch) -> None:
+    # The rollback also undid the sequence numbers; take them again.
+    stamp_rows(db.connection(), [v for _, v in batch.rows])
+    kept = []
+    for row, values in batch.rows:
+        try:
+            with db.begin_nested():
+                _insert(db, model, [values])
+        except IntegrityError as exc:
+            batch.errors.append((row, f"rejected by database: {exc.orig}"))
+            continue
+        kept.append((row, values))
+    batch.rows = kept
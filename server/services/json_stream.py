@@ -0,0 +1,75 @@
+import json
+
+
+class JSONArrayStream:
+    """Incrementally scan a streamed JSON object and yield elements of selected
+    top-level arrays as soon as each element is complete.
+
+    >>> s = JSONArrayStream({"thinking"})
+    >>> s.feed('{"thinking": ["a", "b')
+    [('thinking', 'a')]
+    >>> s.feed('"]}')
+    [('thinking', 'b')]
+    """
+
+    def __init__(self, keys: set[str]):
+        self.keys = keys
+        self.buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._str_start = 0
+        self._last_key: str | None = None
+        self._key: str | None = None
+        self._array: str | None = None
+        self._elem_start: int | None = None
+
+    def feed(self, chunk: str) -> list[tuple[str, object]]:
+        self.buf += chunk
+        out = []
+        buf = self.buf
+        for i in range(self._pos, len(buf)):
+            c = buf[i]
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif c == "\\":
+                    self._esc = True
+                elif c == '"':
+                    self._in_str = False
+                    if self._depth == 1:
+                        self._last_key = json.loads(buf[self._str_start:i + 1])
+                    elif self._depth == 2 and self._array and self._elem_start == self._str_start:
+                        self._emit(out, buf[self._elem_start:i + 1])
+                continue
+            if c == '"':
+                self._in_str = True
+                self._str_start = i
+                if self._depth == 2 and self._array and self._elem_start is None:
+                    self._elem_start = i
+            elif c in "{[":
+                if self._depth == 1 and c == "[" and self._key in self.keys:
+                    self._array = self._key
+                elif self._depth == 2 and self._array and self._elem_start is None:
+                    self._elem_start = i
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 2 and self._array and self._elem_start is not None:
+                    self._emit(out, buf[self._elem_start:i + 1])
+                elif self._depth == 1 and c == "]":
+                    self._array = None
+            elif c == ":" and self._depth == 1:
+                self._key = self._last_key
+            elif c == "," and self._depth == 1:
+                self._key = None
+        self._pos = len(buf)
+        return out
+
+    def _emit(self, out: list, raw: str) -> None:
+        self._elem_start = None
+        try:
+            out.append((self._array, json.loads(raw)))
+        except ValueError:
+            pass
@@ -1,22 +1,179 @@
 import os
 import json
-import random
+import asyncio
 import httpx
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
+from typing import AsyncIterator
+
+from services.ai_cache import cache, make_key
+from services.chunking import clause_windows, merge_chunk_results
+from services.resilience import CircuitBreaker, RateLimitedError, TokenBucket
+from services.rules import rule_based_analysis
+from services.json_stream import JSONArrayStream
+
 load_dotenv()
 
 KIMI_API_KEY = os.getenv("KIMI_API_KEY", "")
-KIMI_API_URL = "https://api.moonshot.cn/v1/chat/completions"
+KIMI_API_URL = os.getenv("KIMI_API_URL", "https://api.moonshot.cn/v1/chat/completions")
 KIMI_MODEL = "kimi-latest"
-TIMEOUT = 120.0
+# Bump when a prompt template changes so cached results from the old prompt are not reused.
+ANALYZE_PROMPT_VERSION = "1"
+ADVICE_PROMPT_VERSION = "1"
+
+CONNECT_TIMEOUT = float(os.getenv("KIMI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("KIMI_READ_TIMEOUT", "120"))
+POOL_TIMEOUT = float(os.getenv("KIMI_POOL_TIMEOUT", "10"))
+MAX_CONNECTIONS = int(os.getenv("KIMI_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE = int(os.getenv("KIMI_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("KIMI_KEEPALIVE_EXPIRY", "60"))
+HTTP2 = os.getenv("KIMI_HTTP2", "1").lower() in ("1", "true", "yes")
+
+# Contracts longer than CHUNK_THRESHOLD characters are analysed as clause-aligned
+# windows of about CHUNK_SIZE characters, at most CHUNK_CONCURRENCY at a time.
+CHUNK_THRESHOLD = int(os.getenv("AI_CHUNK_THRESHOLD", "6000"))
+CHUNK_SIZE = int(os.getenv("AI_CHUNK_SIZE", "4000"))
+CHUNK_OVERLAP = int(os.getenv("AI_CHUNK_OVERLAP", "200"))
+CHUNK_CONCURRENCY = int(os.getenv("AI_CHUNK_CONCURRENCY", "4"))
+
+# Upstream protection: the breaker opens after BREAKER_FAILURES consecutive
+# failures and probes again after BREAKER_RESET seconds; the limiter keeps
+# requests within RATE_LIMIT per minute, queueing bursts up to RATE_MAX_WAIT.
+BREAKER_FAILURES = int(os.getenv("KIMI_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("KIMI_BREAKER_RESET", "30"))
+RATE_LIMIT = float(os.getenv("KIMI_RATE_LIMIT", "200"))
+RATE_BURST = float(os.getenv("KIMI_RATE_BURST", "20"))
+RATE_MAX_WAIT = float(os.getenv("KIMI_RATE_MAX_WAIT", "30"))
+
+breaker = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+limiter = TokenBucket(RATE_LIMIT / 60, RATE_BURST, RATE_MAX_WAIT)
+
+_client: httpx.AsyncClient | None = None
+
+
+def _http2_supported() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2 and _http2_supported(),
+        timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+        headers={"Authorization": f"Bearer {KIMI_API_KEY}"},
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared pooled client; created lazily when used outside the app lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+
+async def start_client() -> None:
+    get_client()
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _upstream_failed(exc: BaseException) -> bool | None:
+    """True if ``exc`` means the upstream is unhealthy, False if it answered,
+    None if the call ended for reasons of our own (cancelled, rate limited)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, Exception) and not isinstance(exc, RateLimitedError):
+        return False
+    return None
+
+
+@asynccontextmanager
+async def _upstream():
+    """Guard one upstream call: fail fast while the breaker is open, wait for a
+    rate-limit token, and report the outcome back to the breaker."""
+    breaker.before_call()
+    try:
+        await limiter.acquire()
+        yield
+    except BaseException as exc:
+        failed = _upstream_failed(exc)
+        if failed:
+            breaker.record_failure()
+        elif failed is False:
+            breaker.record_success()
+        else:
+            breaker.release()
+        raise
+    breaker.record_success()
+
+
+def upstream_stats() -> dict:
+    return {"breaker": breaker.stats(), "limiter": limiter.stats()}
+
+
+async def chat_completion(messages: list[dict], temperature: float, json_mode: bool = False) -> str:
+    """One non-streaming completion; raises on transport or HTTP errors, and
+    immediately with ``CircuitOpenError`` while the upstream is marked down."""
+    payload = {"model": KIMI_MODEL, "messages": messages, "temperature": temperature}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    async with _upstream():
+        resp = await get_client().post(KIMI_API_URL, json=payload)
+        resp.raise_for_status()
+    data = resp.json()
+    return data["choices"][0]["message"]["content"]
+
 
+async def stream_chat_completion(
+    messages: list[dict], temperature: float, json_mode: bool = False
+) -> AsyncIterator[str]:
+    """Yield content deltas from a ``stream: true`` completion (OpenAI-style SSE)."""
+    payload = {"model": KIMI_MODEL, "messages": messages, "temperature": temperature, "stream": True}
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    async with _upstream(), get_client().stream("POST", KIMI_API_URL, json=payload) as resp:
+        resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                yield delta
 
-async def analyze_contract_risk(contract_name: str, contract_type: str, content: str) -> dict:
+
+def analysis_messages(
+    contract_name: str, contract_type: str, content: str, part: tuple[int, int] | None = None
+) -> list[dict]:
+    excerpt = ""
+    if part is not None:
+        excerpt = (
+            f"\n（以下仅为合同全文的第{part[0]}/{part[1]}部分节选，只分析节选中的条款；"
+            "clause请逐字摘录节选原文，clausePosition为节选内的字符索引）\n"
+        )
     prompt = f"""你是一位专业的合同风险审核专家。请对以下合同进行风险分析，并以JSON格式返回分析结果。
 
 合同名称：{contract_name}
-合同类型：{contract_type}
+合同类型：{contract_type}{excerpt}
 合同内容：
 {content}
 
@@ -50,111 +207,127 @@ async def analyze_contract_risk(contract_name: str, contract_type: str, content:
 4. thinking为分析思考过程，至少3-5条
 5. clausePosition为风险条款在合同文本中的大致位置（字符索引）
 6. 如未发现明显风险，risks可为空数组"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一位专业的合同风险审核专家，擅长识别合同中的法律、财务、运营和合规风险。请以JSON格式返回分析结果。",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _analysis_key(contract_type: str, content: str) -> str:
+    extra = f"chunked:{CHUNK_SIZE}:{CHUNK_OVERLAP}" if len(content) > CHUNK_THRESHOLD else ""
+    return make_key("analyze", KIMI_MODEL, ANALYZE_PROMPT_VERSION, contract_type, content, extra)
+
+
+async def _analyze_chunked(contract_name: str, contract_type: str, content: str) -> tuple[dict, bool]:
+    """Analyse clause windows concurrently; returns the merged result and
+    whether every window succeeded. Raises if none did."""
+    windows = clause_windows(content, CHUNK_SIZE, CHUNK_OVERLAP)
+    limit = asyncio.Semaphore(CHUNK_CONCURRENCY)
 
+    async def analyze_window(index: int, start: int, end: int) -> dict:
+        async with limit:
+            result_text = await chat_completion(
+                analysis_messages(contract_name, contract_type, content[start:end], part=(index, len(windows))),
+                temperature=0.3,
+                json_mode=True,
+            )
+        return json.loads(result_text)
+
+    results = await asyncio.gather(
+        *(analyze_window(i, start, end) for i, (start, end) in enumerate(windows, 1)),
+        return_exceptions=True,
+    )
+    parts = [(window, r) for window, r in zip(windows, results) if isinstance(r, dict)]
+    if not parts:
+        raise RuntimeError("all chunks failed")
+    return merge_chunk_results(content, parts), len(parts) == len(windows)
+
+
+async def analyze_contract_risk(
+    contract_name: str, contract_type: str, content: str, fallback: bool = True,
+) -> tuple[dict, str]:
+    """Risk analysis plus its cache status: "hit", "miss", or "bypass" when the
+    rule-based fallback answered or some chunks of a long contract failed
+    (neither is cached). With ``fallback=False`` upstream failures raise
+    instead of answering with the rules."""
+    key = _analysis_key(contract_type, content)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        return cached, "hit"
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            resp = await client.post(
-                KIMI_API_URL,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {KIMI_API_KEY}",
-                },
-                json={
-                    "model": KIMI_MODEL,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "你是一位专业的合同风险审核专家，擅长识别合同中的法律、财务、运营和合规风险。请以JSON格式返回分析结果。",
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                    "temperature": 0.3,
-                    "response_format": {"type": "json_object"},
-                },
+        if len(content) > CHUNK_THRESHOLD:
+            result, complete = await _analyze_chunked(contract_name, contract_type, content)
+            if not complete:
+                return result, "bypass"
+        else:
+            result_text = await chat_completion(
+                analysis_messages(contract_name, contract_type, content), temperature=0.3, json_mode=True
             )
-            resp.raise_for_status()
-            data = resp.json()
-            result_text = data["choices"][0]["message"]["content"]
-            return json.loads(result_text)
+            result = json.loads(result_text)
     except Exception:
-        return simulate_risk_analysis(contract_type, content)
+        if not fallback:
+            raise
+        return rule_based_analysis(contract_type, content), "bypass"
+    await asyncio.to_thread(cache.put, key, "analyze", content, result)
+    return result, "miss"
 
 
-def simulate_risk_analysis(contract_type: str, content: str) -> dict:
-    risks = []
-    thinking = [
-        "正在解析合同文本结构...",
-        "识别合同类型和主要条款...",
-        "分析法律合规性...",
-        "评估财务风险点...",
-        "检查运营可行性...",
-    ]
+def _analysis_events(result: dict, cache_status: str) -> list[tuple[str, dict]]:
+    events = [("thinking", {"index": i, "text": t}) for i, t in enumerate(result.get("thinking", []))]
+    events += [("risk", {"index": i, **r}) for i, r in enumerate(result.get("risks", []))]
+    events.append(("result", {**result, "cache": cache_status}))
+    return events
+
+
+async def stream_contract_risk(contract_name: str, contract_type: str, content: str) -> AsyncIterator[tuple[str, dict]]:
+    """Yield ``(event, data)`` pairs: each thinking step and risk as soon as it
+    parses out of the partial response, then the complete ``result``.
 
-    if "软件开发" in contract_type or "外包" in contract_type:
-        ip_idx = content.find("知识产权")
-        risks.append({
-            "type": "legal",
-            "level": "high",
-            "description": "知识产权归属条款不明确，可能导致后续争议",
-            "suggestion": "明确约定开发成果的知识产权归属及后续改进权益",
-            "clause": content[ip_idx:ip_idx + 50] if ip_idx >= 0 else "知识产权条款",
-            "clausePosition": {"start": ip_idx, "end": ip_idx + 50} if ip_idx >= 0 else None,
-        })
-        pay_idx = content.find("付款")
-        risks.append({
-            "type": "financial",
-            "level": "medium",
-            "description": "付款节点设置不合理，预付款比例过高",
-            "suggestion": "建议调整付款节点，增加里程碑验收条件",
-            "clause": content[pay_idx:pay_idx + 40] if pay_idx >= 0 else "付款条款",
-            "clausePosition": {"start": pay_idx, "end": pay_idx + 40} if pay_idx >= 0 else None,
-        })
-        thinking.append("发现软件开发类合同常见风险点...")
-
-    if "租赁" in contract_type:
-        m_idx = content.find("维护")
-        risks.append({
-            "type": "operational",
-            "level": "medium",
-            "description": "租赁物维护责任划分不够清晰",
-            "suggestion": "明确日常维护、大修责任归属及费用承担方式",
-            "clause": content[m_idx:m_idx + 30] if m_idx >= 0 else "维护条款",
-            "clausePosition": {"start": m_idx, "end": m_idx + 30} if m_idx >= 0 else None,
-        })
-
-    if "采购" in contract_type or "服务" in contract_type:
-        risks.append({
-            "type": "compliance",
-            "level": "low",
-            "description": "数据安全条款需补充合规要求",
-            "suggestion": "增加数据本地化存储及合规处理条款",
-        })
-
-    if "违约" not in content and "责任" not in content:
-        risks.append({
-            "type": "legal",
-            "level": "medium",
-            "description": "缺少违约责任条款",
-            "suggestion": "建议增加违约责任条款，明确违约情形及赔偿标准",
-        })
-
-    thinking.append("综合评估完成，生成风险报告...")
-
-    highest = "low"
-    level_rank = {"low": 1, "medium": 2, "high": 3}
-    for r in risks:
-        if level_rank.get(r["level"], 0) > level_rank.get(highest, 0):
-            highest = r["level"]
-
-    return {
-        "overallRisk": highest,
-        "confidence": round(0.85 + random.random() * 0.1, 2),
-        "thinking": thinking,
-        "risks": risks,
-    }
-
-
-async def generate_contract_advice(contract_name: str, contract_type: str, content: str, risk_description: str) -> str:
+    Long contracts go through the chunked analysis; their events follow once
+    the chunks are merged."""
+    if len(content) > CHUNK_THRESHOLD:
+        result, cache_status = await analyze_contract_risk(contract_name, contract_type, content)
+        for event in _analysis_events(result, cache_status):
+            yield event
+        return
+    key = _analysis_key(contract_type, content)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        for event in _analysis_events(cached, "hit"):
+            yield event
+        return
+    scanner = JSONArrayStream({"thinking", "risks"})
+    counts = {"thinking": 0, "risks": 0}
+    try:
+        async for delta in stream_chat_completion(
+            analysis_messages(contract_name, contract_type, content), temperature=0.3, json_mode=True
+        ):
+            for array, item in scanner.feed(delta):
+                if array == "thinking":
+                    yield "thinking", {"index": counts[array], "text": item}
+                elif isinstance(item, dict):
+                    yield "risk", {"index": counts[array], **item}
+                counts[array] += 1
+        result = json.loads(scanner.buf)
+    except Exception:
+        # Fall back to the rule-based analysis; "reset" tells the client to drop
+        # anything already streamed from the failed upstream response.
+        if counts["thinking"] or counts["risks"]:
+            yield "reset", {}
+        for event in _analysis_events(rule_based_analysis(contract_type, content), "bypass"):
+            yield event
+        return
+    await asyncio.to_thread(cache.put, key, "analyze", content, result)
+    yield "result", {**result, "cache": "miss"}
+
+
+ADVICE_FALLBACK = "基于该风险，建议：1）明确相关条款表述；2）增加保护性条款；3）咨询专业法律顾问进行进一步审核。"
+
+
+def advice_messages(contract_name: str, contract_type: str, content: str, risk_description: str) -> list[dict]:
     prompt = f"""你是一位专业的合同审核专家。针对以下合同中的风险问题，请提供具体的修改建议。
 
 合同名称：{contract_name}
@@ -170,29 +343,58 @@ async def generate_contract_advice(contract_name: str, contract_type: str, conte
 3. 修改理由
 
 请用中文回复，保持专业、简洁。"""
+    return [
+        {
+            "role": "system",
+            "content": "你是一位专业的合同审核专家，擅长提供具体的合同条款修改建议。",
+        },
+        {"role": "user", "content": prompt},
+    ]
 
+
+async def generate_contract_advice(
+    contract_name: str, contract_type: str, content: str, risk_description: str
+) -> tuple[str, str]:
+    """Advice text plus its cache status (see ``analyze_contract_risk``)."""
+    key = make_key("advice", KIMI_MODEL, ADVICE_PROMPT_VERSION, contract_type, content, risk_description)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        return cached, "hit"
     try:
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            resp = await client.post(
-                KIMI_API_URL,
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {KIMI_API_KEY}",
-                },
-                json={
-                    "model": KIMI_MODEL,
-                    "messages": [
-                        {
-                            "role": "system",
-                            "content": "你是一位专业的合同审核专家，擅长提供具体的合同条款修改建议。",
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                    "temperature": 0.5,
-                },
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return data["choices"][0]["message"]["content"]
+        advice = await chat_completion(
+            advice_messages(contract_name, contract_type, content, risk_description), temperature=0.5
+        )
+    except Exception:
+        return ADVICE_FALLBACK, "bypass"
+    await asyncio.to_thread(cache.put, key, "advice", content, advice)
+    return advice, "miss"
+
+
+async def stream_contract_advice(
+    contract_name: str, contract_type: str, content: str, risk_description: str
+) -> AsyncIterator[tuple[str, dict]]:
+    """Yield ``("delta", {"text"})`` pairs as tokens arrive, then ``("done", {"advice", "cache"})``."""
+    key = make_key("advice", KIMI_MODEL, ADVICE_PROMPT_VERSION, contract_type, content, risk_description)
+    cached = await asyncio.to_thread(cache.get, key)
+    if cached is not None:
+        yield "delta", {"text": cached}
+        yield "done", {"advice": cached, "cache": "hit"}
+        return
+    parts = []
+    try:
+        async for delta in stream_chat_completion(
+            advice_messages(contract_name, contract_type, content, risk_description), temperature=0.5
+        ):
+            parts.append(delta)
+            yield "delta", {"text": delta}
     except Exception:
-        return "基于该风险，建议：1）明确相关条款表述；2）增加保护性条款；3）咨询专业法律顾问进行进一步审核。"
+        if parts:
+            yield "error", {"detail": "upstream stream interrupted"}
+            yield "done", {"advice": "".join(parts), "cache": "bypass"}
+        else:
+            yield "delta", {"text": ADVICE_FALLBACK}
+            yield "done", {"advice": ADVICE_FALLBACK, "cache": "bypass"}
+        return
+    advice = "".join(parts)
+    await asyncio.to_thread(cache.put, key, "advice", content, advice)
+    yield "done", {"advice": advice, "cache": "miss"}
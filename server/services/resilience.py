@@ -0,0 +1,124 @@
+"""Circuit breaker and token-bucket limiter for the upstream LLM.
+
+Both are used from the event loop only, so neither needs a lock: state
+changes happen between awaits.
+"""
+import asyncio
+import time
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures; while open every
+    call is rejected immediately. After ``reset_timeout`` seconds one probe is
+    let through (half-open): success closes the circuit, failure re-opens it."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probing = False
+
+    def before_call(self) -> None:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError("circuit open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError("circuit half-open, probe in flight")
+            self._probing = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """The call ended without telling us anything about the upstream."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        retry_in = 0.0
+        if self.state == "open":
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutiveFailures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "retryInSeconds": round(retry_in, 1),
+        }
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``capacity``. Callers reserve a token
+    and sleep until it is due, so bursts queue in arrival order; a caller that
+    would wait longer than ``max_wait`` seconds is rejected instead. A
+    non-positive rate disables limiting."""
+
+    def __init__(self, rate: float, capacity: float, max_wait: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self.waiting = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        self._refill()
+        self._tokens -= 1
+        wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > self.max_wait:
+            self._tokens += 1
+            self.rejected += 1
+            raise RateLimitedError(f"rate limit queue full ({wait:.1f}s wait)")
+        if wait:
+            self.queued += 1
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "ratePerMinute": round(self.rate * 60, 2),
+            "capacity": self.capacity,
+            "available": round(max(self._tokens, 0.0), 2),
+            "waiting": self.waiting,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
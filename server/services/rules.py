@@ -0,0 +1,247 @@
+"""Rule-based contract risk analysis, the fallback when the LLM is unavailable.
+
+Rules are data (``risk_rules.json``, or ``RISK_RULES_PATH``) and are compiled
+once: every keyword of every rule goes into one Aho-Corasick automaton, so
+keywords cost a single pass however many rules there are. Regexes are
+compiled individually and only searched for their first hit; one big
+alternation would lose ``re``'s literal-prefix scan and measured slower. A
+hit is widened to the sentence containing it, so ``clause`` and
+``clausePosition`` quote real text rather than a fixed-length slice.
+
+Each rule has ``type``/``level``/``description``/``suggestion``, optional
+``contractTypes`` (substrings of the contract type; empty means any),
+``keywords`` and ``patterns``, and ``when``:
+
+    present   fire when a keyword or pattern matches (default)
+    always    fire for matching contract types; quote the first hit if any
+    absent    fire when no keyword or pattern matches
+
+    python -m services.rules check    compile the rules file and list the rules
+    python -m services.rules bench    time scans over the seed contracts
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from typing import Iterable, Iterator
+
+RULES_PATH = os.getenv("RISK_RULES_PATH", os.path.join(os.path.dirname(__file__), "risk_rules.json"))
+
+CLAUSE_BREAKS = "。；;！？\n"
+# Longest stretch of text searched on either side of a hit for a sentence break.
+CLAUSE_LIMIT = 120
+# A short unpunctuated line such as "第四条 知识产权" or "2.2 付款方式：" is a
+# heading; a hit on it quotes the first sentence of the body as well.
+HEADING_MAX = 20
+
+WHEN = ("present", "always", "absent")
+LEVEL_RANK = {"low": 1, "medium": 2, "high": 3}
+
+
+class AhoCorasick:
+    """Multi-keyword matcher: one pass over the text finds every occurrence of
+    every keyword, overlaps included.
+
+    >>> [(s, e) for s, e, _ in AhoCorasick(["违约", "违约金", "约金"]).finditer("支付违约金")]
+    [(2, 4), (2, 5), (3, 5)]
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = list(words)
+        goto: list[dict[str, int]] = [{}]
+        out: list[list[int]] = [[]]
+        for index, word in enumerate(self.words):
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(index)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+        self._lengths = [len(w) for w in self.words]
+        # From the root only a keyword's first character can make progress, so
+        # the scan jumps straight to the next one (a C-speed search) instead of
+        # stepping through every character in Python.
+        self._skip = re.compile("[" + "".join(re.escape(ch) for ch in goto[0]) + "]") if goto[0] else None
+
+    def finditer(self, text: str) -> Iterator[tuple[int, int, int]]:
+        """Yield ``(start, end, word_index)`` in order of ``end``."""
+        if self._skip is None:
+            return
+        goto, fail, out, lengths, skip = self._goto, self._fail, self._out, self._lengths, self._skip.search
+        node, i, n = 0, 0, len(text)
+        while i < n:
+            if not node:
+                m = skip(text, i)
+                if m is None:
+                    return
+                i = m.start()
+            ch = text[i]
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for index in out[node]:
+                yield i + 1 - lengths[index], i + 1, index
+            i += 1
+
+
+def clause_bounds(content: str, start: int, end: int) -> tuple[int, int]:
+    """Widen ``[start, end)`` to the sentence around it, trimming whitespace.
+
+    >>> text = "第一条 总则\\n乙方应按期交付；逾期按日支付违约金。其他"
+    >>> s, e = clause_bounds(text, 20, 23)
+    >>> text[s:e]
+    '逾期按日支付违约金。'
+    >>> s, e = clause_bounds(text, 4, 6)
+    >>> text[s:e]
+    '第一条 总则\\n乙方应按期交付；'
+    """
+    lo = max(0, start - CLAUSE_LIMIT)
+    hi = min(len(content), end + CLAUSE_LIMIT)
+    s = max(lo, max(content.rfind(ch, lo, start) for ch in CLAUSE_BREAKS) + 1)
+    e = _sentence_end(content, end, hi)
+    if content[e - 1:e] == "\n" and e - s <= HEADING_MAX and not any(p in content[s:e] for p in "，,。；;"):
+        e = _sentence_end(content, e, hi)
+    while s < start and content[s].isspace():
+        s += 1
+    while e > end and content[e - 1].isspace():
+        e -= 1
+    return s, e
+
+
+def _sentence_end(content: str, pos: int, hi: int) -> int:
+    ends = [i for i in (content.find(ch, pos, hi) for ch in CLAUSE_BREAKS) if i >= 0]
+    return min(ends) + 1 if ends else hi
+
+
+class RuleEngine:
+    def __init__(self, spec: dict):
+        self.thinking: list[str] = spec.get("thinking", [])
+        self.conclusion: str = spec.get("conclusion", "综合评估完成，生成风险报告...")
+        self.rules: list[dict] = spec["rules"]
+        keyword_rules: dict[str, list[int]] = {}
+        self._patterns: list[tuple[int, re.Pattern]] = []
+        for index, rule in enumerate(self.rules):
+            missing = [k for k in ("id", "type", "level", "description", "suggestion") if k not in rule]
+            if missing:
+                raise ValueError(f"rule #{index}: missing {', '.join(missing)}")
+            if rule.get("when", "present") not in WHEN:
+                raise ValueError(f"rule {rule['id']}: when must be one of {', '.join(WHEN)}")
+            if rule.get("when", "present") != "always" and not (rule.get("keywords") or rule.get("patterns")):
+                raise ValueError(f"rule {rule['id']}: needs keywords or patterns")
+            for word in rule.get("keywords", []):
+                keyword_rules.setdefault(word, []).append(index)
+            for pattern in rule.get("patterns", []):
+                try:
+                    self._patterns.append((index, re.compile(pattern)))
+                except re.error as exc:
+                    raise ValueError(f"rule {rule['id']}: bad pattern {pattern!r}: {exc}") from None
+        self._automaton = AhoCorasick(keyword_rules)
+        self._keyword_rules = list(keyword_rules.values())
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleEngine":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def first_hits(self, content: str) -> dict[int, tuple[int, int]]:
+        """Earliest ``(start, end)`` hit per rule index."""
+        hits: dict[int, tuple[int, int]] = {}
+        for start, end, word in self._automaton.finditer(content):
+            for index in self._keyword_rules[word]:
+                if index not in hits or start < hits[index][0]:
+                    hits[index] = (start, end)
+        for index, pattern in self._patterns:
+            m = pattern.search(content)
+            if m and (index not in hits or m.start() < hits[index][0]):
+                hits[index] = m.span()
+        return hits
+
+    def analyze(self, contract_type: str, content: str) -> dict:
+        hits = self.first_hits(content)
+        risks = []
+        thinking = list(self.thinking)
+        for index, rule in enumerate(self.rules):
+            types = rule.get("contractTypes")
+            if types and not any(t in contract_type for t in types):
+                continue
+            when = rule.get("when", "present")
+            hit = hits.get(index)
+            if (when == "present" and hit is None) or (when == "absent" and hit is not None):
+                continue
+            risk = {k: rule[k] for k in ("type", "level", "description", "suggestion")}
+            if hit is not None:
+                start, end = clause_bounds(content, *hit)
+                risk["clause"] = content[start:end]
+                risk["clausePosition"] = {"start": start, "end": end}
+            elif rule.get("fallbackClause"):
+                risk["clause"] = rule["fallbackClause"]
+                risk["clausePosition"] = None
+            risks.append(risk)
+            if rule.get("thinking"):
+                thinking.append(rule["thinking"])
+        thinking.append(self.conclusion)
+        highest = max((r["level"] for r in risks), key=lambda lv: LEVEL_RANK.get(lv, 0), default="low")
+        return {
+            "overallRisk": highest,
+            "confidence": 0.9,
+            "thinking": thinking,
+            "risks": risks,
+        }
+
+
+engine = RuleEngine.from_file(RULES_PATH)
+
+
+def rule_based_analysis(contract_type: str, content: str) -> dict:
+    return engine.analyze(contract_type, content)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="MeFlow rule-based risk analysis")
+    parser.add_argument("command", choices=["check", "bench"])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        for rule in engine.rules:
+            print(f"{rule['id']:<24} {rule.get('when', 'present'):<8} {rule['level']:<7} {rule['description']}")
+        print(f"{len(engine.rules)} rules, {len(engine._automaton.words)} keywords compiled from {RULES_PATH}")
+        return 0
+
+    from seed import SEED_CONTRACTS
+
+    samples = [(c.type, c.content) for c in SEED_CONTRACTS]
+    samples.append(("软件开发外包合同", "".join(c.content for c in SEED_CONTRACTS) * 20))
+    for contract_type, content in samples:
+        iterations = max(1, args.iterations * 1000 // max(len(content), 1000))
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            result = rule_based_analysis(contract_type, content)
+        per_scan = (time.perf_counter() - t0) / iterations * 1e6
+        print(f"{len(content):>7} chars  {len(result['risks'])} risks  {per_scan:9.1f} µs/scan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""Materialised contract text from the ``text_edits`` operation log.
+
+An edit applies to the text left by the contract's earlier edits: ``add``
+inserts ``text`` at ``position``, ``delete`` removes ``len(text)`` characters
+from ``position`` (positions are clamped to the text). Edits are numbered per
+contract (``text_edits.seq``) and replayed in that order over the contract's
+content.
+
+Replaying the whole log on every read costs O(all edits), so
+``text_snapshots`` keeps one materialised state per contract: the text after
+edit ``seq``, packed like the contract's content (``bodies.pack``, so
+zlib-compressed on SQLite), and its piece map. Reads replay only the edits
+after it. Once ``TEXT_SNAPSHOT_EVERY`` edits sit on top of it, the write
+adding the next one replaces it, so a read never replays more than that and
+only the latest state is stored. Deleting an edit the snapshot covers, or
+replacing the contract's content, rebuilds it from the base.
+
+The piece map splits the current text into runs, each inserted by one edit or
+left over from the base content, plus a zero-width mark where each delete took
+effect. Runs are disjoint and in order, so their start offsets are an interval
+index: ``Document.window`` finds the runs and marks overlapping a range by
+bisection.
+
+    python textlog.py rebuild     recompute every contract's snapshot
+"""
+import argparse
+import bisect
+import json
+import os
+import sys
+from itertools import accumulate
+
+from sqlalchemy import func, select
+
+from bodies import pack, unpack
+from changes import lock_sequence
+from models import Contract, TextEdit, TextSnapshot, _now
+
+SNAPSHOT_EVERY = int(os.getenv("TEXT_SNAPSHOT_EVERY", "50"))
+
+
+class Document:
+    """A contract's text after edit ``seq``, with the edit behind each run."""
+
+    def __init__(self, contract_id: str, content: str, seq: int = 0, pieces=None, marks=None):
+        self.contract_id = contract_id
+        self.text = content
+        self.seq = seq
+        # [[length, edit id or None for base text], ...] covering the text in order.
+        self.pieces: list[list] = pieces if pieces is not None else ([[len(content), None]] if content else [])
+        # [[position, edit id], ...] sorted by position.
+        self.marks: list[list] = marks if marks is not None else []
+        self._starts: list[int] | None = None
+
+    def apply(self, edit) -> None:
+        """Apply one edit (anything with ``id``, ``type``, ``text``, ``position``, ``seq``)."""
+        self.seq = edit.seq
+        self._starts = None
+        pos = min(max(edit.position, 0), len(self.text))
+        if edit.type == "add" and edit.text:
+            n = len(edit.text)
+            self.text = self.text[:pos] + edit.text + self.text[pos:]
+            self.pieces.insert(self._split(pos), [n, edit.id])
+            for mark in self.marks:
+                if mark[0] > pos:
+                    mark[0] += n
+        elif edit.type == "delete":
+            end = min(pos + len(edit.text), len(self.text))
+            if end == pos:
+                return
+            self.text = self.text[:pos] + self.text[end:]
+            first = self._split(pos)
+            del self.pieces[first:self._split(end)]
+            self._merge(first)
+            for mark in self.marks:
+                if mark[0] > end:
+                    mark[0] -= end - pos
+                elif mark[0] > pos:
+                    mark[0] = pos
+            bisect.insort(self.marks, [pos, edit.id], key=lambda m: m[0])
+
+    def window(self, start: int, end: int) -> tuple[str, list[str]]:
+        """Text in ``[start, end)`` and the ids of the edits whose runs overlap
+        it or whose deletes took effect within it (ends included)."""
+        if self._starts is None:
+            self._starts = list(accumulate((n for n, _ in self.pieces), initial=0))[:-1]
+        first = max(bisect.bisect_right(self._starts, start) - 1, 0)
+        last = bisect.bisect_left(self._starts, end)
+        ids = [owner for _, owner in self.pieces[first:last] if owner]
+        lo = bisect.bisect_left(self.marks, start, key=lambda m: m[0])
+        hi = bisect.bisect_right(self.marks, end, key=lambda m: m[0])
+        ids += [owner for _, owner in self.marks[lo:hi]]
+        return self.text[start:end], list(dict.fromkeys(ids))
+
+    def _split(self, pos: int) -> int:
+        """Index of the run starting at ``pos``, splitting the run across it."""
+        offset = 0
+        for i, (n, owner) in enumerate(self.pieces):
+            if offset == pos:
+                return i
+            if offset + n > pos:
+                self.pieces[i:i + 1] = [[pos - offset, owner], [offset + n - pos, owner]]
+                return i + 1
+            offset += n
+        return len(self.pieces)
+
+    def _merge(self, i: int) -> None:
+        if 0 < i < len(self.pieces) and self.pieces[i - 1][1] == self.pieces[i][1]:
+            self.pieces[i - 1][0] += self.pieces.pop(i)[0]
+
+
+def load(session, contract_id: str, from_base: bool = False) -> Document | None:
+    """The contract's current text: its snapshot plus the edits after it, or
+    ``None`` when the contract does not exist."""
+    snap = None if from_base else session.get(TextSnapshot, contract_id)
+    if snap is not None:
+        doc = Document(contract_id, unpack(snap.data), snap.seq, json.loads(snap.pieces), json.loads(snap.marks))
+    else:
+        content = session.scalar(select(Contract.content).where(Contract.id == contract_id))
+        if content is None:
+            return None
+        doc = Document(contract_id, content)
+    edits = session.execute(
+        select(TextEdit.id, TextEdit.type, TextEdit.text, TextEdit.position, TextEdit.seq)
+        .where(TextEdit.contract_id == contract_id, TextEdit.seq > doc.seq)
+        .order_by(TextEdit.seq)
+    )
+    for edit in edits:
+        doc.apply(edit)
+    return doc
+
+
+def save(session, doc: Document) -> None:
+    snap = session.get(TextSnapshot, doc.contract_id)
+    if snap is None:
+        snap = TextSnapshot(contract_id=doc.contract_id)
+        session.add(snap)
+    snap.seq = doc.seq
+    snap.data = pack(doc.text)["data"]
+    snap.pieces = json.dumps(doc.pieces, separators=(",", ":"))
+    snap.marks = json.dumps(doc.marks, separators=(",", ":"))
+    snap.created_at = _now()
+
+
+def append(session, edit: TextEdit) -> None:
+    """Number ``edit`` after the contract's last one and flush it; replaces
+    the snapshot once ``SNAPSHOT_EVERY`` edits sit on top of it."""
+    # The counter row serialises writers, so two edits never get one number.
+    lock_sequence(session.connection())
+    edit.seq = session.scalar(
+        select(func.coalesce(func.max(TextEdit.seq), 0) + 1).where(TextEdit.contract_id == edit.contract_id)
+    )
+    session.add(edit)
+    session.flush()
+    covered = session.scalar(select(TextSnapshot.seq).where(TextSnapshot.contract_id == edit.contract_id)) or 0
+    if edit.seq - covered >= SNAPSHOT_EVERY:
+        save(session, load(session, edit.contract_id))
+
+
+def forget(session, edit: TextEdit) -> None:
+    """After deleting ``edit``: rebuild the snapshot if it included the edit."""
+    covered = session.scalar(select(TextSnapshot.seq).where(TextSnapshot.contract_id == edit.contract_id))
+    if covered is not None and edit.seq is not None and edit.seq <= covered:
+        rebuild(session, edit.contract_id)
+
+
+def rebuild(session, contract_id: str) -> None:
+    """Recompute the snapshot from the contract's content and all its edits."""
+    session.flush()
+    doc = load(session, contract_id, from_base=True)
+    if doc is not None and doc.seq:
+        save(session, doc)
+    elif (snap := session.get(TextSnapshot, contract_id)) is not None:
+        session.delete(snap)
+
+
+def main(argv: list[str] | None = None) -> int:
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="MeFlow materialised contract text")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--contract", help="only this contract")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.contract:
+            ids = [args.contract]
+        else:
+            ids = sorted(set(db.scalars(select(TextEdit.contract_id))) | set(db.scalars(select(TextSnapshot.contract_id))))
+        for contract_id in ids:
+            rebuild(db, contract_id)
+        db.commit()
+        print(f"rebuilt {len(ids)} snapshot(s)")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())